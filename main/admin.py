@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import Project, Skill, Profile, Experience,Education,OtherLinks, ContactMessage, ChatLog,  Certification
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, IntegerField, TextField, Value, When
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from .chat_analytics import DASHBOARD_WINDOWS, dashboard
+from .chat_search import MARK_END, MARK_START, fts_available, search_chatlogs
+from .models import Project, Skill, Profile, Experience,Education,OtherLinks, ContactMessage, ChatLog,  Certification, ChatDailyRollup, ChatQuestionRollup
 # Register your models here.
 admin.site.register(Project)
 admin.site.register(Skill)
@@ -11,11 +19,110 @@ admin.site.register(Certification)
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
-    list_display = ('name', 'email', 'subject', 'created_at')
-    readonly_fields = ('name', 'email', 'subject', 'created_at', 'message')
+    list_display = ('name', 'email', 'subject', 'created_at', 'status', 'attempts')
+    list_filter = ('status',)
+    ordering = ('-created_at',)
+    readonly_fields = ('name', 'email', 'subject', 'created_at', 'message', 'attempts', 'sent_at', 'last_error')
 
 @admin.register(ChatLog)
 class ChatLogAdmin(admin.ModelAdmin):
     list_display = ('timestamp', 'user_query', 'model_used')
-    readonly_fields = ('timestamp', 'user_query', 'ai_response','model_used','session_key')
-    search_fields = ('user_query', 'ai_response')
\ No newline at end of file
+    list_filter = ('model_used',)
+    readonly_fields = ('timestamp', 'user_query', 'ai_response','model_used','session_key','follower_sessions')
+    # Used as is only without FTS5; see get_search_results
+    search_fields = ('user_query', 'ai_response')
+    # Searches show the best matches, not every row containing the words
+    search_result_limit = 1000
+
+    def _search_hits(self, request, search_term):
+        # get_ordering() and get_search_results() both need them; query once
+        cached = getattr(request, '_chatlog_search_hits', None)
+        if cached is None or cached[0] != search_term:
+            cached = (search_term, search_chatlogs(search_term, limit=self.search_result_limit))
+            request._chatlog_search_hits = cached
+        return cached[1]
+
+    def _fts_search_term(self, request):
+        search_term = request.GET.get('q', '').strip()
+        return search_term if search_term and fts_available() else None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip() or not fts_available():
+            return super().get_search_results(request, queryset, search_term)
+
+        hits = self._search_hits(request, search_term.strip())
+        queryset = queryset.filter(pk__in=[pk for pk, _snippet in hits])
+        if hits:
+            queryset = queryset.annotate(search_snippet=Case(
+                *[When(pk=pk, then=Value(snippet)) for pk, snippet in hits],
+                output_field=TextField(),
+            ))
+        return queryset, False
+
+    def get_ordering(self, request):
+        search_term = self._fts_search_term(request)
+        hits = self._search_hits(request, search_term) if search_term else None
+        if not hits:
+            return super().get_ordering(request)
+        # bm25 order, as returned by the FTS query
+        return (Case(
+            *[When(pk=pk, then=Value(position)) for position, (pk, _snippet) in enumerate(hits)],
+            output_field=IntegerField(),
+        ).asc(),)
+
+    def get_list_display(self, request):
+        if self._fts_search_term(request):
+            return ('timestamp', 'search_match', 'model_used')
+        return super().get_list_display(request)
+
+    @admin.display(description='Match')
+    def search_match(self, obj):
+        snippet = escape(getattr(obj, 'search_snippet', '') or obj.user_query)
+        return mark_safe(snippet.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+    def get_urls(self):
+        analytics = path('analytics/', self.admin_site.admin_view(self.analytics_view), name='main_chatlog_analytics')
+        return [analytics] + super().get_urls()
+
+    def analytics_view(self, request):
+        # Reads the rollup tables only (see chat_analytics.py), never ChatLog
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = int(request.GET.get('days', 30))
+        except ValueError:
+            days = 30
+        if days not in DASHBOARD_WINDOWS:
+            days = 30
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Chat analytics',
+            'opts': self.model._meta,
+            'stats': dashboard(days),
+            'windows': DASHBOARD_WINDOWS,
+        }
+        return TemplateResponse(request, 'admin/main/chatlog/analytics.html', context)
+
+@admin.register(ChatDailyRollup)
+class ChatDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'model_used', 'chats', 'average_response_length')
+    list_filter = ('model_used',)
+    date_hierarchy = 'day'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
+
+@admin.register(ChatQuestionRollup)
+class ChatQuestionRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'question', 'chats')
+    search_fields = ('question',)
+    date_hierarchy = 'day'
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_add_permission(self, request):
+        return False
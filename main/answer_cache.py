@@ -0,0 +1,143 @@
+# main/answer_cache.py
+"""
+Cache of finished chatbot answers.
+
+Recruiters ask the same few questions over and over, so a finished answer is
+kept under the normalized question, the content version and a hash of the
+conversation so far. A hit is replayed as SSE frames without calling the
+model.
+
+Each process keeps an LRU of recent answers, capped by entry count and total
+size. Behind it, answers are also written to the shared cache so other
+workers can reuse them. Both tiers expire entries after ANSWER_CACHE_TTL. The
+content version is part of the key, so editing the portfolio retires every
+answer. Answers for an old version are left for the LRU to evict rather than
+wiped, since requests around a bump can see either version for a while.
+ANSWER_CACHE_MAX_BYTES counts the UTF-8 encoded size of the answers.
+"""
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+ANSWER_CACHE_PREFIX = 'chat:answer'
+
+# Roughly what one streamed chunk from the model looks like
+REPLAY_WORDS = 8
+
+CachedAnswer = namedtuple('CachedAnswer', 'text model stored_at')
+
+metrics.register_counters('answer_cache.hits', 'answer_cache.misses', 'answer_cache.evictions')
+
+non_word_pattern = re.compile(r"[^\w\s]+")
+word_pattern = re.compile(r"\S+\s*")
+
+
+def normalize_question(text):
+    """'  Are you available for HIRE?? ' -> 'are you available for hire'"""
+    return " ".join(non_word_pattern.sub(" ", (text or "").lower()).split())
+
+
+def question_fingerprint(text):
+    """Same for every phrasing that normalizes to the same question."""
+    return hashlib.sha1(normalize_question(text).encode()).hexdigest()
+
+
+def history_digest(chat_history):
+    if not chat_history:
+        return 'none'
+    encoded = json.dumps(chat_history, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.sha1(encoded).hexdigest()
+
+
+def answer_key(version, chat_history, question):
+    return f"{ANSWER_CACHE_PREFIX}:{version}:{history_digest(chat_history)}:{question_fingerprint(question)}"
+
+
+def answer_size(text):
+    return len(text.encode())
+
+
+def replay_chunks(text):
+    """Splits a cached answer into chunks that join back to the same text."""
+    words = word_pattern.findall(text)
+    leading = text[:len(text) - len("".join(words))]
+    chunks = ["".join(words[start:start + REPLAY_WORDS]) for start in range(0, len(words), REPLAY_WORDS)]
+    if leading:
+        chunks = [leading + (chunks[0] if chunks else "")] + chunks[1:]
+    return chunks
+
+
+class AnswerCache:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def _limits(self):
+        return (
+            getattr(settings, 'ANSWER_CACHE_TTL', 6 * 60 * 60),
+            getattr(settings, 'ANSWER_CACHE_MAX_ENTRIES', 500),
+            getattr(settings, 'ANSWER_CACHE_MAX_BYTES', 2 * 1024 * 1024),
+        )
+
+    def _evict(self, max_entries, max_bytes):
+        while self.entries and (len(self.entries) > max_entries or self.size > max_bytes):
+            _key, answer = self.entries.popitem(last=False)
+            self.size -= answer_size(answer.text)
+            metrics.incr('answer_cache.evictions')
+
+    def get(self, version, chat_history, question):
+        ttl, max_entries, max_bytes = self._limits()
+        key = answer_key(version, chat_history, question)
+        now = time.time()
+        with self.lock:
+            answer = self.entries.get(key)
+            if answer is not None:
+                if now - answer.stored_at <= ttl:
+                    self.entries.move_to_end(key)
+                    metrics.incr('answer_cache.hits')
+                    return answer
+                del self.entries[key]
+                self.size -= answer_size(answer.text)
+
+        answer = cache.get(key)
+        if answer is None or now - answer.stored_at > ttl:
+            metrics.incr('answer_cache.misses')
+            return None
+        self._remember(key, answer, max_entries, max_bytes)
+        metrics.incr('answer_cache.hits')
+        return answer
+
+    def set(self, version, chat_history, question, text, model):
+        ttl, max_entries, max_bytes = self._limits()
+        if not text or answer_size(text) > max_bytes:
+            return
+        key = answer_key(version, chat_history, question)
+        answer = CachedAnswer(text, model, time.time())
+        cache.set(key, answer, timeout=ttl)
+        self._remember(key, answer, max_entries, max_bytes)
+
+    def _remember(self, key, answer, max_entries, max_bytes):
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= answer_size(previous.text)
+            self.entries[key] = answer
+            self.size += answer_size(answer.text)
+            self._evict(max_entries, max_bytes)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+answer_cache = AnswerCache()
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Registers the signal handlers that invalidate the content snapshot
+        from . import content  # noqa: F401
+        # Tunes every new SQLite connection
+        from . import sqlite  # noqa: F401
+        # Builds responsive image variants after Profile/Certification saves
+        from . import images  # noqa: F401
+        # Counts the references to stored media files
+        from . import media_refs  # noqa: F401
+        # Renders certificate thumbnails
+        from . import thumbnails  # noqa: F401
+        # Wakes the contact outbox dispatcher when a message is saved
+        from . import outbox  # noqa: F401
@@ -0,0 +1,204 @@
+# main/chat_analytics.py
+"""
+Chat analytics kept as running totals instead of queries over ChatLog.
+
+Every batch the ChatLog writer stores also goes through add_to_rollups(), in
+the same transaction. The batch is added to three small tables, keyed by day:
+
+- ChatDailyRollup: chats and response characters per model;
+- ChatQuestionRollup: chats per normalized question (question_fingerprint);
+- ChatLengthRollup: a response-length histogram per model.
+
+Each table gets one upsert per batch, whatever the batch size. The totals
+include rows that chat_retention.py has since archived and deleted. The
+admin dashboard (dashboard()) reads at most a window of days from these
+tables and never touches ChatLog, so its cost does not depend on how many
+chats were logged.
+
+ChatQuestionRollup gains a row per distinct question per day. Once no
+dashboard window reaches a month, compact_question_rollups() folds its days
+into one row per question, dated the 1st. The archive_chatlogs command runs
+it. The totals outlive the archived ChatLog rows, just at a coarser
+grain. The other two tables hold a few rows per day and are kept as they are.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .answer_cache import normalize_question, question_fingerprint
+from .models import ChatDailyRollup, ChatLengthRollup, ChatQuestionRollup
+
+# Lower bounds of the response-length buckets, in characters
+LENGTH_BUCKETS = (0, 100, 250, 500, 1000, 2000, 4000)
+
+TOP_QUESTIONS = 20
+
+DASHBOARD_WINDOWS = (7, 30, 90, 365)
+
+
+def length_bucket(length):
+    return max(bound for bound in LENGTH_BUCKETS if bound <= length)
+
+
+def bucket_label(min_chars):
+    upper = [bound for bound in LENGTH_BUCKETS if bound > min_chars]
+    return f"{min_chars}–{upper[0] - 1}" if upper else f"{min_chars}+"
+
+
+def tally(rows):
+    """
+    Counts a batch of ChatLog field dicts. Returns Counters keyed like the
+    three rollup tables, and an example question per fingerprint.
+    """
+    daily, questions, lengths = Counter(), Counter(), Counter()
+    examples = {}
+    for row in rows:
+        day = timezone.localdate(row['timestamp'])
+        model = row.get('model_used') or ''
+        response_length = len(row.get('ai_response') or '')
+        daily[day, model, 'chats'] += 1
+        daily[day, model, 'response_chars'] += response_length
+        fingerprint = question_fingerprint(row['user_query'])
+        questions[day, fingerprint] += 1
+        examples.setdefault(fingerprint, normalize_question(row['user_query'])[:300])
+        lengths[day, model, length_bucket(response_length)] += 1
+    return daily, questions, lengths, examples
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _add_questions(cursor, questions, examples):
+    question_table = _table(ChatQuestionRollup)
+    cursor.executemany(
+        f"""INSERT INTO {question_table} (day, fingerprint, question, chats) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (day, fingerprint) DO UPDATE SET chats = {question_table}.chats + excluded.chats""",
+        [
+            (day.isoformat(), fingerprint, examples[fingerprint], chats)
+            for (day, fingerprint), chats in sorted(questions.items())
+        ],
+    )
+
+
+def add_to_rollups(rows):
+    """
+    Adds a batch of ChatLog field dicts to the rollup tables, one upsert per
+    table. Call it inside the transaction that stores the rows.
+    """
+    daily, questions, lengths, examples = tally(rows)
+    if not questions:
+        return
+    models = {key[:2] for key in daily}
+    daily_table = _table(ChatDailyRollup)
+    length_table = _table(ChatLengthRollup)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"""INSERT INTO {daily_table} (day, model_used, chats, response_chars) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (day, model_used) DO UPDATE SET
+                chats = {daily_table}.chats + excluded.chats,
+                response_chars = {daily_table}.response_chars + excluded.response_chars""",
+            [
+                (day.isoformat(), model, daily[day, model, 'chats'], daily[day, model, 'response_chars'])
+                for day, model in sorted(models)
+            ],
+        )
+        _add_questions(cursor, questions, examples)
+        cursor.executemany(
+            f"""INSERT INTO {length_table} (day, model_used, min_chars, chats) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (day, model_used, min_chars) DO UPDATE SET chats = {length_table}.chats + excluded.chats""",
+            [
+                (day.isoformat(), model, min_chars, chats)
+                for (day, model, min_chars), chats in sorted(lengths.items())
+            ],
+        )
+
+
+def compact_question_rollups(today=None):
+    """
+    Folds the daily question rollups of the months no dashboard window
+    reaches into monthly ones. Returns the number of daily rows folded.
+    """
+    today = today or timezone.localdate()
+    oldest_shown = today - timedelta(days=max(DASHBOARD_WINDOWS) - 1)
+    daily = ChatQuestionRollup.objects.filter(day__lt=oldest_shown.replace(day=1)).exclude(day__day=1)
+    with transaction.atomic():
+        monthly, examples = Counter(), {}
+        for day, fingerprint, question, chats in daily.values_list('day', 'fingerprint', 'question', 'chats').iterator():
+            monthly[day.replace(day=1), fingerprint] += chats
+            examples.setdefault(fingerprint, question)
+        if not monthly:
+            return 0
+        folded, _ = daily.delete()
+        with connection.cursor() as cursor:
+            _add_questions(cursor, monthly, examples)
+    return folded
+
+
+def dashboard(days=30, today=None):
+    """
+    Figures for the last `days` days, from the rollup tables alone. Three
+    queries, each bounded by the window.
+    """
+    today = today or timezone.localdate()
+    since = today - timedelta(days=days - 1)
+
+    per_day = Counter()
+    per_model = {}
+    for rollup in ChatDailyRollup.objects.filter(day__gte=since, day__lte=today):
+        per_day[rollup.day] += rollup.chats
+        figures = per_model.setdefault(rollup.model_used, {'model': rollup.model_used, 'chats': 0, 'response_chars': 0})
+        figures['chats'] += rollup.chats
+        figures['response_chars'] += rollup.response_chars
+
+    models = sorted(per_model.values(), key=lambda figures: -figures['chats'])
+    for figures in models:
+        figures['average_length'] = figures['response_chars'] / figures['chats'] if figures['chats'] else 0
+    total_chats = sum(figures['chats'] for figures in models)
+    total_chars = sum(figures['response_chars'] for figures in models)
+
+    questions = list(
+        ChatQuestionRollup.objects.filter(day__gte=since, day__lte=today)
+        .values('fingerprint')
+        .annotate(question=Max('question'), chats=Sum('chats'))
+        .order_by('-chats', 'question')[:TOP_QUESTIONS]
+    )
+
+    lengths = dict(
+        ChatLengthRollup.objects.filter(day__gte=since, day__lte=today)
+        .values('min_chars').annotate(chats=Sum('chats')).values_list('min_chars', 'chats')
+    )
+    busiest = max(lengths.values(), default=0)
+    histogram = [
+        {
+            'label': bucket_label(bound),
+            'chats': lengths.get(bound, 0),
+            'percent': round(100 * lengths.get(bound, 0) / busiest) if busiest else 0,
+        }
+        for bound in LENGTH_BUCKETS
+    ]
+
+    busiest_day = max(per_day.values(), default=0)
+    timeline = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        timeline.append({
+            'day': day,
+            'chats': per_day.get(day, 0),
+            'percent': round(100 * per_day.get(day, 0) / busiest_day) if busiest_day else 0,
+        })
+
+    return {
+        'days': days,
+        'since': since,
+        'today': today,
+        'total_chats': total_chats,
+        'average_length': total_chars / total_chats if total_chats else 0,
+        'models': models,
+        'questions': questions,
+        'histogram': histogram,
+        'timeline': timeline,
+    }
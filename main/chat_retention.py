@@ -0,0 +1,204 @@
+# main/chat_retention.py
+"""
+Retention for ChatLog: old rows are archived and deleted.
+
+archive_chatlogs() handles one UTC day at a time, for every day before the
+cutoff that still has rows. Each day goes through two passes.
+
+1. Archive. The day's rows are streamed in primary-key order, in pages of
+   batch_size, into CHATLOG_ARCHIVE_DIR/YYYY/MM/chatlog-YYYY-MM-DD.jsonl.gz.
+   The file is written next to its final name, fsynced and renamed, so an
+   archive is either complete or absent. Memory use does not grow with the
+   table.
+2. Delete. The archived rows are removed in batches, each in a short
+   transaction, so writers wait at most one batch for the lock. The
+   analytics rollups counted the rows when they were written (see
+   chat_analytics.py) and keep them.
+
+A rerun after a crash is safe. A day's archive records the highest id it
+holds. Rows up to that id are only deleted; newer ones, such as
+rows replayed from the writer's spill file, are appended to the archive as
+another gzip member.
+
+Deleted pages go to SQLite's freelist. With auto_vacuum=INCREMENTAL they are
+handed back to the file system in small steps afterwards. A database created
+before that PRAGMA was set needs one full VACUUM first; the archive_chatlogs
+command does it with --enable-incremental-vacuum.
+"""
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import time as clock
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import metrics
+from .models import ChatLog
+
+metrics.register_counters('chat_retention.archived', 'chat_retention.deleted')
+
+ARCHIVE_FIELDS = ('id', 'timestamp', 'session_key', 'model_used', 'user_query', 'ai_response', 'follower_sessions')
+
+# Pages handed back per PRAGMA incremental_vacuum step
+VACUUM_STEP_PAGES = 1000
+
+DayResult = namedtuple('DayResult', 'day archived deleted path')
+
+
+def retention_cutoff(days, now=None):
+    """Start of the oldest day that is kept."""
+    today = timezone.localdate(now or timezone.now())
+    return day_start(today - timedelta(days=days))
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def archive_path(day):
+    archive_dir = getattr(settings, 'CHATLOG_ARCHIVE_DIR', 'chatlog_archive')
+    return os.path.join(archive_dir, f"{day:%Y}", f"{day:%m}", f"chatlog-{day:%Y-%m-%d}.jsonl.gz")
+
+
+def archived_upto(path):
+    """Highest id already in an archive, read as a stream. 0 when there is none."""
+    if not os.path.exists(path):
+        return 0
+    highest = 0
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        for line in archive:
+            highest = max(highest, json.loads(line)['id'])
+    return highest
+
+
+def _pages(queryset, batch_size, fields):
+    # Keyset pagination: each page is an indexed range scan, not an OFFSET
+    last_pk = 0
+    while True:
+        page = list(queryset.filter(pk__gt=last_pk).order_by('pk').values(*fields)[:batch_size])
+        if not page:
+            return
+        yield page
+        last_pk = page[-1]['id']
+
+
+def _encode(row):
+    return json.dumps({**row, 'timestamp': row['timestamp'].isoformat()}, ensure_ascii=False)
+
+
+def write_archive(day_rows, path, after_id, batch_size):
+    """
+    Appends the rows with an id above after_id to the day's archive. Returns
+    (rows written, highest id written).
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    written, highest = 0, after_id
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.partial')
+    try:
+        with os.fdopen(handle, 'wb') as temp:
+            # Concatenated gzip members read back as one stream
+            if os.path.exists(path):
+                with open(path, 'rb') as existing:
+                    shutil.copyfileobj(existing, temp)
+            with gzip.GzipFile(fileobj=temp, mode='wb') as archive:
+                for page in _pages(day_rows.filter(pk__gt=after_id), batch_size, ARCHIVE_FIELDS):
+                    archive.write("".join(_encode(row) + "\n" for row in page).encode())
+                    written += len(page)
+                    highest = page[-1]['id']
+            temp.flush()
+            os.fsync(temp.fileno())
+        if written:
+            os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+    return written, highest
+
+
+def delete_archived(day_rows, upto_id, batch_size, pause=0):
+    """Deletes the day's rows up to upto_id, one batch per transaction."""
+    rows = day_rows.filter(pk__lte=upto_id)
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            page = list(rows.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not page:
+                return deleted
+            rows.filter(pk__gte=page[0], pk__lte=page[-1]).delete()
+        deleted += len(page)
+        metrics.incr('chat_retention.deleted', len(page))
+        if pause:
+            clock.sleep(pause)
+
+
+def archive_day(day, cutoff, batch_size=500, pause=0):
+    start = day_start(day)
+    day_rows = ChatLog.objects.filter(timestamp__gte=start, timestamp__lt=min(start + timedelta(days=1), cutoff))
+    path = archive_path(day)
+    done_upto = archived_upto(path)
+    archived, upto_id = write_archive(day_rows, path, done_upto, batch_size)
+    metrics.incr('chat_retention.archived', archived)
+    deleted = delete_archived(day_rows, upto_id, batch_size, pause)
+    return DayResult(day, archived, deleted, path)
+
+
+def archive_chatlogs(cutoff, batch_size=500, pause=0):
+    """Archives and deletes every ChatLog row older than cutoff. Yields a DayResult per day."""
+    remaining = ChatLog.objects.filter(timestamp__lt=cutoff)
+    while True:
+        oldest = remaining.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if oldest is None:
+            return
+        day = timezone.localdate(oldest)
+        yield archive_day(day, cutoff, batch_size, pause)
+        # Rows written to this day meanwhile wait for the next run
+        remaining = remaining.filter(timestamp__gte=day_start(day + timedelta(days=1)))
+
+
+def auto_vacuum_mode():
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum")
+        return cursor.fetchone()[0]
+
+
+def enable_incremental_vacuum():
+    """One-off: switching an existing database to auto_vacuum=INCREMENTAL takes a full VACUUM."""
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # VACUUM copies the whole database; keep that copy on disk, not in memory
+        cursor.execute("PRAGMA temp_store = FILE")
+        cursor.execute("VACUUM")
+
+
+def incremental_vacuum(step_pages=VACUUM_STEP_PAGES):
+    """
+    Returns free pages to the file system in short transactions. Returns the
+    number of pages freed, or None when the database does not use incremental
+    auto-vacuum.
+    """
+    if connection.vendor != 'sqlite' or auto_vacuum_mode() != 2:
+        return None
+    freed = 0
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA freelist_count")
+        while True:
+            step = min(cursor.fetchone()[0], step_pages)
+            if not step:
+                break
+            # Python's sqlite3 steps this PRAGMA once per execute, which frees
+            # one page; a transaction per step keeps that to one commit
+            with transaction.atomic():
+                for _ in range(step):
+                    cursor.execute("PRAGMA incremental_vacuum(1)")
+                # Finishes the last PRAGMA before the commit
+                cursor.execute("PRAGMA freelist_count")
+            freed += step
+        if not connection.in_atomic_block:
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return freed
@@ -0,0 +1,57 @@
+# main/chat_search.py
+"""
+Full-text search over ChatLog using SQLite FTS5.
+
+main_chatlog_fts is an external-content FTS5 table over user_query and
+ai_response. Triggers keep it in step with main_chatlog, so rows written by
+bulk_create or raw SQL are indexed too (see migration 0023). The admin uses
+search_chatlogs() instead of LIKE '%term%' scans. Results are ranked with
+bm25 and come with a highlighted snippet.
+
+On other databases, or when SQLite was built without FTS5 and the migration
+skipped the table, fts_available() is False and the admin falls back to its
+usual search.
+"""
+from django.db import connection
+
+FTS_TABLE = 'main_chatlog_fts'
+
+# Private-use characters mark the matched terms in snippets; they are swapped
+# for <mark> tags after the text is escaped
+MARK_START = '\ue000'
+MARK_END = '\ue001'
+
+
+def fts_available(using=connection):
+    if using.vendor != 'sqlite':
+        return False
+    with using.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        return cursor.fetchone() is not None
+
+
+def fts_query(search_term):
+    """
+    Turns admin input into an FTS5 query: every word must appear, as a prefix.
+    Words are quoted, so FTS5 operators typed by the user are matched literally.
+    """
+    words = search_term.split()
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in words)
+
+
+def search_chatlogs(search_term, limit=1000, using=connection):
+    """
+    Returns up to `limit` (id, snippet) pairs for the best matches, best first.
+    The snippet is taken from whichever column matched best.
+    """
+    query = fts_query(search_term)
+    if not query:
+        return []
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT rowid, snippet({FTS_TABLE}, -1, %s, %s, '…', 16)
+                FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s
+                ORDER BY bm25({FTS_TABLE}) LIMIT %s""",
+            [MARK_START, MARK_END, query, limit],
+        )
+        return cursor.fetchall()
@@ -0,0 +1,170 @@
+# main/chatlog_writer.py
+"""
+Buffered ChatLog persistence.
+
+Chat views hand finished exchanges to record() instead of inserting a row
+each. Records are queued in process memory and written with one bulk_create
+in three cases:
+
+- CHATLOG_BATCH_SIZE records are waiting;
+- the oldest one has waited CHATLOG_FLUSH_INTERVAL seconds;
+- the process exits.
+
+A background thread does the timed flushes, so chat requests do not wait on
+SQLite write locks. The same transaction adds the batch to the analytics
+rollups (see chat_analytics.py).
+
+If the database is locked or unavailable, the batch is appended to a JSONL
+spill file (CHATLOG_SPILL_PATH) and fsynced. The next successful flush in any
+process replays it. With CHATLOG_FLUSH_INTERVAL = 0 there is no background
+thread and batches are written by the request that fills them.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import metrics
+from .chat_analytics import add_to_rollups
+from .models import ChatLog
+
+metrics.register_counters('chatlog_writer.rows', 'chatlog_writer.flushes', 'chatlog_writer.spilled')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _encode(fields):
+    return json.dumps({**fields, 'timestamp': fields['timestamp'].isoformat()})
+
+
+def _decode(line):
+    fields = json.loads(line)
+    fields['timestamp'] = parse_datetime(fields['timestamp'])
+    return fields
+
+
+class ChatLogWriter:
+    def __init__(self):
+        self.pending = []
+        self.oldest_at = None
+        # Guards pending; flush_lock keeps one batch in flight per process
+        self.changed = threading.Condition()
+        self.flush_lock = threading.Lock()
+        self.thread = None
+
+    def record(self, **fields):
+        fields.setdefault('timestamp', timezone.now())
+        with self.changed:
+            if not self.pending:
+                self.oldest_at = time.monotonic()
+            self.pending.append(fields)
+            full = len(self.pending) >= _setting('CHATLOG_BATCH_SIZE', 50)
+            if self._start_thread():
+                if full:
+                    self.changed.notify()
+                return
+        if full:
+            self.flush()
+
+    def _start_thread(self):
+        # Called with self.changed held
+        if _setting('CHATLOG_FLUSH_INTERVAL', 2.0) <= 0:
+            return False
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self._run, name='chatlog-writer', daemon=True)
+            self.thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            interval = _setting('CHATLOG_FLUSH_INTERVAL', 2.0)
+            with self.changed:
+                while not self._due(interval):
+                    self.changed.wait(interval)
+            self.flush()
+            close_old_connections()
+
+    def _due(self, interval):
+        if not self.pending:
+            return False
+        return (
+            len(self.pending) >= _setting('CHATLOG_BATCH_SIZE', 50)
+            or time.monotonic() - self.oldest_at >= interval
+        )
+
+    def flush(self):
+        """Writes everything queued so far. Returns the number of rows stored."""
+        with self.flush_lock:
+            with self.changed:
+                batch, self.pending = self.pending, []
+            stored = self._write(batch) if batch else 0
+            if stored or not batch:
+                stored += self._replay_spill()
+            return stored
+
+    def _write(self, batch):
+        try:
+            with transaction.atomic():
+                ChatLog.objects.bulk_create([ChatLog(**fields) for fields in batch])
+                add_to_rollups(batch)
+        except DatabaseError as e:
+            print(f"ChatLog writer: spilling {len(batch)} rows ({e})")
+            self._spill(batch)
+            return 0
+        metrics.incr('chatlog_writer.flushes')
+        metrics.incr('chatlog_writer.rows', len(batch))
+        return len(batch)
+
+    def _spill(self, batch):
+        with open(_setting('CHATLOG_SPILL_PATH', 'chatlog_spill.jsonl'), 'a', encoding='utf-8') as spill:
+            spill.write("".join(_encode(fields) + "\n" for fields in batch))
+            spill.flush()
+            os.fsync(spill.fileno())
+        metrics.incr('chatlog_writer.spilled', len(batch))
+
+    def _replay_spill(self):
+        path = _setting('CHATLOG_SPILL_PATH', 'chatlog_spill.jsonl')
+        claimed = f"{path}.{os.getpid()}.replay"
+        try:
+            # Atomic, so only one process replays a given file
+            os.replace(path, claimed)
+        except FileNotFoundError:
+            return 0
+        batch = []
+        with open(claimed, encoding='utf-8') as spill:
+            for line in spill:
+                try:
+                    batch.append(_decode(line))
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    continue
+        stored = self._write(batch) if batch else 0
+        os.unlink(claimed)
+        return stored
+
+    def discard(self):
+        with self.changed:
+            self.pending = []
+
+
+chatlog_writer = ChatLogWriter()
+
+
+def _reset_after_fork():
+    # The flusher thread does not survive a fork; the child starts its own
+    chatlog_writer.changed = threading.Condition()
+    chatlog_writer.flush_lock = threading.Lock()
+    chatlog_writer.pending = []
+    chatlog_writer.thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(chatlog_writer.flush)
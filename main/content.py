@@ -0,0 +1,149 @@
+# main/content.py
+"""
+Versioned snapshot of everything the portfolio page shows.
+
+The page content only changes when someone edits it in the admin, so it is
+loaded once into an immutable bundle and kept in process memory. A version
+counter lives in the shared cache; saving or deleting any content model bumps
+it, and every worker notices the new number on its next request and rebuilds.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+
+from .models import Project, Skill, Profile, Experience, OtherLinks, Education, Certification
+
+CONTENT_VERSION_KEY = 'portfolio:content-version'
+CONTENT_CHANGED_AT_KEY = 'portfolio:content-changed-at'
+
+# Models whose rows end up on the page. ChatLog and ContactMessage are left out
+# on purpose: they are written by visitors and would flush the cache constantly.
+CONTENT_MODELS = (Profile, Project, Skill, Experience, OtherLinks, Education, Certification)
+
+
+@dataclass(frozen=True)
+class PortfolioSnapshot:
+    version: int
+    profile: Profile | None
+    full_name: str
+    projects: tuple
+    grouped_skills: MappingProxyType
+    experiences: tuple
+    other_links: tuple
+    education: tuple
+    certificates: tuple
+    last_modified: datetime
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+# ---------------------------------------------------
+# VERSION COUNTER
+# ---------------------------------------------------
+
+def _fresh_version():
+    # Seeded from the clock so a counter lost to cache eviction never comes
+    # back with a number some worker still has a snapshot for.
+    return time.time_ns()
+
+
+def get_content_version():
+    version = cache.get(CONTENT_VERSION_KEY)
+    if version is None:
+        cache.add(CONTENT_VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(CONTENT_VERSION_KEY)
+    return version
+
+
+def get_content_changed_at():
+    changed_at = cache.get(CONTENT_CHANGED_AT_KEY)
+    if changed_at is None:
+        cache.add(CONTENT_CHANGED_AT_KEY, timezone.now(), timeout=None)
+        changed_at = cache.get(CONTENT_CHANGED_AT_KEY)
+    return changed_at
+
+
+def bump_content_version():
+    cache.set(CONTENT_CHANGED_AT_KEY, timezone.now(), timeout=None)
+    try:
+        return cache.incr(CONTENT_VERSION_KEY)
+    except ValueError:
+        version = _fresh_version()
+        cache.set(CONTENT_VERSION_KEY, version, timeout=None)
+        return version
+
+
+def invalidate_content(sender, **kwargs):
+    # Wait for the commit, otherwise another worker could rebuild from the
+    # old rows and keep that stale copy under the new version number.
+    transaction.on_commit(bump_content_version)
+
+
+for _model in CONTENT_MODELS:
+    post_save.connect(invalidate_content, sender=_model, dispatch_uid=f'content-save-{_model.__name__}')
+    post_delete.connect(invalidate_content, sender=_model, dispatch_uid=f'content-delete-{_model.__name__}')
+
+# ---------------------------------------------------
+# SNAPSHOT
+# ---------------------------------------------------
+
+def group_skills(skills):
+    """
+    Buckets skills by category in one pass, keeping the CATEGORY_CHOICES
+    order and dropping empty categories.
+    """
+    buckets = {choice[0]: [] for choice in Skill.CATEGORY_CHOICES}
+    for skill in skills:
+        bucket = buckets.get(skill.category)
+        if bucket is not None:
+            bucket.append(skill)
+    return {cat: skills for cat, skills in buckets.items() if skills}
+
+
+def build_snapshot(version):
+    profile = Profile.objects.first()
+    full_name = ""
+    if profile:
+        full_name = f"{profile.fname} {profile.mname or ''} {profile.lname}".strip().replace('  ', ' ')
+
+    projects = tuple(Project.objects.all().order_by("-created_at"))
+    experiences = tuple(Experience.objects.all())
+    # Most models have no timestamp of their own, so edits are covered by the
+    # time the version was last bumped.
+    last_modified = max(
+        [get_content_changed_at()] + [row.created_at for row in projects + experiences]
+    )
+
+    return PortfolioSnapshot(
+        version=version,
+        profile=profile,
+        full_name=full_name,
+        projects=projects,
+        grouped_skills=MappingProxyType(group_skills(Skill.objects.order_by('category', 'pk'))),
+        experiences=experiences,
+        other_links=tuple(OtherLinks.objects.all()),
+        education=tuple(Education.objects.all().order_by("-admissionYear")),
+        certificates=tuple(Certification.objects.all().order_by("-year")),
+        last_modified=last_modified,
+    )
+
+
+def get_snapshot():
+    global _snapshot
+    version = get_content_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = build_snapshot(version)
+        return _snapshot
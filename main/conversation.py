@@ -0,0 +1,96 @@
+# main/conversation.py
+"""
+Chatbot conversations, kept in the cache instead of the session.
+
+The session only provides the key. Writing chat_history into a database
+session rewrote the whole django_session row on every message, and the
+history grew with the conversation. Here each conversation is a small ring
+buffer of the last CHAT_HISTORY_MESSAGES messages under one cache key.
+
+Questions that fall out of the buffer are folded into a short rolling
+synopsis when CHAT_HISTORY_SYNOPSIS is on. This is extractive, built from the
+questions themselves, so it costs no model call. What goes into the prompt is
+capped at CHAT_HISTORY_TOKEN_BUDGET. Both the stored entry and the prompt
+history therefore stay the same size however long the chat runs.
+"""
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .retrieval import estimate_tokens
+
+CONVERSATION_PREFIX = 'chat:conversation'
+
+Conversation = namedtuple('Conversation', 'turns synopsis')
+
+EMPTY = Conversation((), '')
+
+
+def _key(session_key):
+    return f"{CONVERSATION_PREFIX}:{session_key}"
+
+
+def load_conversation(session_key):
+    if not session_key:
+        return EMPTY
+    stored = cache.get(_key(session_key))
+    if stored is None:
+        return EMPTY
+    return Conversation(tuple(stored['turns']), stored['synopsis'])
+
+
+def _fold(synopsis, questions):
+    """Adds evicted questions to the synopsis, dropping the oldest past its budget."""
+    if not getattr(settings, 'CHAT_HISTORY_SYNOPSIS', True):
+        return ''
+    topics = [topic for topic in synopsis.split('; ') if topic] + [" ".join(q.split()) for q in questions]
+    budget = getattr(settings, 'CHAT_SYNOPSIS_TOKEN_BUDGET', 80)
+    while topics and estimate_tokens('; '.join(topics)) > budget:
+        topics.pop(0)
+    return '; '.join(topics)
+
+
+def append_exchange(session_key, user_query, answer):
+    """Stores one question and answer and returns the updated conversation."""
+    conversation = load_conversation(session_key)
+    turns = list(conversation.turns) + [
+        {'role': 'user', 'content': user_query},
+        {'role': 'assistant', 'content': answer},
+    ]
+    limit = getattr(settings, 'CHAT_HISTORY_MESSAGES', 10)
+    evicted, turns = turns[:-limit], turns[-limit:]
+    synopsis = conversation.synopsis
+    if evicted:
+        synopsis = _fold(synopsis, [turn['content'] for turn in evicted if turn['role'] == 'user'])
+
+    cache.set(
+        _key(session_key),
+        {'turns': turns, 'synopsis': synopsis},
+        timeout=getattr(settings, 'CHAT_HISTORY_TIMEOUT', 2 * 60 * 60),
+    )
+    return Conversation(tuple(turns), synopsis)
+
+
+def prompt_history(conversation):
+    """
+    The messages to show the model, newest kept first, within the token
+    budget. A synopsis comes first as a 'synopsis' message.
+    """
+    budget = getattr(settings, 'CHAT_HISTORY_TOKEN_BUDGET', 400)
+    history = []
+    if conversation.synopsis:
+        history.append({'role': 'synopsis', 'content': conversation.synopsis})
+        budget -= estimate_tokens(conversation.synopsis)
+
+    recent = []
+    for turn in reversed(conversation.turns):
+        cost = estimate_tokens(turn['content'])
+        if cost > budget:
+            if not recent and budget > 0:
+                # Keep the start of a very long last answer rather than nothing
+                recent.append({'role': turn['role'], 'content': turn['content'][:budget * 4]})
+            break
+        recent.append(turn)
+        budget -= cost
+    return history + recent[::-1]
@@ -0,0 +1,86 @@
+# main/genai_client.py
+"""
+One Gemini client per process instead of one per chat message.
+
+genai.Client owns httpx connection pools, so reusing it keeps TCP and TLS
+sessions alive between messages. The sync client is shared by all threads.
+The async side gets one client per event loop, because httpx async pools
+cannot move between loops (the WSGI fallback runs each async request in a
+fresh loop). Clients are rebuilt after a fork and when GEMINI_API_KEY changes.
+"""
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+from google import genai
+from google.genai import types
+
+_lock = threading.Lock()
+_client = None
+_client_key = None
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _api_key():
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found in environment variables")
+    return api_key
+
+
+def build_genai_client(api_key):
+    limits = httpx.Limits(
+        max_connections=settings.GENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.GENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=settings.GENAI_KEEPALIVE_EXPIRY,
+    )
+    http_options = types.HttpOptions(
+        timeout=settings.GENAI_TIMEOUT_MS,
+        client_args={'limits': limits},
+        async_client_args={'limits': limits},
+    )
+    return genai.Client(api_key=api_key, http_options=http_options)
+
+
+def get_genai_client():
+    global _client, _client_key
+    key = (os.getpid(), _api_key())
+    client = _client
+    if client is not None and _client_key == key:
+        return client
+
+    with _lock:
+        if _client is None or _client_key != key:
+            _client = build_genai_client(key[1])
+            _client_key = key
+        return _client
+
+
+def get_async_genai_client():
+    """
+    Returns client.aio for the running event loop. Only that loop touches the
+    entry, so no lock is needed.
+    """
+    loop = asyncio.get_running_loop()
+    key = (os.getpid(), _api_key())
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != key:
+        entry = (key, build_genai_client(key[1]))
+        _async_clients[loop] = entry
+    return entry[1].aio
+
+
+def reset_genai_clients():
+    global _lock, _client, _client_key
+    _lock = threading.Lock()
+    _client = None
+    _client_key = None
+    _async_clients.clear()
+
+
+# gunicorn --preload forks after the app is imported; children must not share
+# the parent's sockets.
+os.register_at_fork(after_in_child=reset_genai_clients)
@@ -0,0 +1,218 @@
+# main/images.py
+"""
+Responsive variants of the images shown on the portfolio page.
+
+Uploads are shown as they were uploaded; the hero image alone is a 450 KB
+PNG. After a Profile or Certification is saved, its image is resized to the
+widths in IMAGE_FIELDS and encoded as AVIF and WebP (IMAGE_VARIANT_FORMATS,
+where this Pillow build supports them). A JPEG fallback is added, or a PNG one
+when the image has real transparency. The manifest is stored in the model's
+*_variants JSON field, and the {% picture %} tag (templatetags/images.py)
+turns it into <picture>/srcset markup.
+
+Variant files are named after the SHA-256 of their bytes, so their URLs
+never change meaning and may be cached forever. Re-encoding the same source
+gives the same name and nothing is written twice.
+
+The work runs on one background thread per process, after the save has
+committed. The finished manifest is written with a queryset update, and the
+content version is bumped so the page picks it up. With
+IMAGE_VARIANTS_IN_BACKGROUND = False it runs in the saving request instead.
+`manage.py build_image_variants` backfills existing rows.
+"""
+import hashlib
+import io
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from PIL import Image, ImageOps, features
+
+from . import metrics
+from .content import bump_content_version
+from .models import Certification, Profile
+
+ImageSpec = namedtuple('ImageSpec', 'model field manifest_field widths')
+
+IMAGE_FIELDS = (
+    # The hero is at most 512 CSS px wide; 1280 covers it at 2.5x
+    ImageSpec(Profile, 'profile_image', 'profile_image_variants', (320, 480, 640, 960, 1280)),
+    # Certificate cards are 300 or 400 CSS px wide
+    ImageSpec(Certification, 'thumbnail', 'thumbnail_variants', (320, 480, 640, 800)),
+)
+
+VARIANTS_DIR = 'variants'
+
+ENCODER_OPTIONS = {
+    'avif': {'format': 'AVIF', 'quality': 55, 'speed': 6},
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+    'png': {'format': 'PNG', 'optimize': True},
+}
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+
+metrics.register_counters('images.variant_sets', 'images.errors')
+metrics.register_timings('images.build')
+
+_executor = None
+
+
+def modern_formats():
+    wanted = getattr(settings, 'IMAGE_VARIANT_FORMATS', ('avif', 'webp'))
+    return [name for name in wanted if name in ENCODER_OPTIONS and features.check(name)]
+
+
+def has_transparency(image):
+    if image.mode == 'P':
+        return 'transparency' in image.info
+    if image.mode in ('RGBA', 'LA', 'PA'):
+        # Many exports carry an alpha channel that is opaque everywhere
+        return image.getchannel('A').getextrema()[0] < 255
+    return False
+
+
+def variant_widths(source_width, widths):
+    """The configured widths below the source's, plus one at full size."""
+    below = {width for width in widths if width < source_width}
+    return sorted(below | {min(source_width, max(widths))})
+
+
+def encode(image, format_name):
+    buffer = io.BytesIO()
+    image.save(buffer, **ENCODER_OPTIONS[format_name])
+    return buffer.getvalue()
+
+
+def store(storage, data, format_name):
+    digest = hashlib.sha256(data).hexdigest()
+    name = f"{VARIANTS_DIR}/{digest[:2]}/{digest[:32]}.{format_name}"
+    if not storage.exists(name):
+        name = storage.save(name, ContentFile(data))
+    return name
+
+
+def build_variants(field_file, widths):
+    """Encodes every variant of field_file and returns its manifest."""
+    started = time.perf_counter()
+    with field_file.open('rb') as source:
+        data = source.read()
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    alpha = has_transparency(image)
+    image = image.convert('RGBA' if alpha else 'RGB')
+    formats = modern_formats() + ['png' if alpha else 'jpeg']
+
+    manifest = {
+        'source': field_file.name,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'width': image.width,
+        'height': image.height,
+        'formats': {name: [] for name in formats},
+    }
+    for width in variant_widths(image.width, widths):
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.Resampling.LANCZOS)
+        for name in formats:
+            manifest['formats'][name].append([width, store(field_file.storage, encode(resized, name), name)])
+    metrics.observe('images.build', time.perf_counter() - started)
+    metrics.incr('images.variant_sets')
+    return manifest
+
+
+def refresh_variants(spec, pk, force=False):
+    """
+    Brings one row's manifest up to date with its image. Returns the new
+    manifest, or None when there was nothing to do.
+    """
+    instance = spec.model.objects.filter(pk=pk).first()
+    if instance is None:
+        return None
+    field_file = getattr(instance, spec.field)
+    current = getattr(instance, spec.manifest_field) or {}
+    if not field_file:
+        manifest = {}
+    elif current.get('source') == field_file.name and not force:
+        return None
+    else:
+        try:
+            manifest = build_variants(field_file, spec.widths)
+        except (OSError, Image.DecompressionBombError) as e:
+            # Missing file or not an image Pillow can read: the tag shows the original
+            print(f"Image variants failed for {spec.model.__name__} {pk}: {e}")
+            metrics.incr('images.errors')
+            manifest = {}
+    if manifest == current:
+        return None
+    # Only if the image was not replaced again meanwhile
+    if field_file:
+        unchanged = Q(**{spec.field: field_file.name})
+    else:
+        unchanged = Q(**{spec.field: ''}) | Q(**{f'{spec.field}__isnull': True})
+    updated = spec.model.objects.filter(unchanged, pk=pk).update(**{spec.manifest_field: manifest})
+    if updated:
+        transaction.on_commit(bump_content_version)
+    return manifest
+
+
+def _run(job, *args):
+    try:
+        job(*args)
+    except Exception as e:
+        print(f"Image job {job.__name__}{args} failed: {e}")
+        metrics.incr('images.errors')
+
+
+def _run_in_background(job, *args):
+    close_old_connections()
+    try:
+        _run(job, *args)
+    finally:
+        close_old_connections()
+
+
+def submit(job, *args):
+    """
+    Runs job(*args) on this process's image worker thread, or right away
+    when IMAGE_VARIANTS_IN_BACKGROUND is off. Jobs run one at a time, in order.
+    """
+    global _executor
+    if not getattr(settings, 'IMAGE_VARIANTS_IN_BACKGROUND', True):
+        return _run(job, *args)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-variants')
+    return _executor.submit(_run_in_background, job, *args)
+
+
+def schedule(spec, pk):
+    return submit(refresh_variants, spec, pk)
+
+
+def _image_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    for spec in IMAGE_FIELDS:
+        if spec.model is not sender:
+            continue
+        field_file = getattr(instance, spec.field)
+        manifest = getattr(instance, spec.manifest_field) or {}
+        if (field_file.name or '') != manifest.get('source', ''):
+            transaction.on_commit(lambda spec=spec, pk=instance.pk: schedule(spec, pk))
+
+
+for _spec in IMAGE_FIELDS:
+    post_save.connect(_image_saved, sender=_spec.model, dispatch_uid=f'image-variants-{_spec.model.__name__}')
+
+
+def _reset_after_fork():
+    # The worker thread does not survive a fork; the child starts its own
+    global _executor
+    _executor = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
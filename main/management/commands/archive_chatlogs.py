@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from main.chat_analytics import compact_question_rollups
+from main.chat_retention import (
+    archive_chatlogs, auto_vacuum_mode, enable_incremental_vacuum, incremental_vacuum, retention_cutoff,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Archives and deletes chat logs older than the retention period, folds old "
+        "question rollups into months, then returns the freed space to the file system. Safe to "
+        "run from cron, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHATLOG_RETENTION_DAYS, help="Days of chat logs to keep.")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per archive page and per delete transaction.")
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between delete batches.")
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help="Switch an existing SQLite database to auto_vacuum=INCREMENTAL with one full VACUUM first.",
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError("--days must be at least 1")
+        if options['enable_incremental_vacuum'] and connection.vendor == 'sqlite' and auto_vacuum_mode() != 2:
+            self.stdout.write("Running a full VACUUM to enable incremental auto-vacuum...")
+            enable_incremental_vacuum()
+
+        cutoff = retention_cutoff(options['days'])
+        total = 0
+        for result in archive_chatlogs(cutoff, batch_size=options['batch_size'], pause=options['pause']):
+            self.stdout.write(f"{result.day}: archived {result.archived}, deleted {result.deleted} -> {result.path}")
+            total += result.deleted
+        self.stdout.write(f"Deleted {total} chat log(s) from before {cutoff:%Y-%m-%d}")
+        self.stdout.write(f"Folded {compact_question_rollups()} daily question rollup(s) into monthly ones")
+
+        freed = incremental_vacuum()
+        if freed is None:
+            if connection.vendor == 'sqlite':
+                self.stdout.write("auto_vacuum is not INCREMENTAL; rerun with --enable-incremental-vacuum to reclaim space")
+        else:
+            self.stdout.write(f"Returned {freed} free page(s) to the file system")
@@ -0,0 +1,91 @@
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from main.chat_search import fts_available, search_chatlogs
+from main.models import ChatLog
+
+QUESTIONS = [
+    "What are his skills?", "Is he available for hire?", "Tell me about his projects",
+    "Where did he study?", "Does he know {word}?", "What did he build with {word}?",
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the admin's LIKE search with the FTS5 search on a synthetic chat log. "
+        "Runs against a throwaway database file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--vocabulary', type=int, default=20_000, help="Distinct synthetic words.")
+        parser.add_argument('--terms', default='python,w123,zyxw7,available hire', help="Comma separated searches.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_chat_search.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            if not fts_available():
+                self.stderr.write("This SQLite build has no FTS5; nothing to compare.")
+                return
+            started = time.perf_counter()
+            self.fill(options['rows'], options['vocabulary'])
+            self.stdout.write(f"Inserted {options['rows']} rows (indexed by triggers) in {time.perf_counter() - started:.1f}s")
+            self.stdout.write(f"{'search':<16} {'matches':>8} {'LIKE ms':>9} {'FTS5 ms':>9}")
+            for term in options['terms'].split(','):
+                self.compare(term)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def fill(self, rows, vocabulary):
+        rng = random.Random(42)
+        # A skewed vocabulary, like real text: a few common words, a long tail
+        words = [f"w{n}" for n in range(vocabulary)] + ['python', 'django', 'react', 'sql'] * 50
+        now = timezone.now()
+        batch = []
+        with connection.cursor() as cursor:
+            for n in range(rows):
+                question = rng.choice(QUESTIONS).format(word=rng.choice(words))
+                answer = " ".join(rng.choice(words) for _ in range(rng.randint(20, 60)))
+                batch.append((question, answer, now.isoformat(), 'models/bench', 'bench', '[]'))
+                if len(batch) == 10_000 or n == rows - 1:
+                    cursor.executemany(
+                        "INSERT INTO main_chatlog (user_query, ai_response, timestamp, model_used, session_key, follower_sessions) "
+                        "VALUES (%s, %s, %s, %s, %s, %s)",
+                        batch,
+                    )
+                    batch = []
+            # One needle for the rare-term search
+            cursor.execute(
+                "INSERT INTO main_chatlog (user_query, ai_response, timestamp, model_used, session_key, follower_sessions) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                ['Does he know zyxw7?', 'Only zyxw7.', now.isoformat(), 'models/bench', 'bench', '[]'],
+            )
+
+    def compare(self, term):
+        # What the admin does for one search: the first page plus the total for the paginator
+        started = time.perf_counter()
+        like = Q()
+        for word in term.split():
+            like &= Q(user_query__icontains=word) | Q(ai_response__icontains=word)
+        matches = ChatLog.objects.filter(like)
+        list(matches.order_by('-timestamp', '-pk')[:100])
+        matches.count()
+        like_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        hits = search_chatlogs(term, limit=1000)
+        list(ChatLog.objects.filter(pk__in=[pk for pk, _snippet in hits[:100]]))
+        fts_ms = (time.perf_counter() - started) * 1000
+
+        self.stdout.write(f"{term:<16} {len(hits):>8} {like_ms:>9.1f} {fts_ms:>9.1f}")
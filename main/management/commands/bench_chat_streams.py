@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import path
+
+from main.chatlog_writer import chatlog_writer
+from main.models import Profile
+from main.testing import FakeClient
+from main import views
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+# Both variants mounted side by side; used as ROOT_URLCONF while the benchmark runs
+urlpatterns = [
+    path('sync/', views.ai_chatBot),
+    path('async/', views.ai_chatBot_async),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test for the chatbot stream against a fake model. Compares the sync view "
+        "behind a fixed pool of sync workers with the async view on one event loop. "
+        "Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='10,50,200', help="Comma separated numbers of simultaneous chats.")
+        parser.add_argument('--chunks', type=int, default=20)
+        parser.add_argument('--chunk-delay', type=float, default=0.05, help="Seconds between streamed chunks.")
+        parser.add_argument('--sync-workers', type=int, default=4, help="Size of the simulated sync worker pool.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # A file database: in-memory SQLite locks whole tables between threads
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_chat_streams.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=LOCMEM_CACHE, RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False, ROOT_URLCONF=__name__):
+                Profile.objects.create(
+                    fname='Bench', lname='User', email='bench@example.com', phone='0000000000',
+                    github='https://github.com/bench', linkedin='https://linkedin.com/in/bench',
+                    objective='Benchmarking.', profession='Engineer',
+                )
+                self.run_benchmarks(options)
+                chatlog_writer.flush()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run_benchmarks(self, options):
+        fake = FakeClient({'models/fake-flash': ['token '] * options['chunks']}, chunk_delay=options['chunk_delay'])
+        stream_seconds = options['chunks'] * options['chunk_delay']
+        self.stdout.write(
+            f"One chat streams {options['chunks']} chunks over ~{stream_seconds:.2f}s; "
+            f"sync pool has {options['sync_workers']} workers"
+        )
+        self.stdout.write(f"{'mode':<6} {'chats':>6} {'wall s':>8} {'chats/s':>8} {'p95 s':>8}")
+
+        with mock.patch.object(views, 'get_genai_client', return_value=fake), \
+                mock.patch.object(views, 'get_async_genai_client', return_value=fake.aio):
+            for concurrency in [int(n) for n in options['concurrency'].split(',')]:
+                self.report('sync', concurrency, *self.run_sync(concurrency, options['sync_workers']))
+                self.report('async', concurrency, *async_to_sync(self.run_async)(concurrency))
+
+    def report(self, mode, chats, wall, latencies):
+        latencies.sort()
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        self.stdout.write(f"{mode:<6} {chats:>6} {wall:>8.2f} {chats / wall:>8.1f} {p95:>8.2f}")
+
+    def run_sync(self, concurrency, workers):
+        def chat(n):
+            started = time.perf_counter()
+            # Distinct questions, so the answer cache and coalescing stay out of the way
+            response = Client().post('/sync/', {'message': f'What are his skills? (sync {concurrency}/{n})'})
+            b''.join(response.streaming_content)
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(chat, range(concurrency)))
+        return time.perf_counter() - started, latencies
+
+    async def run_async(self, concurrency):
+        async def chat(n):
+            started = time.perf_counter()
+            response = await AsyncClient().post('/async/', {'message': f'What are his skills? (async {concurrency}/{n})'})
+            async for _chunk in response.streaming_content:
+                pass
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+        latencies = list(await asyncio.gather(*(chat(n) for n in range(concurrency))))
+        return time.perf_counter() - started, latencies
@@ -0,0 +1,104 @@
+import os
+import random
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main import views
+from main.models import Certification, Experience, Profile, Project, Skill
+from main.prompt import build_chat_prompt, get_grounding
+from main.testing import FakeClient
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+QUESTIONS = [
+    "What are his skills?",
+    "Are you available for hire?",
+    "Tell me about the Django projects",
+    "Which certifications does he hold?",
+    "Where did he work before?",
+    "How can I contact him?",
+]
+
+VOCABULARY = (
+    "django python api rest streaming cache sqlite postgres docker deploy booking payments "
+    "dashboard analytics react tailwind gemini llm search index latency queue worker email "
+    "admin testing security auth oauth websocket async celery redis pipeline etl pandas"
+).split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares prompt size and end-to-end chat latency with retrieval on and off, "
+        "on a synthetic portfolio and a fake model whose time to first token grows "
+        "with prompt size. Runs against a throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=40)
+        parser.add_argument('--words', type=int, default=150, help="Words per project/experience description.")
+        parser.add_argument('--rounds', type=int, default=5, help="Times each question is asked per mode.")
+        parser.add_argument('--prefill-ms-per-kb', type=float, default=8.0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_retrieval.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(CACHES=LOCMEM_CACHE, RATELIMIT_ENABLE=False, SECURE_SSL_REDIRECT=False):
+                self.populate(options['projects'], options['words'])
+                self.stdout.write(f"{'mode':<10} {'prompt KB':>10} {'build ms':>9} {'e2e ms':>8}")
+                for retrieval in (False, True):
+                    with override_settings(CHAT_RETRIEVAL=retrieval):
+                        self.run_mode(retrieval, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def populate(self, projects, words):
+        rng = random.Random(42)
+
+        def text():
+            return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+        Profile.objects.create(
+            fname='Bench', lname='User', email='bench@example.com', phone='0000000000',
+            github='https://github.com/bench', linkedin='https://linkedin.com/in/bench',
+            objective=text(), profession='Engineer',
+        )
+        for name in ('Python', 'Django', 'SQLite', 'Docker'):
+            Skill.objects.create(name=name, category='Framework')
+        for i in range(projects):
+            Project.objects.create(title=f"Project {i}", description=text(), technologies=rng.choice(VOCABULARY))
+        for i in range(projects // 4):
+            Experience.objects.create(company=f"Company {i}", role='Engineer', duration='1 year', description=text())
+            Certification.objects.create(courseName=f"Certificate {i}", year='2024-01-01', certificate='certificates/x.pdf')
+
+    def run_mode(self, retrieval, options):
+        fake = FakeClient({'models/fake-flash': ['ok']}, prefill_per_kb=options['prefill_ms_per_kb'] / 1000)
+        grounding = get_grounding()
+        sizes, builds, totals = [], [], []
+
+        with mock.patch.object(views, 'get_genai_client', return_value=fake):
+            for _ in range(options['rounds']):
+                for question in QUESTIONS:
+                    started = time.perf_counter()
+                    contents = build_chat_prompt(grounding, [], question)
+                    builds.append(time.perf_counter() - started)
+                    sizes.append(len(contents.encode()))
+
+                    started = time.perf_counter()
+                    response = Client().post('/chatbot-response/', {'message': question})
+                    b''.join(response.streaming_content)
+                    totals.append(time.perf_counter() - started)
+
+        self.stdout.write(
+            f"{'retrieval' if retrieval else 'everything':<10} {statistics.mean(sizes) / 1024:>10.1f} "
+            f"{statistics.mean(builds) * 1000:>9.2f} {statistics.mean(totals) * 1000:>8.1f}"
+        )
@@ -0,0 +1,138 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, connections
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main.models import ChatLog, Profile, Project
+
+# What the site ran with before main/sqlite.py: rollback journal, no pragmas,
+# deferred transactions and a new connection per request
+DEFAULTS = {
+    'pragmas': {'journal_mode': 'delete', 'synchronous': 'full'},
+    'transaction_mode': None,
+    'conn_max_age': 0,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the SQLite settings: reader threads load page data while "
+        "writer threads insert chat logs, first with SQLite defaults, then with the configured "
+        "PRAGMAs and persistent connections. Runs against a throwaway database file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--seconds', type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.gettempdir(), 'bench_sqlite.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            Profile.objects.create(
+                fname='Bench', lname='User', email='bench@example.com', phone='0000000000',
+                github='https://github.com/bench', linkedin='https://linkedin.com/in/bench',
+                objective='Benchmarking.', profession='Engineer',
+            )
+            Project.objects.bulk_create(
+                Project(title=f'Project {n}', description='words ' * 200, technologies='Django') for n in range(30)
+            )
+            connection.close()
+
+            tuned = {
+                'pragmas': settings.SQLITE_PRAGMAS,
+                'transaction_mode': settings.DATABASES['default']['OPTIONS'].get('transaction_mode'),
+                'conn_max_age': settings.DATABASES['default']['CONN_MAX_AGE'],
+            }
+            self.stdout.write(
+                f"{options['readers']} readers and {options['writers']} writers for {options['seconds']:.0f}s each"
+            )
+            self.stdout.write(f"{'config':<9} {'reads/s':>9} {'writes/s':>9} {'locked':>7} {'p99 write ms':>13}")
+            for label, config in (('defaults', DEFAULTS), ('tuned', tuned)):
+                self.report(label, *self.run(config, options))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, config, options):
+        db = settings.DATABASES['default']
+        saved = (db['CONN_MAX_AGE'], dict(db['OPTIONS']))
+        db['CONN_MAX_AGE'] = config['conn_max_age']
+        db['OPTIONS'].pop('transaction_mode', None)
+        if config['transaction_mode']:
+            db['OPTIONS']['transaction_mode'] = config['transaction_mode']
+
+        counts = {'reads': 0, 'writes': 0, 'locked': 0}
+        write_times = []
+        lock = threading.Lock()
+        deadline = time.monotonic() + options['seconds']
+
+        def request(work):
+            # What the request_started/request_finished signals do around a view
+            close_old_connections()
+            try:
+                work()
+            finally:
+                close_old_connections()
+
+        def reader():
+            def work():
+                list(Project.objects.order_by('-created_at'))
+                Profile.objects.first()
+            while time.monotonic() < deadline:
+                try:
+                    request(work)
+                except OperationalError:
+                    with lock:
+                        counts['locked'] += 1
+                    continue
+                with lock:
+                    counts['reads'] += 1
+            connections.close_all()
+
+        def writer():
+            def work():
+                ChatLog.objects.create(user_query='What are his skills?', ai_response='Python ' * 50, session_key='bench')
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                try:
+                    request(work)
+                except OperationalError:
+                    with lock:
+                        counts['locked'] += 1
+                    continue
+                with lock:
+                    counts['writes'] += 1
+                    write_times.append(time.perf_counter() - started)
+            connections.close_all()
+
+        try:
+            with override_settings(SQLITE_PRAGMAS=config['pragmas']):
+                # Switch the journal mode once, before anyone else is connected
+                connection.ensure_connection()
+                connection.close()
+                threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+                threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            db['CONN_MAX_AGE'], db['OPTIONS'] = saved[0], saved[1]
+        return counts, write_times, options['seconds']
+
+    def report(self, label, counts, write_times, seconds):
+        write_times.sort()
+        p99 = write_times[int(len(write_times) * 0.99) - 1] * 1000 if write_times else 0.0
+        self.stdout.write(
+            f"{label:<9} {counts['reads'] / seconds:>9.0f} {counts['writes'] / seconds:>9.0f} "
+            f"{counts['locked']:>7} {p99:>13.1f}"
+        )
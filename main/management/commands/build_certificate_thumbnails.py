@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Certification
+from main.storage import content_digest
+from main.thumbnails import generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = (
+        "Hashes existing certificates and generates the missing thumbnails and their variants. "
+        "Identical certificates stored under several names are merged by `sweep_media --adopt`."
+    )
+
+    def handle(self, *args, **options):
+        for certification in Certification.objects.exclude(certificate='').order_by('pk'):
+            label = f"Certification {certification.pk}"
+            if not certification.certificate_sha256:
+                try:
+                    sha256 = content_digest(certification.certificate)
+                except OSError as e:
+                    self.stdout.write(f"{label}: cannot read {certification.certificate.name}: {e}")
+                    continue
+                Certification.objects.filter(pk=certification.pk).update(certificate_sha256=sha256)
+
+            thumbnail = generate_thumbnail(certification.pk)
+            if thumbnail:
+                self.stdout.write(f"{label}: thumbnail {thumbnail}")
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from main.images import IMAGE_FIELDS, refresh_variants
+
+
+class Command(BaseCommand):
+    help = "Builds the responsive variants of existing profile images and certificate thumbnails."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-encode images whose variants are up to date.")
+
+    def handle(self, *args, **options):
+        for spec in IMAGE_FIELDS:
+            for pk in spec.model.objects.order_by('pk').values_list('pk', flat=True):
+                manifest = refresh_variants(spec, pk, force=options['force'])
+                if manifest is None:
+                    continue
+                label = f"{spec.model.__name__} {pk} {spec.field}"
+                if not manifest:
+                    self.stdout.write(f"{label}: no image, variants cleared")
+                    continue
+                counts = ", ".join(f"{len(entries)} {name}" for name, entries in manifest['formats'].items())
+                self.stdout.write(f"{label}: {manifest['source']} -> {counts}")
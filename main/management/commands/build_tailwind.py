@@ -0,0 +1,20 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import tailwind
+
+
+class Command(BaseCommand):
+    help = (
+        "Compiles tailwind.css and its inlined critical subset with the pinned Tailwind CLI "
+        "(see main/tailwind.py). collectstatic runs this first."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            paths = tailwind.build()
+        except tailwind.TailwindError as e:
+            raise CommandError(str(e))
+        for path in paths:
+            self.stdout.write(f"{path}: {os.path.getsize(path)} bytes")
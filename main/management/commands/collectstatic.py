@@ -0,0 +1,11 @@
+from django.contrib.staticfiles.management.commands import collectstatic
+from django.core.management import call_command
+
+
+class Command(collectstatic.Command):
+    help = "Builds tailwind.css into TAILWIND_BUILD_DIR (see main/tailwind.py), then collects the static files into STATIC_ROOT."
+
+    def handle(self, **options):
+        if not options['dry_run']:
+            call_command('build_tailwind', verbosity=options['verbosity'], stdout=self.stdout, stderr=self.stderr)
+        return super().handle(**options)
@@ -0,0 +1,24 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.storage import PRECOMPRESSED, is_compressible, is_precompressed_copy, precompress, walk_files
+
+
+class Command(BaseCommand):
+    help = "Writes the missing .gz/.br copies of compressible media files stored before precompression."
+
+    def handle(self, *args, **options):
+        if not os.path.isdir(settings.MEDIA_ROOT):
+            return
+        written = 0
+        for entry in walk_files(settings.MEDIA_ROOT):
+            if entry.name.startswith('.') or is_precompressed_copy(entry.name) or not is_compressible(entry.name):
+                continue
+            if any(os.path.exists(entry.path + suffix) for suffix, _encoding in PRECOMPRESSED):
+                continue
+            for path in precompress(entry.path):
+                self.stdout.write(os.path.relpath(path, settings.MEDIA_ROOT))
+                written += 1
+        self.stdout.write(f"Wrote {written} precompressed file(s)")
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main.outbox import dispatch_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends pending contact form emails from the outbox (for when OUTBOX_IN_PROCESS is off)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--loop', action='store_true', help="Keep draining the outbox until interrupted.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep when nothing is due.")
+
+    def handle(self, *args, **options):
+        while True:
+            delivered = dispatch_outbox(batch_size=options['batch_size'])
+            if delivered:
+                self.stdout.write(f"Sent {delivered} message(s)")
+            if not options['loop']:
+                break
+            if delivered < options['batch_size']:
+                time.sleep(options['interval'])
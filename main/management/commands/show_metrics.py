@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from django.core.cache import cache
+
+from main import metrics, model_router
+from main.model_catalog import CATALOG_KEY
+from main import views  # noqa: F401  (imports every module that registers metrics)
+
+
+class Command(BaseCommand):
+    help = "Prints the counters and timings collected in the shared cache."
+
+    def handle(self, *args, **options):
+        for name in sorted(metrics.COUNTERS):
+            self.stdout.write(f"{name:<40} {metrics.read_counter(name)}")
+
+        prefixes = sorted({name.rsplit('.', 1)[0] for name in metrics.COUNTERS if name.endswith('.hits')})
+        for prefix in prefixes:
+            ratio = metrics.hit_ratio(prefix)
+            shown = f"{ratio:.1%}" if ratio is not None else "n/a"
+            self.stdout.write(f"{prefix + ' hit ratio':<40} {shown}")
+
+        for name in sorted(metrics.TIMINGS):
+            timing = metrics.read_timing(name)
+            self.stdout.write(
+                f"{name:<40} count={timing['count']} avg={timing['avg_ms']:.1f}ms last={timing['last_ms']:.1f}ms"
+            )
+
+        catalog = cache.get(CATALOG_KEY)
+        model_ids = catalog['models'] if catalog else []
+        for model_id, figures in model_router.model_stats(model_ids).items():
+            ttft = f"{figures['ttft'] * 1000:.0f}ms" if figures['ttft'] is not None else "n/a"
+            errors = f"{figures['error_rate']:.0%}" if figures['error_rate'] is not None else "n/a"
+            self.stdout.write(
+                f"{model_id:<40} breaker={model_router.breaker_state(model_id)} "
+                f"samples={figures['samples']} ttft={ttft} errors={errors}"
+            )
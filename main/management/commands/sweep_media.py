@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.media_refs import (
+    BATCH_SIZE, DEFAULT_GRACE, adopt_legacy_files, mark_references, reconcile_refcounts, sweep_unreferenced,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Deletes media files that no file field, image variant manifest or field default "
+        "points at any more, and corrects the reference counts. Safe to run from cron, e.g. nightly."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--adopt', action='store_true',
+            help="First move files stored before content addressing under their content names, merging identical copies.",
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=DEFAULT_GRACE / 3600,
+            help="Keep unreferenced files modified more recently than this.",
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Files checked and deleted per transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="List what would be deleted without changing anything.")
+
+    def handle(self, *args, **options):
+        if options['adopt'] and options['dry_run']:
+            raise CommandError("--adopt moves files and cannot be combined with --dry-run")
+        if options['adopt']:
+            for old, new in adopt_legacy_files():
+                self.stdout.write(f"{old} -> {new}")
+
+        counts, pinned = mark_references()
+        if not options['dry_run']:
+            wrong = reconcile_refcounts(counts)
+            if wrong:
+                self.stdout.write(f"Corrected {wrong} reference count(s)")
+
+        files = size = 0
+        swept = sweep_unreferenced(
+            set(counts) | pinned,
+            grace=options['grace_hours'] * 3600,
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        for name, file_size in swept:
+            self.stdout.write(name)
+            files += 1
+            size += file_size
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(f"{verb} {files} unreferenced file(s), {size} bytes")
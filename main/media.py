@@ -0,0 +1,216 @@
+# main/media.py
+"""
+Serving of user uploads under MEDIA_URL, in development and production.
+
+WhiteNoise only serves static files, and Django's static `serve` view is meant
+for development. This view is built for the resume and certificate PDFs:
+
+- Streaming: under WSGI the open file is handed to wsgi.file_wrapper, which
+  gunicorn sends with sendfile(). Under ASGI (the Procfile's uvicorn worker)
+  the file is read in CHUNK_SIZE pieces on a worker thread. Django would
+  otherwise read a synchronous file into memory whole before sending it.
+- Ranges: a single byte range gets a 206, honouring If-Range. PDF viewers
+  can then fetch only the pages they show. Unsatisfiable ranges get a 416.
+  Several ranges in one request get the whole file.
+- Validators: ETag and Last-Modified, so repeat downloads get a 304.
+- Precompression: full responses use the .br or .gz copy that storage.py
+  writes for compressible files, when the client accepts that encoding.
+- Caching: content-addressed names (see storage.py) never change meaning,
+  so they are also cached for a year without revalidation.
+- Safety: paths are joined with safe_join and must resolve inside
+  MEDIA_ROOT, symlinks included. Hidden names, such as the storage's
+  temporary files, are never served.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+from .storage import CHUNK_SIZE, PRECOMPRESSED, is_compressible, is_content_addressed
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+RANGE = re.compile(r'bytes=(\d*)-(\d*)')
+REFUSED = re.compile(r'q=0(\.0*)?$')
+
+
+def resolve(path):
+    """The file system path for a media path; SuspiciousFileOperation for ../ escapes."""
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if any(part.startswith('.') for part in path.split('/')):
+        raise Http404("Hidden files are not served")
+    root = os.path.realpath(settings.MEDIA_ROOT)
+    if os.path.commonpath([root, os.path.realpath(full_path)]) != root:
+        raise Http404("Links out of MEDIA_ROOT are not followed")
+    return full_path
+
+
+def _stat(full_path):
+    try:
+        result = os.stat(full_path)
+    except (OSError, ValueError):
+        return None
+    return result if stat.S_ISREG(result.st_mode) else None
+
+
+def _etag(file_stat):
+    return f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+
+
+def accepted_encodings(request):
+    accepted = set()
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.partition(';')
+        if coding.strip() and not REFUSED.search(params.strip().replace(' ', '')):
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def representation(request, full_path, file_stat):
+    """(path, stat, encoding) of what to send: a precompressed copy when the client takes it."""
+    if 'Range' in request.headers:
+        return full_path, file_stat, None
+    accepted = accepted_encodings(request)
+    for suffix, encoding in PRECOMPRESSED:
+        if encoding in accepted or '*' in accepted:
+            copy_stat = _stat(full_path + suffix)
+            if copy_stat is not None and copy_stat.st_mtime >= file_stat.st_mtime:
+                return full_path + suffix, copy_stat, encoding
+    return full_path, file_stat, None
+
+
+def byte_range(header, size):
+    """
+    (start, end), inclusive, for a single-range Range header. None means
+    send the whole file and False means unsatisfiable.
+    """
+    match = RANGE.fullmatch(header.replace(' ', ''))
+    if match is None or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0 or size == 0:
+            return False
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return False
+    return start, min(int(last), size - 1) if last else size - 1
+
+
+def _if_range_matches(request, etag, mtime):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    return parse_http_date_safe(value) == int(mtime)
+
+
+class FileRange:
+    """
+    A file that ends after `length` bytes. It has no fileno(), so a server
+    never sendfile()s past the range.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _read(file, size):
+    return file.read(size)
+
+
+async def _read_async(file, length):
+    read = sync_to_async(_read, thread_sensitive=False)
+    try:
+        while length:
+            data = await read(file, min(CHUNK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        file.close()
+
+
+def _stream(request, file, start, length, size):
+    file.seek(start)
+    if isinstance(request, ASGIRequest):
+        return _read_async(file, length)
+    if start == 0 and length == size:
+        # The file itself, so wsgi.file_wrapper can sendfile() it
+        return file
+    return FileRange(file, length)
+
+
+@require_safe
+def serve_media(request, path):
+    full_path = resolve(path)
+    file_stat = _stat(full_path)
+    if file_stat is None:
+        raise Http404(f"{path} does not exist")
+    send_path, send_stat, encoding = representation(request, full_path, file_stat)
+    etag = _etag(send_stat)
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(send_stat.st_mtime))
+    if response is None:
+        size = send_stat.st_size
+        span = None
+        if encoding is None and 'Range' in request.headers and _if_range_matches(request, etag, send_stat.st_mtime):
+            span = byte_range(request.headers['Range'], size)
+        if span is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+        else:
+            start, end = span or (0, size - 1)
+            length = end - start + 1
+            file = open(send_path, 'rb')
+            response = FileResponse(
+                _stream(request, file, start, length, size),
+                content_type=mimetypes.guess_type(path)[0] or 'application/octet-stream',
+                filename=os.path.basename(path),
+                status=206 if span else 200,
+            )
+            # Also closed when the body is never read, as for HEAD
+            response._resource_closers.append(file.close)
+            response.block_size = CHUNK_SIZE
+            response['Content-Length'] = length
+            if span:
+                response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            if encoding:
+                response['Content-Encoding'] = encoding
+            if is_content_addressed(path):
+                # A hash means nothing to a visitor; the link's download name is used instead
+                del response['Content-Disposition']
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(send_stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if is_compressible(path):
+        patch_vary_headers(response, ('Accept-Encoding',))
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
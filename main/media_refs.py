@@ -0,0 +1,261 @@
+# main/media_refs.py
+"""
+Reference counts of stored media files, and the garbage collector.
+
+With content-addressed storage (storage.py), several rows can point at one
+file, so a file may only be deleted when nothing points at it any more.
+MediaBlob keeps that count for every name held by a FileField or ImageField
+of this app:
+
+- post_save compares each file field with the value the row was loaded
+  with. That value is remembered on post_init, so no extra query is needed.
+  A changed field moves one reference from the old name to the new one.
+- post_delete drops the row's references.
+- Code that changes file fields with queryset updates calls change_refs().
+
+Counts change inside the saving transaction, and nothing is deleted then. A
+replaced or deleted file stays until `manage.py sweep_media` runs a mark and
+sweep:
+
+1. mark: stream every file field value, the image variant manifests and the
+   field defaults, and correct any count that has drifted;
+2. sweep: walk MEDIA_ROOT and delete, batch by batch, the files nothing
+   marked, with their precompressed copies. Files younger than the grace
+   period are kept, and so are files whose count went up since the mark.
+   The count is checked per batch, but the files are deleted after that
+   transaction. So each file's mtime is read again just before it is
+   deleted. ContentAddressedStorage.save() touches a file it reuses, so an
+   identical upload saved in between keeps its file.
+
+`--adopt` first re-stores files saved before content addressing under their
+content names, so identical legacy copies collapse into one.
+"""
+import os
+import time
+from collections import Counter
+
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.db import connection, models, transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .content import bump_content_version
+from .images import IMAGE_FIELDS
+from .models import MediaBlob
+from .storage import TEMP_PREFIX, is_content_addressed, is_precompressed_copy, walk_files
+
+BATCH_SIZE = 500
+
+# Long enough for an upload to be saved and its row committed
+DEFAULT_GRACE = 24 * 60 * 60
+
+
+def file_fields(model):
+    return [field for field in model._meta.concrete_fields if isinstance(field, models.FileField)]
+
+
+FILE_FIELDS = {
+    model: fields for model in apps.get_app_config('main').get_models() if (fields := file_fields(model))
+}
+
+
+def _name(value):
+    # A FieldFile, a plain name, an unsaved upload or None
+    return getattr(value, 'name', value) or ''
+
+
+def change_refs(added=(), removed=()):
+    """Moves references between names. Call it in the transaction that changed the file fields."""
+    added = Counter(name for name in added if name)
+    removed = Counter(name for name in removed if name)
+    if not added and not removed:
+        return
+    table = MediaBlob._meta.db_table
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        if added:
+            cursor.executemany(
+                f"""INSERT INTO {table} (name, refcount, updated_at) VALUES (%s, %s, %s)
+                    ON CONFLICT (name) DO UPDATE SET
+                    refcount = {table}.refcount + excluded.refcount, updated_at = excluded.updated_at""",
+                [(name, count, now) for name, count in sorted(added.items())],
+            )
+        if removed:
+            cursor.executemany(
+                f"""UPDATE {table} SET updated_at = %s,
+                    refcount = CASE WHEN refcount > %s THEN refcount - %s ELSE 0 END
+                    WHERE name = %s""",
+                [(now, count, count, name) for name, count in sorted(removed.items())],
+            )
+
+
+def stored_name(instance, field_name):
+    """The field's value when the row was loaded or last saved; None when not known."""
+    return getattr(instance, '_stored_files', {}).get(field_name)
+
+
+def _remember_files(sender, instance, **kwargs):
+    instance._stored_files = {
+        field.attname: _name(instance.__dict__[field.attname])
+        for field in FILE_FIELDS[sender] if field.attname in instance.__dict__
+    }
+
+
+def _count_saved_files(sender, instance, created, update_fields=None, **kwargs):
+    stored = getattr(instance, '_stored_files', {})
+    added, removed = [], []
+    for field in FILE_FIELDS[sender]:
+        if update_fields is not None and field.name not in update_fields:
+            continue
+        name = _name(getattr(instance, field.attname))
+        if created:
+            added.append(name)
+        elif field.attname in stored and stored[field.attname] != name:
+            added.append(name)
+            removed.append(stored[field.attname])
+        stored[field.attname] = name
+    instance._stored_files = stored
+    change_refs(added, removed)
+
+
+def _drop_deleted_files(sender, instance, **kwargs):
+    stored = getattr(instance, '_stored_files', {})
+    change_refs(removed=[
+        stored.get(field.attname, _name(getattr(instance, field.attname))) for field in FILE_FIELDS[sender]
+    ])
+
+
+for _model in FILE_FIELDS:
+    post_init.connect(_remember_files, sender=_model, dispatch_uid=f'media-refs-init-{_model.__name__}')
+    post_save.connect(_count_saved_files, sender=_model, dispatch_uid=f'media-refs-save-{_model.__name__}')
+    post_delete.connect(_drop_deleted_files, sender=_model, dispatch_uid=f'media-refs-delete-{_model.__name__}')
+
+
+def _stored_values(model, field):
+    return (
+        model._default_manager.exclude(**{field.attname: ''})
+        .filter(**{f'{field.attname}__isnull': False})
+        .values_list(field.attname, flat=True)
+    )
+
+
+def mark_references():
+    """
+    Returns (counts, pinned): the references to each name held by the file
+    fields, and the names kept without a count (variants and field defaults).
+    """
+    counts = Counter()
+    pinned = set()
+    for model, fields in FILE_FIELDS.items():
+        for field in fields:
+            if isinstance(field.default, str) and field.default:
+                pinned.add(field.default)
+            counts.update(_stored_values(model, field).iterator(chunk_size=BATCH_SIZE))
+    for spec in IMAGE_FIELDS:
+        manifests = spec.model._default_manager.values_list(spec.manifest_field, flat=True)
+        for manifest in manifests.iterator(chunk_size=BATCH_SIZE):
+            for entries in (manifest or {}).get('formats', {}).values():
+                pinned.update(name for _width, name in entries)
+    return counts, pinned
+
+
+def reconcile_refcounts(counts):
+    """Makes MediaBlob match the marked counts. Returns how many rows were wrong."""
+    wrong = 0
+    seen = set()
+    for blob in MediaBlob.objects.iterator(chunk_size=BATCH_SIZE):
+        seen.add(blob.name)
+        refcount = counts.get(blob.name, 0)
+        if refcount == 0:
+            MediaBlob.objects.filter(pk=blob.pk, refcount=blob.refcount).delete()
+        elif blob.refcount != refcount:
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=refcount, updated_at=timezone.now())
+        wrong += blob.refcount != refcount
+    missing = [MediaBlob(name=name, refcount=count) for name, count in counts.items() if name not in seen]
+    MediaBlob.objects.bulk_create(missing, batch_size=BATCH_SIZE, ignore_conflicts=True)
+    return wrong + len(missing)
+
+
+def _touched_since(storage, name, cutoff):
+    try:
+        return os.stat(storage.path(name)).st_mtime > cutoff
+    except FileNotFoundError:
+        return True
+
+
+def _delete(storage, batch, cutoff, dry_run):
+    names = [name for name, _size in batch]
+    with transaction.atomic():
+        # Referenced again since the mark
+        referenced = set(MediaBlob.objects.filter(name__in=names, refcount__gt=0).values_list('name', flat=True))
+        doomed = [(name, size) for name, size in batch if name not in referenced]
+        if not dry_run:
+            MediaBlob.objects.filter(name__in=[name for name, _size in doomed]).delete()
+    for name, size in doomed:
+        if _touched_since(storage, name, cutoff):
+            # Reused by a save since the walk
+            continue
+        if not dry_run:
+            storage.delete(name)
+        yield name, size
+
+
+def sweep_unreferenced(keep, grace=DEFAULT_GRACE, batch_size=BATCH_SIZE, dry_run=False, storage=default_storage):
+    """
+    Deletes the files under the storage root whose names are not in `keep`,
+    walking the tree once. Yields (name, size) for every file deleted, or
+    that would be with dry_run.
+    """
+    root = storage.location
+    if not os.path.isdir(root):
+        return
+    cutoff = time.time() - grace
+    batch = []
+    for entry in walk_files(root):
+        name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+        if name in keep or (entry.name.startswith('.') and not entry.name.startswith(TEMP_PREFIX)):
+            continue
+        if is_precompressed_copy(name) and os.path.splitext(name)[0] in keep:
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        if stat.st_mtime > cutoff:
+            continue
+        batch.append((name, stat.st_size))
+        if len(batch) >= batch_size:
+            yield from _delete(storage, batch, cutoff, dry_run)
+            batch = []
+    if batch:
+        yield from _delete(storage, batch, cutoff, dry_run)
+
+
+def adopt_legacy_files(storage=default_storage):
+    """
+    Re-stores files saved before content addressing under their content
+    names and points the rows (and variant manifests) at them. Yields
+    (old, new) for every name replaced.
+    """
+    for model, fields in FILE_FIELDS.items():
+        for field in fields:
+            legacy = [name for name in _stored_values(model, field).distinct() if not is_content_addressed(name)]
+            for old in legacy:
+                if not storage.exists(old):
+                    continue
+                with storage.open(old, 'rb') as source:
+                    new = storage.save(old, source)
+                with transaction.atomic():
+                    changed = model._default_manager.filter(**{field.attname: old}).update(**{field.attname: new})
+                    change_refs(added=[new] * changed, removed=[old] * changed)
+                    for spec in IMAGE_FIELDS:
+                        if spec.model is model and spec.field == field.name:
+                            _rename_manifest_source(spec, old, new)
+                    transaction.on_commit(bump_content_version)
+                yield old, new
+
+
+def _rename_manifest_source(spec, old, new):
+    # The variants themselves are unchanged; only the source they were built from moved
+    rows = spec.model._default_manager.filter(**{spec.field: new}).values_list('pk', spec.manifest_field)
+    for pk, manifest in rows:
+        if manifest and manifest.get('source') == old:
+            spec.model._default_manager.filter(pk=pk).update(**{spec.manifest_field: {**manifest, 'source': new}})
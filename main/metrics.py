@@ -0,0 +1,62 @@
+# main/metrics.py
+"""
+Small counters and timings kept in the shared cache, so every worker adds to
+the same numbers. `manage.py show_metrics` prints them.
+
+Increments on cache backends without an atomic incr (the file cache) can
+occasionally lose an update; that is fine for rough operational numbers.
+"""
+from django.core.cache import cache
+
+METRICS_PREFIX = 'metrics'
+
+COUNTERS = set()
+TIMINGS = set()
+
+
+def register_counters(*names):
+    COUNTERS.update(names)
+
+
+def register_timings(*names):
+    TIMINGS.update(names)
+
+
+def _incr(key, delta):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key, delta)
+
+
+def incr(name, delta=1):
+    _incr(f"{METRICS_PREFIX}:{name}", delta)
+
+
+def observe(name, seconds):
+    micros = int(seconds * 1_000_000)
+    _incr(f"{METRICS_PREFIX}:{name}:count", 1)
+    _incr(f"{METRICS_PREFIX}:{name}:total_us", micros)
+    cache.set(f"{METRICS_PREFIX}:{name}:last_us", micros, timeout=None)
+
+
+def read_counter(name):
+    return cache.get(f"{METRICS_PREFIX}:{name}", 0)
+
+
+def read_timing(name):
+    values = cache.get_many([f"{METRICS_PREFIX}:{name}:{field}" for field in ('count', 'total_us', 'last_us')])
+    count = values.get(f"{METRICS_PREFIX}:{name}:count", 0)
+    total = values.get(f"{METRICS_PREFIX}:{name}:total_us", 0)
+    return {
+        'count': count,
+        'avg_ms': total / count / 1000 if count else 0.0,
+        'last_ms': values.get(f"{METRICS_PREFIX}:{name}:last_us", 0) / 1000,
+    }
+
+
+def hit_ratio(prefix):
+    hits = read_counter(f"{prefix}.hits")
+    misses = read_counter(f"{prefix}.misses")
+    return hits / (hits + misses) if hits + misses else None
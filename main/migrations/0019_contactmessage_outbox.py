@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:38
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def mark_existing_sent(apps, schema_editor):
+    # Messages saved before the outbox existed were emailed inline already
+    ContactMessage = apps.get_model('main', 'ContactMessage')
+    ContactMessage.objects.update(status='sent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_alter_certification_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_sent, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='contact_outbox_due_idx'),
+        ),
+    ]
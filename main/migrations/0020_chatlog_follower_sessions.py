@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0019_contactmessage_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatlog',
+            name='follower_sessions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_chatlog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='experience',
+            options={'ordering': ['-created_at']},
+        ),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['timestamp'], name='chatlog_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['session_key', 'timestamp'], name='chatlog_session_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['model_used', 'timestamp'], name='chatlog_model_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['created_at'], name='contact_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='experience',
+            index=models.Index(fields=['created_at'], name='experience_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['created_at'], name='project_created_idx'),
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+FTS_TABLE = 'main_chatlog_fts'
+
+# External-content table: the text lives in main_chatlog only, and the
+# triggers keep the index in step however rows are written
+CREATE_SQL = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        user_query, ai_response,
+        content='main_chatlog', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER main_chatlog_fts_insert AFTER INSERT ON main_chatlog BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, user_query, ai_response) VALUES (new.id, new.user_query, new.ai_response);
+    END""",
+    f"""CREATE TRIGGER main_chatlog_fts_delete AFTER DELETE ON main_chatlog BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_query, ai_response)
+        VALUES ('delete', old.id, old.user_query, old.ai_response);
+    END""",
+    f"""CREATE TRIGGER main_chatlog_fts_update AFTER UPDATE OF user_query, ai_response ON main_chatlog BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, user_query, ai_response)
+        VALUES ('delete', old.id, old.user_query, old.ai_response);
+        INSERT INTO {FTS_TABLE}(rowid, user_query, ai_response) VALUES (new.id, new.user_query, new.ai_response);
+    END""",
+    # Index the rows that existed before the table
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS main_chatlog_fts_insert",
+    "DROP TRIGGER IF EXISTS main_chatlog_fts_delete",
+    "DROP TRIGGER IF EXISTS main_chatlog_fts_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    try:
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+            cursor.execute("DROP TABLE temp.fts5_probe")
+    except OperationalError:
+        # SQLite built without FTS5: the admin keeps its LIKE search
+        return
+    for statement in CREATE_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
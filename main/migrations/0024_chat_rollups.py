@@ -0,0 +1,41 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0023_chatlog_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('model_used', models.CharField(blank=True, default='', max_length=100)),
+                ('chats', models.PositiveIntegerField(default=0)),
+                ('response_chars', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'model_used'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'model_used'), name='chat_daily_rollup_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ChatQuestionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('question', models.CharField(max_length=300)),
+                ('chats', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', '-chats'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'fingerprint'), name='chat_question_rollup_unique')],
+            },
+        ),
+    ]
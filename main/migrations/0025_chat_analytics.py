@@ -0,0 +1,143 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:22
+
+import hashlib
+import re
+from collections import Counter
+
+from django.db import connection, migrations, models
+from django.db.models import F
+from django.utils import timezone
+
+# Frozen copies of answer_cache.question_fingerprint() and the counting in
+# chat_analytics.py as they were when this migration was written, so later
+# changes there cannot alter what the backfill does
+
+LENGTH_BUCKETS = (0, 100, 250, 500, 1000, 2000, 4000)
+
+non_word_pattern = re.compile(r"[^\w\s]+")
+
+
+def normalize_question(text):
+    return " ".join(non_word_pattern.sub(" ", (text or "").lower()).split())
+
+
+def question_fingerprint(text):
+    return hashlib.sha1(normalize_question(text).encode()).hexdigest()
+
+
+def tally(rows):
+    daily, questions, lengths = Counter(), Counter(), Counter()
+    examples = {}
+    for row in rows:
+        day = timezone.localdate(row['timestamp'])
+        model = row.get('model_used') or ''
+        response_length = len(row.get('ai_response') or '')
+        daily[day, model, 'chats'] += 1
+        daily[day, model, 'response_chars'] += response_length
+        fingerprint = question_fingerprint(row['user_query'])
+        questions[day, fingerprint] += 1
+        examples.setdefault(fingerprint, normalize_question(row['user_query'])[:300])
+        lengths[day, model, max(bound for bound in LENGTH_BUCKETS if bound <= response_length)] += 1
+    return daily, questions, lengths, examples
+
+
+def _table(apps, name):
+    return connection.ops.quote_name(apps.get_model('main', name)._meta.db_table)
+
+
+def add_to_rollups(rows, apps):
+    daily, questions, lengths, examples = tally(rows)
+    if not questions:
+        return
+    models = {key[:2] for key in daily}
+    daily_table = _table(apps, 'ChatDailyRollup')
+    question_table = _table(apps, 'ChatQuestionRollup')
+    length_table = _table(apps, 'ChatLengthRollup')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"""INSERT INTO {daily_table} (day, model_used, chats, response_chars) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (day, model_used) DO UPDATE SET
+                chats = {daily_table}.chats + excluded.chats,
+                response_chars = {daily_table}.response_chars + excluded.response_chars""",
+            [
+                (day.isoformat(), model, daily[day, model, 'chats'], daily[day, model, 'response_chars'])
+                for day, model in sorted(models)
+            ],
+        )
+        cursor.executemany(
+            f"""INSERT INTO {question_table} (day, fingerprint, question, chats) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (day, fingerprint) DO UPDATE SET chats = {question_table}.chats + excluded.chats""",
+            [
+                (day.isoformat(), fingerprint, examples[fingerprint], chats)
+                for (day, fingerprint), chats in sorted(questions.items())
+            ],
+        )
+        cursor.executemany(
+            f"""INSERT INTO {length_table} (day, model_used, min_chars, chats) VALUES (%s, %s, %s, %s)
+                ON CONFLICT (day, model_used, min_chars) DO UPDATE SET chats = {length_table}.chats + excluded.chats""",
+            [
+                (day.isoformat(), model, min_chars, chats)
+                for (day, model, min_chars), chats in sorted(lengths.items())
+            ],
+        )
+
+
+def _pages(apps):
+    ChatLog = apps.get_model('main', 'ChatLog')
+    fields = ('id', 'timestamp', 'model_used', 'user_query', 'ai_response')
+    last_pk = 0
+    while True:
+        page = list(ChatLog.objects.filter(pk__gt=last_pk).order_by('pk').values(*fields)[:1000])
+        if not page:
+            return
+        yield page
+        last_pk = page[-1]['id']
+
+
+def count_existing_logs(apps, schema_editor):
+    # Logs written before the writer kept the rollups; archived ones are already in
+    for page in _pages(apps):
+        add_to_rollups(page, apps)
+
+
+def uncount_existing_logs(apps, schema_editor):
+    # Back to 0024, where the rollups only held archived logs
+    ChatDailyRollup = apps.get_model('main', 'ChatDailyRollup')
+    ChatQuestionRollup = apps.get_model('main', 'ChatQuestionRollup')
+    for page in _pages(apps):
+        daily, questions, _lengths, _examples = tally(page)
+        for day, model, field in daily:
+            if field == 'chats':
+                ChatDailyRollup.objects.filter(day=day, model_used=model).update(
+                    chats=F('chats') - daily[day, model, 'chats'],
+                    response_chars=F('response_chars') - daily[day, model, 'response_chars'],
+                )
+        for (day, fingerprint), chats in questions.items():
+            ChatQuestionRollup.objects.filter(day=day, fingerprint=fingerprint).update(chats=F('chats') - chats)
+    ChatDailyRollup.objects.filter(chats=0).delete()
+    ChatQuestionRollup.objects.filter(chats=0).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_chat_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatLengthRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('model_used', models.CharField(blank=True, default='', max_length=100)),
+                ('min_chars', models.PositiveIntegerField()),
+                ('chats', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'model_used', 'min_chars'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'model_used', 'min_chars'), name='chat_length_rollup_unique')],
+            },
+        ),
+        migrations.RunPython(count_existing_logs, uncount_existing_logs),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='certification',
+            name='certificate_sha256',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='certification',
+            index=models.Index(fields=['certificate_sha256'], name='certification_sha256_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:35
+
+from collections import Counter
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+# File fields of main/models.py when this migration was written
+FILE_FIELDS = {'Profile': ('profile_image', 'resume'), 'Certification': ('certificate', 'thumbnail')}
+
+
+def count_existing_references(apps, schema_editor):
+    MediaBlob = apps.get_model('main', 'MediaBlob')
+    counts = Counter()
+    for model_name, fields in FILE_FIELDS.items():
+        model = apps.get_model('main', model_name)
+        for field in fields:
+            counts.update(
+                model.objects.exclude(**{field: ''}).filter(**{f'{field}__isnull': False})
+                .values_list(field, flat=True).iterator()
+            )
+    MediaBlob.objects.bulk_create([MediaBlob(name=name, refcount=count) for name, count in counts.items()], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_certificate_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(count_existing_references, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:59
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_sent_emails(apps, schema_editor):
+    # Both emails of an already delivered message went out together
+    ContactMessage = apps.get_model('main', 'ContactMessage')
+    ContactMessage.objects.filter(status='sent').update(owner_sent_at=F('sent_at'), reply_sent_at=F('sent_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_media_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactmessage',
+            name='owner_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='reply_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_sent_emails, migrations.RunPython.noop),
+    ]
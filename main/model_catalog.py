@@ -0,0 +1,85 @@
+# main/model_catalog.py
+"""
+Cached list of the Gemini models the chatbot may use.
+
+Discovery (client.models.list()) is a network round trip, so its result is
+kept in the shared cache with a soft TTL. Fresh entries are served as is;
+stale entries are still served while one background thread per cluster
+refreshes them. When discovery fails the last-known-good list is kept, and
+the hard-coded pair is only used if nothing was ever discovered.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+CATALOG_KEY = 'genai:model-catalog'
+REFRESH_LOCK_KEY = 'genai:model-catalog:refreshing'
+# Also the pause between discovery attempts after a failure
+REFRESH_LOCK_SECONDS = 60
+
+DEFAULT_MODELS = ["models/gemini-2.0-flash", "models/gemini-1.5-flash"]
+
+metrics.register_counters(
+    'model_catalog.hits', 'model_catalog.stale', 'model_catalog.misses', 'model_catalog.discovery_errors',
+)
+metrics.register_timings('model_catalog.discovery')
+
+
+def discover_models(client):
+    started = time.perf_counter()
+    try:
+        available_models = client.models.list()
+        flash_models = [
+            m.name for m in available_models
+            if 'flash' in m.name.lower() and 'generateContent' in m.supported_actions
+        ]
+    finally:
+        metrics.observe('model_catalog.discovery', time.perf_counter() - started)
+    return sorted(flash_models, reverse=True)
+
+
+def refresh_catalog(client):
+    """
+    Runs discovery and stores the result. Returns the new list, or None when
+    discovery failed or came back empty and the old entry was kept.
+    """
+    try:
+        models = discover_models(client)
+    except Exception as e:
+        print(f"Discovery Error: {e}")
+        metrics.incr('model_catalog.discovery_errors')
+        return None
+    if not models:
+        return None
+    cache.set(CATALOG_KEY, {'models': models, 'fetched_at': time.time()}, timeout=None)
+    return models
+
+
+def refresh_in_background(client):
+    if not cache.add(REFRESH_LOCK_KEY, True, timeout=REFRESH_LOCK_SECONDS):
+        return None
+    thread = threading.Thread(target=refresh_catalog, args=(client,), daemon=True)
+    thread.start()
+    return thread
+
+
+def get_model_catalog(client):
+    entry = cache.get(CATALOG_KEY)
+    if entry is None:
+        metrics.incr('model_catalog.misses')
+        # Cold start: nobody has a list yet, so this request waits for one
+        if cache.add(REFRESH_LOCK_KEY, True, timeout=REFRESH_LOCK_SECONDS):
+            models = refresh_catalog(client)
+            if models:
+                return list(models)
+        return list(DEFAULT_MODELS)
+
+    metrics.incr('model_catalog.hits')
+    if time.time() - entry['fetched_at'] > getattr(settings, 'MODEL_CATALOG_TTL', 3600):
+        metrics.incr('model_catalog.stale')
+        refresh_in_background(client)
+    return list(entry['models'])
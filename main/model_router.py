@@ -0,0 +1,351 @@
+# main/model_router.py
+"""
+Latency-aware routing over the discovered Gemini models.
+
+Every attempt leaves a sample in a per-model rolling window in the shared
+cache. A sample records whether the attempt succeeded, its time to first
+token and its throughput. Candidates are ordered by expected time to first
+token, which is the average TTFT divided by the success rate. Models without
+samples come first, in catalog order, so that they get measured.
+
+A model whose last MODEL_ROUTER_FAILURE_THRESHOLD attempts all failed gets
+an open circuit breaker and is skipped. After MODEL_ROUTER_COOLDOWN seconds a
+single request may probe it (half-open). A probe that succeeds closes the
+breaker; a probe that fails opens it again. When every breaker is open the
+models are still tried, since nothing else could answer.
+
+Streams are hedged. If the current attempt has not produced a chunk after
+MODEL_ROUTER_HEDGE_AFTER_MS, the next candidate is started alongside it. The
+first one to produce a chunk wins and the other is abandoned.
+
+Window updates are read-modify-write on the cache, so concurrent workers can
+occasionally drop a sample. Routing only needs rough numbers.
+"""
+import asyncio
+import queue
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import metrics
+
+STATS_PREFIX = 'genai:model-stats'
+BREAKER_PREFIX = 'genai:breaker'
+
+metrics.register_counters(
+    'model_router.attempts', 'model_router.failures', 'model_router.hedges',
+    'model_router.breaker_opened', 'model_router.breaker_skips',
+)
+metrics.register_timings('model_router.ttft')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _window(samples, now):
+    horizon = now - _setting('MODEL_ROUTER_WINDOW_SECONDS', 600)
+    return [sample for sample in samples if sample['at'] >= horizon][-_setting('MODEL_ROUTER_WINDOW', 20):]
+
+
+def summarize(samples):
+    """Rolling-window figures for one model; None values mean no data."""
+    ok = [sample for sample in samples if sample['ok']]
+    return {
+        'samples': len(samples),
+        'error_rate': 1 - len(ok) / len(samples) if samples else None,
+        'ttft': sum(sample['ttft'] for sample in ok) / len(ok) if ok else None,
+        'chars_per_second': sum(sample['cps'] for sample in ok) / len(ok) if ok else None,
+    }
+
+
+def model_stats(model_ids):
+    keys = {model_id: f"{STATS_PREFIX}:{model_id}" for model_id in model_ids}
+    stored = cache.get_many(list(keys.values()))
+    now = time.time()
+    return {model_id: summarize(_window(stored.get(key, []), now)) for model_id, key in keys.items()}
+
+
+def _record(model_id, ok, ttft=None, cps=None):
+    key = f"{STATS_PREFIX}:{model_id}"
+    now = time.time()
+    samples = _window(cache.get(key, []), now)
+    samples.append({'at': now, 'ok': ok, 'ttft': ttft, 'cps': cps})
+    cache.set(key, samples, timeout=_setting('MODEL_ROUTER_WINDOW_SECONDS', 600))
+    return samples
+
+
+def record_success(model_id, ttft, chars, seconds):
+    metrics.incr('model_router.attempts')
+    metrics.observe('model_router.ttft', ttft)
+    _record(model_id, True, ttft, chars / seconds if seconds > 0 else 0.0)
+    # A success closes the breaker, whether or not this was the probe
+    cache.delete_many([f"{BREAKER_PREFIX}:{model_id}", f"{BREAKER_PREFIX}:{model_id}:probe"])
+
+
+def record_failure(model_id):
+    metrics.incr('model_router.attempts')
+    metrics.incr('model_router.failures')
+    samples = _record(model_id, False)
+    threshold = _setting('MODEL_ROUTER_FAILURE_THRESHOLD', 3)
+    recent = samples[-threshold:]
+    if len(recent) == threshold and not any(sample['ok'] for sample in recent):
+        if cache.get(f"{BREAKER_PREFIX}:{model_id}") is None:
+            metrics.incr('model_router.breaker_opened')
+        cache.set(f"{BREAKER_PREFIX}:{model_id}", time.time(), timeout=None)
+
+
+def breaker_state(model_id, opened_at=None):
+    """'closed', 'open' or 'half-open' (cooled down, waiting for a probe)."""
+    if opened_at is None:
+        opened_at = cache.get(f"{BREAKER_PREFIX}:{model_id}")
+    if opened_at is None:
+        return 'closed'
+    if time.time() - opened_at < _setting('MODEL_ROUTER_COOLDOWN', 30):
+        return 'open'
+    return 'half-open'
+
+
+def order_models(model_ids):
+    """
+    Candidates to try, best first. A half-open model goes first for the one
+    request that wins its probe; open ones go last.
+    """
+    stats = model_stats(model_ids)
+    opened = cache.get_many([f"{BREAKER_PREFIX}:{model_id}" for model_id in model_ids])
+
+    def expected_ttft(model_id):
+        figures = stats[model_id]
+        if figures['ttft'] is None:
+            # Untried models keep catalog order; models that only failed go last
+            return 0.0 if not figures['samples'] else float('inf')
+        return figures['ttft'] / max(1 - figures['error_rate'], 0.1)
+
+    probes, available, skipped = [], [], []
+    for model_id in model_ids:
+        state = breaker_state(model_id, opened.get(f"{BREAKER_PREFIX}:{model_id}"))
+        if state == 'closed':
+            available.append(model_id)
+        elif state == 'half-open' and cache.add(
+            f"{BREAKER_PREFIX}:{model_id}:probe", True, timeout=_setting('MODEL_ROUTER_COOLDOWN', 30),
+        ):
+            # Its window only holds failures, so it would never be reached
+            # by latency; hedging bounds what the probe can cost.
+            probes.append(model_id)
+        else:
+            metrics.incr('model_router.breaker_skips')
+            skipped.append(model_id)
+    return probes + sorted(available, key=expected_ttft) + skipped
+
+
+class Attempt:
+    def __init__(self, model_id):
+        self.model_id = model_id
+        self.started = time.perf_counter()
+        self.first_chunk_at = None
+        self.chars = 0
+        self.cancelled = False
+
+
+class Race:
+    """
+    Bookkeeping shared by the sync and async drivers: which attempts are
+    running, which one won, and when to start the next candidate.
+    """
+
+    def __init__(self, model_ids):
+        self.candidates = order_models(model_ids)
+        self.running = []
+        self.winner = None
+        # Set once an attempt streamed to the end
+        self.answered_by = None
+        self.hedge_after = _setting('MODEL_ROUTER_HEDGE_AFTER_MS', 2500) / 1000
+
+    def launch(self):
+        attempt = Attempt(self.candidates.pop(0))
+        print(f"DEBUG: Attempting to stream from {attempt.model_id}")
+        self.running.append(attempt)
+        return attempt
+
+    def wait_timeout(self):
+        """Seconds to wait for the next event before hedging, or the stall limit."""
+        stall = settings.GENAI_TIMEOUT_MS / 1000
+        if self.winner is not None or not self.candidates or not self.hedge_after:
+            return stall
+        latest = max(attempt.started for attempt in self.running)
+        return max(0.0, min(stall, latest + self.hedge_after - time.perf_counter()))
+
+    def can_hedge(self):
+        return self.winner is None and bool(self.candidates) and bool(self.hedge_after)
+
+    def chunk(self, attempt, text):
+        """Returns True when the text belongs to the winning attempt."""
+        if attempt.cancelled:
+            return False
+        if self.winner is None:
+            self.winner = attempt
+            attempt.first_chunk_at = time.perf_counter()
+            for other in self.running:
+                if other is not attempt:
+                    other.cancelled = True
+            self.running = [attempt]
+        attempt.chars += len(text)
+        return True
+
+    def done(self, attempt):
+        """Returns True when the race is over."""
+        if attempt.cancelled:
+            return False
+        self.running.remove(attempt)
+        if attempt is self.winner:
+            record_success(
+                attempt.model_id,
+                attempt.first_chunk_at - attempt.started,
+                attempt.chars,
+                time.perf_counter() - attempt.first_chunk_at,
+            )
+            self.answered_by = attempt.model_id
+            return True
+        # An empty stream is no answer at all
+        return self.failed(attempt)
+
+    def failed(self, attempt, error=None):
+        """Returns True when no candidate is left to try."""
+        if attempt.cancelled:
+            return False
+        if attempt in self.running:
+            self.running.remove(attempt)
+        if error is not None:
+            print(f"DEBUG ERROR with {attempt.model_id}: {error}")
+        record_failure(attempt.model_id)
+        if attempt is self.winner:
+            # Failed mid-answer: like before, carry on with the next model
+            self.winner = None
+        return not self.running and not self.candidates
+
+    def stall(self):
+        """Gives up on attempts that went quiet for longer than GENAI_TIMEOUT_MS."""
+        for attempt in list(self.running):
+            self.failed(attempt, "stalled")
+            attempt.cancelled = True
+
+    def abandon(self):
+        for attempt in self.running:
+            attempt.cancelled = True
+        self.running = []
+
+
+def _pump(client, attempt, contents, events):
+    stream = None
+    try:
+        stream = client.models.generate_content_stream(model=attempt.model_id, contents=contents)
+        for chunk in stream:
+            if attempt.cancelled:
+                return
+            if chunk.text:
+                events.put((attempt, 'chunk', chunk.text))
+        events.put((attempt, 'done', None))
+    except Exception as e:
+        events.put((attempt, 'error', e))
+    finally:
+        # A lost hedge or a stalled attempt would otherwise keep its HTTP response open
+        if hasattr(stream, 'close'):
+            stream.close()
+
+
+def stream_models(client, race, contents):
+    """
+    Yields the answer text from whichever model wins the race; afterwards
+    race.answered_by names it. Each attempt reads its stream on its own thread
+    so a slow one can be hedged.
+    """
+    events = queue.Queue()
+
+    def launch():
+        attempt = race.launch()
+        threading.Thread(target=_pump, args=(client, attempt, contents, events), daemon=True).start()
+
+    if race.candidates:
+        launch()
+    try:
+        while race.running:
+            try:
+                attempt, kind, payload = events.get(timeout=race.wait_timeout())
+            except queue.Empty:
+                if race.can_hedge():
+                    metrics.incr('model_router.hedges')
+                    launch()
+                    continue
+                race.stall()
+            else:
+                if kind == 'chunk':
+                    if race.chunk(attempt, payload):
+                        yield payload
+                elif kind == 'done':
+                    if race.done(attempt):
+                        return
+                elif race.failed(attempt, payload):
+                    return
+            if not race.running and race.candidates:
+                launch()
+    finally:
+        race.abandon()
+
+
+async def _apump(client, attempt, contents, events):
+    response = None
+    try:
+        response = await client.models.generate_content_stream(model=attempt.model_id, contents=contents)
+        async for chunk in response:
+            if chunk.text:
+                events.put_nowait((attempt, 'chunk', chunk.text))
+        events.put_nowait((attempt, 'done', None))
+    except Exception as e:
+        events.put_nowait((attempt, 'error', e))
+    finally:
+        # Also runs when astream_models() cancels this task
+        if hasattr(response, 'aclose'):
+            await response.aclose()
+
+
+async def astream_models(client, race, contents):
+    """Async twin of stream_models(); attempts are tasks on the running loop."""
+    events = asyncio.Queue()
+    tasks = {}
+
+    def launch():
+        attempt = race.launch()
+        tasks[attempt] = asyncio.create_task(_apump(client, attempt, contents, events))
+
+    if race.candidates:
+        launch()
+    try:
+        while race.running:
+            try:
+                attempt, kind, payload = await asyncio.wait_for(events.get(), race.wait_timeout())
+            except asyncio.TimeoutError:
+                if race.can_hedge():
+                    await sync_to_async(metrics.incr)('model_router.hedges')
+                    launch()
+                    continue
+                await sync_to_async(race.stall)()
+            else:
+                if kind == 'chunk':
+                    if race.chunk(attempt, payload):
+                        yield payload
+                elif kind == 'done':
+                    if await sync_to_async(race.done)(attempt):
+                        return
+                elif await sync_to_async(race.failed)(attempt, payload):
+                    return
+            for loser in [attempt for attempt in tasks if attempt.cancelled]:
+                tasks.pop(loser).cancel()
+            if not race.running and race.candidates:
+                launch()
+    finally:
+        race.abandon()
+        for task in tasks.values():
+            task.cancel()
@@ -1,9 +1,7 @@
 # main/models.py
 from django.db import models
-import os
-from django.db.models.signals import pre_save
-from django.dispatch import receiver
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 class Profile(models.Model):
     fname = models.CharField(max_length=50, default="Your Fname")
@@ -23,31 +21,12 @@ class Profile(models.Model):
         null=True
     )
     resume = models.FileField(upload_to ='resume/', blank=True, null=True)
+    # Resized copies of profile_image (see main/images.py)
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     def __str__(self):
          return f"{self.fname} {self.lname}"
 
-@receiver(pre_save, sender=Profile)
-def auto_delete_file_on_change(sender, instance, **kwargs):
-    """
-    Deletes old file from filesystem when change occurs.
-    """
-    if not instance.pk:
-        return False
-
-    try:
-        # Fetch the old record from the database
-        old_file = Profile.objects.get(pk=instance.pk).profile_image
-    except Profile.DoesNotExist:
-        return False
-
-    new_file = instance.profile_image
-    
-    # If file is changed AND it's not the default image, delete the old physical file
-    if old_file and not old_file == new_file and old_file.name != 'profile/photo.jpg':
-        if os.path.isfile(old_file.path):
-            os.remove(old_file.path)
 
-   
 class Project(models.Model):
     title = models.CharField(max_length=200)
     subtitle = models.CharField(max_length=200, null=True, blank=True)
@@ -56,6 +35,8 @@ class Project(models.Model):
     link = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at'], name='project_created_idx')]
 
     def __str__(self):
         return self.title
@@ -87,18 +68,43 @@ class Experience(models.Model):
     is_currunt = models.BooleanField(default= False)
     created_at = models.DateTimeField(auto_now_add=True)
 
-    class meta:
+    class Meta:
         ordering = ['-created_at'] #shows the new at top
+        indexes = [models.Index(fields=['created_at'], name='experience_created_idx')]
 
     def __str__(self):
         return f"{self.role} at {self.company}"
     
 class ContactMessage(models.Model):
+    # Delivery state for the outbox (see main/outbox.py)
+    STATUS_PENDING = 'pending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
     name = models.CharField(max_length=200)
     email = models.EmailField()
     subject = models.CharField(max_length=200)
     message = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    # Each email is recorded on its own so a retry does not repeat the other
+    owner_sent_at = models.DateTimeField(blank=True, null=True)
+    reply_sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='contact_outbox_due_idx'),
+            models.Index(fields=['created_at'], name='contact_created_idx'),
+        ]
 
     def __str__(self):
         return f"Message from {self.name} - {self.subject}"
@@ -145,7 +151,13 @@ class Certification(models.Model):
         validators=[validate_certificate_file]
     )
     thumbnail = models.ImageField(upload_to='certificates/thumbnails/', blank=True, null= True)
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     credential_link = models.URLField(blank=True, null=True)
+    # SHA-256 of the certificate file; identical certificates share a thumbnail (see main/thumbnails.py)
+    certificate_sha256 = models.CharField(max_length=64, blank=True, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['certificate_sha256'], name='certification_sha256_idx')]
 
     def __str__(self):
         return self.courseName
@@ -153,12 +165,88 @@ class Certification(models.Model):
 class ChatLog(models.Model):
     user_query = models.TextField()
     ai_response = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the exchange happened, not when the buffered writer stores it
+    timestamp = models.DateTimeField(default=timezone.now)
     model_used = models.CharField(max_length=100, blank=True, null=True)
     session_key = models.CharField(max_length=100, blank=True, null=True)
+    # Sessions that shared this answer while it was streaming (see singleflight.py)
+    follower_sessions = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # Ascending on purpose: scanned backwards, SQLite gets timestamp DESC
+            # with the implicit rowid DESC, which matches the admin's -timestamp, -pk.
+            # Newest-first pages in the admin and the retention sweep
+            models.Index(fields=['timestamp'], name='chatlog_timestamp_idx'),
+            # One visitor's conversation, in order
+            models.Index(fields=['session_key', 'timestamp'], name='chatlog_session_idx'),
+            # Filtering by model; also answers per-model counts by date from the index alone
+            models.Index(fields=['model_used', 'timestamp'], name='chatlog_model_idx'),
+        ]
     
     def __str__(self):
-        return f"Query at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"Query at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class ChatDailyRollup(models.Model):
+    """Chat counts per day and model, kept up to date as logs are written (see main/chat_analytics.py)."""
+    day = models.DateField()
+    model_used = models.CharField(max_length=100, blank=True, default='')
+    chats = models.PositiveIntegerField(default=0)
+    response_chars = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'model_used']
+        constraints = [models.UniqueConstraint(fields=['day', 'model_used'], name='chat_daily_rollup_unique')]
+
+    @property
+    def average_response_length(self):
+        return self.response_chars / self.chats if self.chats else 0
+
+    def __str__(self):
+        return f"{self.day} {self.model_used or 'unknown model'}: {self.chats}"
+
+
+class ChatQuestionRollup(models.Model):
+    """Questions per day, grouped by their normalized text."""
+    day = models.DateField()
+    fingerprint = models.CharField(max_length=40)
+    question = models.CharField(max_length=300)
+    chats = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', '-chats']
+        constraints = [models.UniqueConstraint(fields=['day', 'fingerprint'], name='chat_question_rollup_unique')]
+
+    def __str__(self):
+        return f"{self.day} {self.question}: {self.chats}"
+
+
+class ChatLengthRollup(models.Model):
+    """Response-length histogram per day and model; min_chars is the bucket's lower bound."""
+    day = models.DateField()
+    model_used = models.CharField(max_length=100, blank=True, default='')
+    min_chars = models.PositiveIntegerField()
+    chats = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'model_used', 'min_chars']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'model_used', 'min_chars'], name='chat_length_rollup_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.model_used or 'unknown model'} {self.min_chars}+ chars: {self.chats}"
+
+
+class MediaBlob(models.Model):
+    """How many file field values point at a stored media file (see main/media_refs.py)."""
+    name = models.CharField(max_length=255, unique=True)
+    refcount = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name}: {self.refcount}"
@@ -0,0 +1,269 @@
+# main/outbox.py
+"""
+Outbox for contact form emails.
+
+The contact view only saves the ContactMessage row; the notification to the
+site owner and the confirmation to the visitor are sent later by
+dispatch_outbox(). Each batch goes over one SMTP connection, and failed
+messages are retried with exponential backoff until OUTBOX_MAX_ATTEMPTS is
+reached. The two emails are recorded separately (owner_sent_at,
+reply_sent_at), so a retry only sends the one that has not gone out.
+
+A thread in the web process drains the outbox and stays up while retries
+are pending, then exits. It is woken when a new message is committed, and
+by the first request each process serves, so messages left pending or
+waiting for a retry by a previous process go out after a restart. Setups
+with OUTBOX_IN_PROCESS off run the send_outbox management command instead
+(e.g. as a scheduled task).
+
+The reply to the visitor is written in the Profile's name. While there is
+no Profile, the message stays pending after the owner's email and keeps
+backing off without running out of attempts.
+"""
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.core.signals import request_started
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import ContactMessage, Profile
+
+# How long a claimed row is hidden from other dispatchers while it is sent
+CLAIM_LEASE = timedelta(minutes=5)
+
+
+def owner_email(message):
+    email_context = {
+        'flow': "New Portfolio Inquiry",
+        'name': message.name,
+        'email': message.email,
+        'subject': message.subject,
+        'message': message.message,
+    }
+    email = EmailMessage(
+        subject=f"Inquiry: {message.subject}",
+        body=render_to_string('main/email_template.html', email_context),
+        from_email=settings.EMAIL_HOST_USER,
+        to=[settings.EMAIL_HOST_USER],
+    )
+    email.content_subtype = "html"
+    return email
+
+
+def reply_email(message, profile):
+    email_to_user = {
+        'flow': "Message Received!",
+        'name': profile.fname,
+        'email': profile.email,
+        'subject': "Confirmation for Message received",
+        'message': "I have received your message and will get back to you soon",
+    }
+    reply = EmailMessage(
+        subject="Thanks for reaching out!",
+        body=render_to_string('main/email_template.html', email_to_user),
+        from_email=settings.EMAIL_HOST_USER,
+        to=[message.email],
+    )
+    reply.content_subtype = "html"
+    return reply
+
+
+def send_unsent_emails(connection, message, profile):
+    """
+    Sends whichever of the message's emails have not gone out yet, recording
+    each one as soon as it is delivered. Returns False when the reply has to
+    wait for a profile.
+    """
+    if message.owner_sent_at is None:
+        connection.send_messages([owner_email(message)])
+        message.owner_sent_at = timezone.now()
+        message.save(update_fields=['owner_sent_at'])
+    if message.reply_sent_at is None:
+        if profile is None:
+            return False
+        connection.send_messages([reply_email(message, profile)])
+        message.reply_sent_at = timezone.now()
+        message.save(update_fields=['reply_sent_at'])
+    return True
+
+
+def retry_delay(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+    cap = getattr(settings, 'OUTBOX_RETRY_MAX_SECONDS', 6 * 60 * 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim(message, now):
+    """
+    Takes the row for this dispatcher. Only one of several concurrent
+    dispatchers gets a match on the attempts it read.
+    """
+    claimed = ContactMessage.objects.filter(
+        pk=message.pk, status=ContactMessage.STATUS_PENDING, attempts=message.attempts,
+    ).update(attempts=F('attempts') + 1, next_attempt_at=now + CLAIM_LEASE)
+    message.attempts += 1
+    return claimed == 1
+
+
+def mark_failed_attempt(message, error):
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 6)
+    message.last_error = str(error)[:1000]
+    if message.attempts >= max_attempts:
+        message.status = ContactMessage.STATUS_FAILED
+    else:
+        message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+
+
+def postpone(message, reason):
+    """Backs off like a failed attempt, but without ever marking the message failed."""
+    message.last_error = reason
+    message.next_attempt_at = timezone.now() + retry_delay(message.attempts)
+    message.save(update_fields=['next_attempt_at', 'last_error'])
+
+
+def dispatch_outbox(batch_size=20, connection=None):
+    """
+    Sends one batch of due messages and returns how many were delivered.
+    """
+    now = timezone.now()
+    due = ContactMessage.objects.filter(
+        status=ContactMessage.STATUS_PENDING, next_attempt_at__lte=now,
+    ).order_by('next_attempt_at')[:batch_size]
+    batch = [message for message in due if claim(message, now)]
+    if not batch:
+        return 0
+
+    profile = Profile.objects.first()
+    connection = connection or get_connection()
+    delivered = 0
+    try:
+        connection.open()
+    except Exception as e:
+        print(f"Outbox SMTP Error: {e}")
+        for message in batch:
+            mark_failed_attempt(message, e)
+        return 0
+
+    try:
+        for message in batch:
+            try:
+                complete = send_unsent_emails(connection, message, profile)
+            except Exception as e:
+                print(f"Outbox Error for message {message.pk}: {e}")
+                mark_failed_attempt(message, e)
+                continue
+            if not complete:
+                postpone(message, "No Profile to send the reply from")
+                continue
+            message.status = ContactMessage.STATUS_SENT
+            message.sent_at = timezone.now()
+            message.last_error = ''
+            message.save(update_fields=['status', 'sent_at', 'last_error'])
+            delivered += 1
+    finally:
+        connection.close()
+    return delivered
+
+
+def seconds_until_due():
+    """
+    Seconds until the next pending message is due (0 if one already is), or
+    None when nothing is waiting.
+    """
+    next_attempt_at = (
+        ContactMessage.objects.filter(status=ContactMessage.STATUS_PENDING)
+        .order_by('next_attempt_at').values_list('next_attempt_at', flat=True).first()
+    )
+    if next_attempt_at is None:
+        return None
+    return max((next_attempt_at - timezone.now()).total_seconds(), 0)
+
+
+class OutboxDispatcher:
+    def __init__(self):
+        self.woken = threading.Event()
+        # Guards thread, so wake() never misses a thread that is about to exit
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def wake(self):
+        """
+        Makes this process's dispatcher thread look at the outbox, starting it
+        if needed. Returns False when OUTBOX_IN_PROCESS is off.
+        """
+        if not getattr(settings, 'OUTBOX_IN_PROCESS', True):
+            return False
+        with self.lock:
+            self.woken.set()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='outbox-dispatcher', daemon=True)
+                self.thread.start()
+        return True
+
+    def _run(self):
+        while True:
+            self.woken.clear()
+            delay = self._drain()
+            close_old_connections()
+            if delay is None:
+                with self.lock:
+                    if not self.woken.is_set():
+                        self.thread = None
+                        return
+                continue
+            self.woken.wait(delay)
+
+    def _drain(self):
+        # Returns how long to sleep before the next retry, None if there is none
+        try:
+            while True:
+                dispatch_outbox()
+                delay = seconds_until_due()
+                if delay != 0:
+                    return delay
+        except Exception as e:
+            print(f"Outbox dispatcher error: {e}")
+            return getattr(settings, 'OUTBOX_RETRY_BASE_SECONDS', 60)
+
+
+outbox_dispatcher = OutboxDispatcher()
+
+
+def _message_saved(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        transaction.on_commit(outbox_dispatcher.wake)
+
+
+post_save.connect(_message_saved, sender=ContactMessage, dispatch_uid='contact-outbox-wake')
+
+
+def _first_request(sender, **kwargs):
+    # Picks up what a previous process left; the thread exits if nothing is waiting
+    request_started.disconnect(dispatch_uid='contact-outbox-first-request')
+    outbox_dispatcher.wake()
+
+
+def wake_on_first_request():
+    request_started.connect(_first_request, dispatch_uid='contact-outbox-first-request')
+
+
+wake_on_first_request()
+
+
+def _reset_after_fork():
+    # The dispatcher thread does not survive a fork; the child starts its own
+    outbox_dispatcher.woken = threading.Event()
+    outbox_dispatcher.lock = threading.Lock()
+    outbox_dispatcher.thread = None
+    wake_on_first_request()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,121 @@
+# main/pagecache.py
+"""
+Full-page cache for anonymous GETs of the portfolio.
+
+The rendered page is stored as final bytes, once plain and once gzipped, under
+a key made of the content version, the absolute URL and the response encoding.
+Bumping the content version (see content.py) makes every old entry unreachable,
+so the model save/delete signals double as the purge. The same version backs
+the ETag and Last-Modified validators used for conditional GETs.
+
+Cached pages are shared between visitors, so they are rendered without a CSRF
+token; script.js reads the token from the csrftoken cookie instead. The light
+and dark themes are switched client-side and need no separate variants.
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.contrib.messages.storage.session import SessionStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from .content import get_snapshot
+
+PAGE_CACHE_PREFIX = 'portfolio:page'
+
+accepts_gzip = re.compile(r'\bgzip\b')
+
+
+def has_pending_messages(request):
+    """
+    Whether flash messages are waiting for this visitor. FallbackStorage keeps
+    them in a cookie, and spills those that don't fit into the session.
+    """
+    if CookieStorage.cookie_name in request.COOKIES:
+        return True
+    session = getattr(request, 'session', None)
+    if session is None or settings.SESSION_COOKIE_NAME not in request.COOKIES:
+        return False
+    return bool(session.get(SessionStorage.session_key))
+
+
+def is_page_cacheable(request):
+    if not getattr(settings, 'PORTFOLIO_PAGE_CACHE', False):
+        return False
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    # Pending flash messages are rendered into the page for this visitor only
+    if has_pending_messages(request):
+        return False
+    # Only look the user up when there is a session to look in
+    if settings.SESSION_COOKIE_NAME in request.COOKIES and request.user.is_authenticated:
+        return False
+    return True
+
+
+def response_encoding(request):
+    return 'gzip' if accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')) else 'identity'
+
+
+def page_cache_key(request, version, encoding):
+    url_hash = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return f"{PAGE_CACHE_PREFIX}:{version}:{url_hash}:{encoding}"
+
+
+def cached_page_response(request, version, render_page):
+    """
+    Returns the cached page for this version and encoding, calling
+    render_page() to fill the cache on a miss.
+    """
+    encoding = response_encoding(request)
+    body = cache.get(page_cache_key(request, version, encoding))
+    status = 'hit'
+
+    if body is None:
+        status = 'miss'
+        rendered = render_page()
+        if rendered.status_code != 200:
+            return rendered
+        variants = {
+            'identity': rendered.content,
+            'gzip': compress_string(rendered.content),
+        }
+        cache.set_many(
+            {page_cache_key(request, version, enc): content for enc, content in variants.items()},
+            timeout=getattr(settings, 'PORTFOLIO_PAGE_CACHE_TIMEOUT', 3600),
+        )
+        body = variants[encoding]
+
+    response = HttpResponse(body, content_type='text/html; charset=utf-8')
+    if encoding == 'gzip':
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['X-Page-Cache'] = status
+    # The cached HTML carries no token, so make sure the visitor gets the cookie
+    get_token(request)
+    return response
+
+
+# ---------------------------------------------------
+# CONDITIONAL GET
+# ---------------------------------------------------
+
+def portfolio_etag(request):
+    # A 304 would hide flash messages waiting to be shown
+    if has_pending_messages(request):
+        return None
+    tag = f"{get_snapshot().version:x}"
+    if is_page_cacheable(request) and response_encoding(request) == 'gzip':
+        tag += '-gzip'
+    return f'"{tag}"'
+
+
+def portfolio_last_modified(request):
+    if has_pending_messages(request):
+        return None
+    return get_snapshot().last_modified
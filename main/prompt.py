@@ -0,0 +1,109 @@
+# main/prompt.py
+"""
+Chatbot prompt, compiled once per content version.
+
+Everything in the prompt except the conversation history, the question and
+the retrieved chunks depends only on portfolio content. It is rendered from
+the content snapshot, stored in the shared cache under the content version
+and memoised in process together with the retrieval index. A chat message
+then only picks chunks for the question and joins the pieces. Editing content
+bumps the version, which retires the old entry.
+"""
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .content import get_snapshot
+from .retrieval import BM25Index, chunk_snapshot, select_chunks
+
+PROMPT_CACHE_PREFIX = 'prompt:grounding'
+# Old versions are never read again; let them age out
+PROMPT_CACHE_TIMEOUT = 24 * 60 * 60
+
+Grounding = namedtuple('Grounding', 'version head base_context index')
+
+# 'synopsis' is the rolling summary of older turns (see conversation.py)
+ROLE_LABELS = {'user': 'User', 'assistant': 'Assistant', 'synopsis': 'Earlier the visitor asked about'}
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def render_grounding(snapshot):
+    profile = snapshot.profile
+    skills = [skill for group in snapshot.grouped_skills.values() for skill in group]
+
+    # Short facts that are useful for almost any question; the long
+    # descriptions are retrieved per question (see retrieval.py).
+    base_context = "".join([
+        f"Name: {snapshot.full_name}. Profession: {profile.profession}. ",
+        "Skills: ", ", ".join(s.name for s in skills), ". ",
+        f"Contact: Email: {profile.email}. Phone: {profile.phone}. ",
+        "Profiles/Links: ", ", ".join(f"{l.name}: {l.link}" for l in snapshot.other_links), ". ",
+    ])
+
+    head = f"""
+    You are the professional AI Career Assistant for {profile.fname}.
+    Your mission: Briefly and professionally help recruiters understand {profile.fname}'s value.
+
+    STRICT OPERATIONAL RULES:
+    Tone: Professional, helpful, and concise.
+    1. GROUNDING: Answer ONLY using the provided context. If information is missing, say: "I can only provide professional information about {profile.fname}. Please contact him directly for details on this."
+    2. BREVITY: Keep answers concise (approx 30 words).
+    3. FORMATTING: Use **Bold** for tech/degrees. Use single dash (-) for bullets.
+    4. CONTACT: Provide email and phone clearly if asked.
+    5. if they GREET: Greet users back politely.
+    # Change these rules in your system_instruction:
+    6. NO GREETINGS: Do not say "Hello," "Hi," or "Greetings." in every message.( avaoid if you have greeted earlier until they greets or says thank you)
+    7. DIRECT ANSWERS: Start the response immediately with the information requested.
+    CONVERSATION HISTORY:
+    8. If reqruiter ask for " Are you available for hire?" response postively and convence them that {profile.fname} is the Quick leaner ready to adap whatever skills required please lets connect also provde contact details if requored.
+    """
+    return head, base_context, tuple(chunk_snapshot(snapshot))
+
+
+def get_grounding():
+    """
+    Returns the Grounding for the current content, or None when no profile
+    exists yet.
+    """
+    global _compiled
+    snapshot = get_snapshot()
+    if snapshot.profile is None:
+        return None
+
+    compiled = _compiled
+    if compiled is not None and compiled.version == snapshot.version:
+        return compiled
+
+    with _compiled_lock:
+        if _compiled is None or _compiled.version != snapshot.version:
+            key = f"{PROMPT_CACHE_PREFIX}:{snapshot.version}"
+            parts = cache.get(key)
+            if parts is None:
+                parts = render_grounding(snapshot)
+                cache.set(key, parts, timeout=PROMPT_CACHE_TIMEOUT)
+            head, base_context, chunks = parts
+            _compiled = Grounding(snapshot.version, head, base_context, BM25Index(chunks))
+        return _compiled
+
+
+def build_chat_prompt(grounding, chat_history, user_query):
+    index = grounding.index
+    if getattr(settings, 'CHAT_RETRIEVAL', True):
+        # The previous question helps with follow-ups like "tell me more"
+        previous = [msg['content'] for msg in chat_history if msg['role'] == 'user'][-1:]
+        chunks = select_chunks(
+            index,
+            " ".join(previous + [user_query or ""]),
+            token_budget=getattr(settings, 'CHAT_CONTEXT_TOKEN_BUDGET', 600),
+            top_k=getattr(settings, 'CHAT_RETRIEVAL_TOP_K', 6),
+        )
+    else:
+        chunks = index.chunks
+    context = grounding.base_context + " ".join(chunk.text for chunk in chunks)
+
+    history_context = "".join(f"{ROLE_LABELS[msg['role']]}: {msg['content']}\n" for msg in chat_history)
+    return f"{grounding.head}{history_context}\n\n    CONTEXT:\n    {context}\n    \n\n User Question: {user_query}"
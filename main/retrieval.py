@@ -0,0 +1,154 @@
+# main/retrieval.py
+"""
+Offline BM25 retrieval over portfolio content for the chatbot prompt.
+
+Each Project, Experience, Education and Certification row and the profile
+objective are cut into self-contained chunks. A BM25 index over the chunks
+picks the ones relevant to a question, and select_chunks() fills a token
+budget with them instead of sending every description on every message.
+
+The index is rebuilt when the content version changes, but term counts are
+memoised per chunk text, so only chunks whose text changed are re-tokenised.
+Portfolios are tens of chunks, so plain dict postings are plenty.
+"""
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+
+# Rough size of a long description slice, in words
+CHUNK_WORDS = 80
+
+STOPWORDS = frozenset("""
+    a an and are as at be by can do does for from has have he her his how i in is it its me my of on or
+    our she so that the their them they this to was what when where which who why will with you your
+""".split())
+
+token_pattern = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+
+@dataclass(frozen=True)
+class Chunk:
+    key: str
+    text: str
+
+
+def tokenize(text):
+    terms = []
+    for term in token_pattern.findall(text.lower()):
+        if term in STOPWORDS:
+            continue
+        # Cheap plural folding so "projects" finds "project"
+        if len(term) > 3 and term.endswith('s') and not term.endswith('ss'):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+def estimate_tokens(text):
+    return len(text) // 4 + 1
+
+
+def _split(header, body, key):
+    words = body.split()
+    if len(words) <= CHUNK_WORDS:
+        return [Chunk(key, f"{header}: {body}".strip())]
+    return [
+        Chunk(f"{key}:{start // CHUNK_WORDS}", f"{header}: {' '.join(words[start:start + CHUNK_WORDS])}")
+        for start in range(0, len(words), CHUNK_WORDS)
+    ]
+
+
+def chunk_snapshot(snapshot):
+    """
+    Chunks in the order they should fill the budget when nothing matches.
+    """
+    profile = snapshot.profile
+    chunks = _split("Bio", profile.objective, f"profile:{profile.pk}")
+    for e in snapshot.experiences:
+        chunks += _split(f"Experience: {e.role} at {e.company} ({e.duration})", e.description, f"experience:{e.pk}")
+    for p in snapshot.projects:
+        chunks += _split(f"Project: {p.title} ({p.technologies})", p.description, f"project:{p.pk}")
+    for e in snapshot.education:
+        chunks.append(Chunk(
+            f"education:{e.pk}",
+            f"Education: {e.courseName} from {e.college} "
+            f"({e.admissionYear:%Y}-{e.passingYear:%Y}, CGPA/%: {e.CGPA})",
+        ))
+    for c in snapshot.certificates:
+        chunks.append(Chunk(f"certification:{c.pk}", f"Certification: {c.courseName} ({c.year:%Y})"))
+    return chunks
+
+
+_term_counts = {}
+_term_counts_lock = threading.Lock()
+
+
+def _counts_for(chunk):
+    counts = _term_counts.get(chunk.text)
+    if counts is None:
+        counts = Counter(tokenize(chunk.text))
+        with _term_counts_lock:
+            _term_counts[chunk.text] = counts
+    return counts
+
+
+class BM25Index:
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = tuple(chunks)
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.lengths = []
+        for position, chunk in enumerate(self.chunks):
+            counts = _counts_for(chunk)
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((position, tf))
+        self.avg_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        total = len(self.chunks)
+        self.idf = {
+            term: math.log(1 + (total - len(hits) + 0.5) / (len(hits) + 0.5))
+            for term, hits in self.postings.items()
+        }
+        # Forget counts for chunk texts that no longer exist
+        live = {chunk.text for chunk in self.chunks}
+        with _term_counts_lock:
+            for text in [text for text in _term_counts if text not in live]:
+                del _term_counts[text]
+
+    def search(self, query):
+        """Returns (score, position) pairs for chunks sharing a term with the query, best first."""
+        scores = {}
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for position, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(((score, position) for position, score in scores.items()), key=lambda hit: (-hit[0], hit[1]))
+
+
+def select_chunks(index, query, token_budget, top_k):
+    """
+    Best matching chunks first, then the rest in natural order, up to top_k
+    chunks. Chunks that would overflow the token budget are skipped.
+    """
+    ranked = [position for _score, position in index.search(query)]
+    ranked_set = set(ranked)
+    order = ranked + [position for position in range(len(index.chunks)) if position not in ranked_set]
+
+    selected = []
+    used = 0
+    for position in order:
+        chunk = index.chunks[position]
+        cost = estimate_tokens(chunk.text)
+        if len(selected) >= top_k:
+            break
+        if used + cost > token_budget:
+            continue
+        selected.append(chunk)
+        used += cost
+    return selected
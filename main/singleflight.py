@@ -0,0 +1,156 @@
+# main/singleflight.py
+"""
+Coalescing of identical chatbot generations that are in flight at once.
+
+When a portfolio link is shared, many visitors send the same opening question
+within seconds. The first request for a prompt key becomes the leader and
+streams from the model. Identical requests that arrive while it is streaming
+become followers: they replay the chunks the leader has received so far, then
+the rest as they arrive. They do not make their own upstream call.
+
+A flight ends ok only when a model finished its answer (race.answered_by).
+Followers save and cache nothing from a flight that failed: a leader whose
+models all failed, or whose stream broke off. A follower that got no text
+at all asks the model itself. The leader keeps reading the model after its
+own visitor disconnects, so its followers still get the whole answer.
+
+Flights live in process memory, so followers must be served by the same
+process as the leader. That is the common case under the async view, where
+one process handles every chat. Once the leader lands, later requests are
+served by the answer cache instead.
+"""
+import asyncio
+import threading
+
+from django.conf import settings
+
+from . import metrics
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+# Leader tasks of the async view, referenced until done so they are not collected
+_leaders = set()
+
+metrics.register_counters('singleflight.leaders', 'singleflight.followers')
+
+
+class Flight:
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        # Set by finish(): whether the chunks make up a complete answer
+        self.ok = False
+        self.follower_sessions = []
+        self.changed = threading.Condition()
+        self._async_waiters = []
+
+    def _wake(self):
+        # Called with self.changed held
+        self.changed.notify_all()
+        for loop, event in self._async_waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def publish(self, text):
+        with self.changed:
+            self.chunks.append(text)
+            self._wake()
+
+    def finish(self, ok=False):
+        with self.changed:
+            self.finished = True
+            self.ok = ok
+            self._wake()
+
+    def _stall_timeout(self):
+        # A leader that stops sending for this long is treated as gone
+        return settings.GENAI_TIMEOUT_MS / 1000
+
+    def follow(self):
+        """Yields every chunk of the flight, blocking the thread between chunks."""
+        position = 0
+        while True:
+            with self.changed:
+                if position == len(self.chunks) and not self.finished:
+                    self.changed.wait(self._stall_timeout())
+                new = self.chunks[position:]
+                finished = self.finished
+            if not new and not finished:
+                return
+            position += len(new)
+            yield from new
+            if finished and not new:
+                return
+
+    async def afollow(self):
+        """Async twin of follow() that waits on the event loop instead of a thread."""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self.changed:
+            self._async_waiters.append(waiter)
+        try:
+            position = 0
+            while True:
+                with self.changed:
+                    new = self.chunks[position:]
+                    finished = self.finished
+                    if not new and not finished:
+                        event.clear()
+                if new:
+                    position += len(new)
+                    for text in new:
+                        yield text
+                    continue
+                if finished:
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), self._stall_timeout())
+                except asyncio.TimeoutError:
+                    return
+        finally:
+            with self.changed:
+                self._async_waiters.remove(waiter)
+
+
+def join(key, session_key):
+    """
+    Returns (flight, is_leader). A follower's session key is recorded on the
+    flight so the leader can link it to the ChatLog row.
+    """
+    with _flights_lock:
+        flight = _flights.get(key)
+        leading = flight is None
+        if leading:
+            flight = _flights[key] = Flight()
+        else:
+            flight.follower_sessions.append(session_key)
+    metrics.incr('singleflight.leaders' if leading else 'singleflight.followers')
+    return flight, leading
+
+
+def land(key, flight):
+    """
+    Stops new requests from joining the flight. After this its follower list
+    no longer changes.
+    """
+    with _flights_lock:
+        if _flights.get(key) is flight:
+            del _flights[key]
+
+
+def lead_in_background(coroutine):
+    """
+    Runs an async leader's model read as its own task. Cancelling the
+    leader's request, as ASGI does on disconnect, then leaves it running.
+    """
+    task = asyncio.get_running_loop().create_task(coroutine)
+    _leaders.add(task)
+    task.add_done_callback(_leaders.discard)
+    task.add_done_callback(_report_failure)
+    return task
+
+
+def _report_failure(task):
+    # Nothing awaits a leader task, so its error would otherwise go unseen
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Singleflight leader error: {task.exception()!r}")
@@ -0,0 +1,41 @@
+# main/sqlite.py
+"""
+PRAGMAs applied to every new SQLite connection.
+
+The defaults (rollback journal, synchronous=FULL, no busy timeout of its own)
+make gunicorn workers that write chat logs, contact messages and sessions
+fail with "database is locked", and readers wait for writers. WAL lets reads
+run alongside the single writer. synchronous=NORMAL is still crash-safe in
+WAL mode. busy_timeout makes a writer wait for the lock instead of failing.
+
+The values come from settings.SQLITE_PRAGMAS, which reads them from the
+environment. An empty value skips that PRAGMA.
+"""
+import re
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+
+# Only these may be set from the environment. busy_timeout goes first so the
+# switch to WAL waits for other connections instead of failing. auto_vacuum
+# only takes effect on a new file, or after a VACUUM (see chat_retention.py).
+ALLOWED_PRAGMAS = ('busy_timeout', 'auto_vacuum', 'journal_mode', 'synchronous', 'mmap_size', 'cache_size', 'temp_store')
+
+value_pattern = re.compile(r"-?\w+")
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name in ALLOWED_PRAGMAS:
+            value = str(pragmas.get(name, '')).strip()
+            if not value:
+                continue
+            if not value_pattern.fullmatch(value):
+                raise ValueError(f"Invalid value for SQLite PRAGMA {name}: {value!r}")
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+connection_created.connect(apply_sqlite_pragmas, dispatch_uid='main.sqlite.apply_sqlite_pragmas')
@@ -83,7 +83,7 @@ document.addEventListener('DOMContentLoaded', () => {
             body: formData,
             headers: {
                 "X-Requested-With": "XMLHttpRequest",
-                "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]").value,
+                "X-CSRFToken": getCsrfToken(),
             },
         })
         .then(res => res.json())
@@ -132,7 +132,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const formData = new FormData();
         formData.append("message", query);
-        formData.append("csrfmiddlewaretoken", CSRF_TOKEN);
+        formData.append("csrfmiddlewaretoken", getCsrfToken());
 
         fetch("/chatbot-response/", { method: "POST", body: formData })
         .then((response) => {
@@ -207,6 +207,14 @@ document.addEventListener('DOMContentLoaded', () => {
 });
 
 // --- Utility Functions ---
+// The csrftoken cookie is always the current secret; a cached page may embed
+// a stale token or none, so CSRF_TOKEN is only used when there is no cookie
+window.getCsrfToken = function() {
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    if (match) return decodeURIComponent(match[1]);
+    return typeof CSRF_TOKEN !== "undefined" ? CSRF_TOKEN : "";
+}
+
 window.copyToClipboard = function(text, message) {
     navigator.clipboard.writeText(text).then(() => {
         Swal.fire({ toast: true, position: 'top-end', icon: 'success', title: message, showConfirmButton: false, timer: 2000, timerProgressBar: true });
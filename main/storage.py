@@ -0,0 +1,197 @@
+# main/storage.py
+"""
+Content-addressed storage for uploads (STORAGES['default']).
+
+FileSystemStorage keeps the uploaded file name and adds a random suffix on
+a clash. As a result, uploading the same certificate again leaves a second
+copy, and a URL can point at different bytes over time.
+
+This backend names each file after the SHA-256 of its bytes, inside the
+directory it was asked for:
+
+    certificates/java.pdf  ->  certificates/3f1c...e9.pdf
+
+Identical uploads to the same directory get the same name and are written
+once. A name never changes meaning, so its URL may be cached forever (see
+IMMUTABLE_CACHE_CONTROL in media.py). Files are written to a temporary name
+and renamed, so a reader never sees a partial file.
+
+Compressible files (PDFs, text, SVG) also get a gzip copy, plus a Brotli
+one when the brotli package is installed, next to them as name.gz and
+name.br. A copy is kept only when it is at least 5% smaller. media.py sends
+these copies to clients that accept them.
+
+Nothing here deletes files. Replaced and deleted uploads are reclaimed by
+`manage.py sweep_media` (see media_refs.py).
+
+StaticFilesStorage (STORAGES['staticfiles']) is WhiteNoise's hashed and
+compressed storage for collectstatic, with a fallback for checkouts where
+collectstatic has not run.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import tempfile
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.utils import validate_file_name
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Hex digits of the SHA-256 kept in names, as for image variants
+HASH_LENGTH = 32
+
+TEMP_PREFIX = '.upload-'
+
+# Precompressed copies, in order of preference
+PRECOMPRESSED = (('.br', 'br'), ('.gz', 'gzip'))
+
+# Images, audio, video and archives are compressed already
+COMPRESSIBLE_TYPES = ('text/', 'application/pdf', 'application/json', 'application/xml', 'image/svg+xml')
+
+# A copy must be at most this fraction of the original to be kept
+PRECOMPRESS_RATIO = 0.95
+
+CHUNK_SIZE = 256 * 1024
+
+CONTENT_NAME = re.compile(r'(?:^|/)[0-9a-f]{%d}(?:\.[0-9a-z]+)?$' % HASH_LENGTH)
+EXTENSION = re.compile(r'\.[0-9a-z]{1,10}')
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_NAME.search(name))
+
+
+def is_compressible(name):
+    content_type = mimetypes.guess_type(name)[0] or ''
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def is_precompressed_copy(name):
+    return name.endswith(tuple(suffix for suffix, _encoding in PRECOMPRESSED))
+
+
+def walk_files(directory):
+    """Yields a DirEntry for every file below directory, without following symlinks."""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk_files(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def _compress(source, target, encoding):
+    if encoding == 'gzip':
+        # mtime=0: the same file always gives the same bytes
+        with gzip.GzipFile(fileobj=target, mode='wb', compresslevel=9, mtime=0) as compressed:
+            shutil.copyfileobj(source, compressed, CHUNK_SIZE)
+        return
+    compressor = brotli.Compressor(quality=11)
+    for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+        target.write(compressor.process(chunk))
+    target.write(compressor.finish())
+
+
+def precompress(path):
+    """Writes the worthwhile precompressed copies of the file at path; returns their paths."""
+    if not is_compressible(path):
+        return []
+    size = os.path.getsize(path)
+    written = []
+    for suffix, encoding in PRECOMPRESSED:
+        if encoding == 'br' and brotli is None:
+            continue
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as target, open(path, 'rb') as source:
+                _compress(source, target, encoding)
+            if os.path.getsize(temp_path) > size * PRECOMPRESS_RATIO:
+                os.remove(temp_path)
+                continue
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, path + suffix)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        written.append(path + suffix)
+    return written
+
+
+def content_digest(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """The stored name for bytes with this digest, requested as `name`."""
+    extension = os.path.splitext(name)[1].lower()
+    if not EXTENSION.fullmatch(extension):
+        extension = ''
+    return posixpath.join(posixpath.dirname(name), digest[:HASH_LENGTH] + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        validate_file_name(name, allow_relative_path=True)
+        name = content_name(name, content_digest(content))
+        validate_file_name(name, allow_relative_path=True)
+        if self.exists(name):
+            # A fresh reference to an old file: restart its sweep grace period
+            os.utime(self.path(name))
+            return name
+        return self._save(name, content)
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, 'wb') as temp:
+                for chunk in content.chunks():
+                    temp.write(chunk if isinstance(chunk, bytes) else chunk.encode())
+            # mkstemp creates the file 0600; the web server must be able to read it
+            os.chmod(temp_path, 0o644 if self.file_permissions_mode is None else self.file_permissions_mode)
+            # Same name, same bytes: a concurrent save of this file is harmless
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._ensure_location_group_id(full_path)
+        precompress(full_path)
+        return name
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    Static URLs carry the content hash from the manifest collectstatic
+    writes. Without a manifest (development, the test runner) the names are
+    left unhashed instead of raising, and the finders serve the files.
+    """
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
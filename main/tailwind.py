@@ -0,0 +1,103 @@
+# main/tailwind.py
+"""
+Build-time Tailwind CSS for the portfolio page.
+
+The page used to load cdn.tailwindcss.com, which ships the Tailwind compiler
+to every visitor and generates the stylesheet in their browser.
+`manage.py build_tailwind`, which collectstatic runs first, now does that
+work once with the Tailwind CLI pinned in package.json, configured by
+tailwind.config.js (the theme the page used to configure inline):
+
+1. tailwind.css: every class in the page templates and script.js;
+2. tailwind.critical.css: only the classes above CRITICAL_MARKER in
+   portfolio.html, which style what the first screen shows. The page inlines
+   it in its <head> and loads tailwind.css without blocking rendering.
+
+Both are written to TAILWIND_BUILD_DIR, a STATICFILES_DIRS entry outside the
+source tree, so they are neither committed nor written into the app's
+static/ at deploy time. TAILWIND_CLI is the command to run: by default the
+CLI installed by `npm ci`, or the path of the standalone tailwindcss binary
+(same version) on hosts without node.
+"""
+import os
+import shlex
+import subprocess
+import tempfile
+
+from django.conf import settings
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG = os.path.join(BASE_DIR, 'tailwind.config.js')
+INPUT = os.path.join(BASE_DIR, 'assets', 'tailwind.css')
+
+PAGE_TEMPLATE = os.path.join(BASE_DIR, 'main', 'templates', 'main', 'portfolio.html')
+CRITICAL_MARKER = '{# tailwind: end of critical css #}'
+
+STATIC_PATH = 'main/css/tailwind.css'
+CRITICAL_STATIC_PATH = 'main/css/tailwind.critical.css'
+
+
+class TailwindError(Exception):
+    pass
+
+
+def output_path(static_path):
+    build_dir = getattr(settings, 'TAILWIND_BUILD_DIR', os.path.join(BASE_DIR, 'build', 'static'))
+    return os.path.join(build_dir, *static_path.split('/'))
+
+
+def critical_source(template=PAGE_TEMPLATE):
+    """The part of the page above CRITICAL_MARKER."""
+    with open(template, encoding='utf-8') as source:
+        text = source.read()
+    above, marker, _below = text.partition(CRITICAL_MARKER)
+    if not marker:
+        raise TailwindError(f"{template} has no {CRITICAL_MARKER} marker")
+    return above
+
+
+def run_cli(output, content=None):
+    """Compiles INPUT to `output`, minified; `content` overrides the config's content globs."""
+    command = shlex.split(getattr(settings, 'TAILWIND_CLI', 'npx --no-install tailwindcss'))
+    command += ['--config', CONFIG, '--input', INPUT, '--output', output, '--minify']
+    if content:
+        command += ['--content', content]
+    try:
+        subprocess.run(command, cwd=BASE_DIR, check=True, capture_output=True, text=True)
+    except FileNotFoundError:
+        raise TailwindError(f"{command[0]} not found; run `npm ci` or set TAILWIND_CLI to the standalone tailwindcss binary")
+    except subprocess.CalledProcessError as e:
+        raise TailwindError(f"{' '.join(command)} failed:\n{e.stderr}")
+
+
+def _compile(path, content=None):
+    # Unchanged output keeps its mtime, so collectstatic has nothing to copy
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.partial')
+    os.close(handle)
+    try:
+        run_cli(temp_path, content)
+        with open(temp_path, encoding='utf-8') as built:
+            css = built.read()
+        try:
+            with open(path, encoding='utf-8') as current:
+                if current.read() == css:
+                    return
+        except FileNotFoundError:
+            pass
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def build():
+    """Writes the full and critical stylesheets. Returns their paths."""
+    full, critical = output_path(STATIC_PATH), output_path(CRITICAL_STATIC_PATH)
+    _compile(full)
+    with tempfile.TemporaryDirectory() as scratch:
+        content = os.path.join(scratch, 'critical.html')
+        with open(content, 'w', encoding='utf-8') as above:
+            above.write(critical_source())
+        _compile(critical, content)
+    return full, critical
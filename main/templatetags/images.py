@@ -0,0 +1,43 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from main.images import MIME_TYPES
+
+register = template.Library()
+
+
+def _srcset(storage, entries):
+    return ", ".join(f"{storage.url(name)} {width}w" for width, name in entries)
+
+
+@register.simple_tag
+def picture(image, variants, sizes='100vw', **attrs):
+    """
+    <picture> markup for an image field and its variants manifest (see
+    main/images.py). Extra keyword arguments become attributes of the <img>.
+    Until the variants for the current file exist, this is a plain <img>.
+
+        {% picture profile.profile_image profile.profile_image_variants sizes="100vw" alt="..." %}
+    """
+    if not image:
+        return ''
+    if not variants or variants.get('source') != image.name:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+
+    storage = image.storage
+    *modern, fallback = variants['formats'].items()
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[name], _srcset(storage, entries), sizes) for name, entries in modern),
+    )
+    fallback_name, fallback_entries = fallback
+    img_attrs = {'width': variants['width'], 'height': variants['height'], **attrs}
+    return format_html(
+        '<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        sources,
+        storage.url(fallback_entries[-1][1]),
+        _srcset(storage, fallback_entries),
+        sizes,
+        flatatt(img_attrs),
+    )
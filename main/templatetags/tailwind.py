@@ -0,0 +1,29 @@
+import functools
+import os
+
+from django import template
+from django.contrib.staticfiles import finders
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from main.tailwind import CRITICAL_STATIC_PATH
+
+register = template.Library()
+
+
+@functools.lru_cache(maxsize=4)
+def _read(path, mtime_ns):
+    with open(path, encoding='utf-8') as source:
+        return source.read()
+
+
+@register.simple_tag
+def critical_css():
+    """
+    The critical subset of tailwind.css (see main/tailwind.py) as an inline
+    <style>, so the first screen renders without waiting for a stylesheet.
+    """
+    path = finders.find(CRITICAL_STATIC_PATH)
+    if path is None:
+        return ''
+    return format_html('<style>{}</style>', mark_safe(_read(path, os.stat(path).st_mtime_ns)))
@@ -0,0 +1,90 @@
+# main/testing.py
+"""
+Scripted stand-ins for the Gemini client, shared by the test suite and the
+benchmark commands so neither needs network access or an API key.
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+
+class FakeModels:
+    """
+    Sync client.models. Each model in `scripts` maps to a list of text chunks,
+    or to an exception instance raised when the stream is opened. An exception
+    inside the list is raised when the stream reaches it. Streams closed
+    before their end are listed in closed_streams.
+    """
+
+    def __init__(self, scripts, chunk_delay=0.0, prefill_per_kb=0.0, first_chunk_delays=None):
+        self.scripts = scripts
+        self.chunk_delay = chunk_delay
+        # Extra wait before the first chunk per KB of prompt, like a real model
+        self.prefill_per_kb = prefill_per_kb
+        # Extra wait before the first chunk of particular models, to script slow ones
+        self.first_chunk_delays = first_chunk_delays or {}
+        self.stream_calls = []
+        self.closed_streams = []
+        self.list_calls = 0
+
+    def list(self):
+        self.list_calls += 1
+        return [SimpleNamespace(name=name, supported_actions=['generateContent']) for name in self.scripts]
+
+    def _script(self, model, contents):
+        self.stream_calls.append((model, contents))
+        script = self.scripts[model]
+        if isinstance(script, Exception):
+            raise script
+        return script
+
+    def prefill_delay(self, model, contents):
+        return self.first_chunk_delays.get(model, 0.0) + self.prefill_per_kb * len(contents.encode()) / 1024
+
+    def generate_content_stream(self, model, contents):
+        script = self._script(model, contents)
+
+        def stream():
+            try:
+                time.sleep(self.prefill_delay(model, contents))
+                for text in script:
+                    time.sleep(self.chunk_delay)
+                    if isinstance(text, Exception):
+                        raise text
+                    yield SimpleNamespace(text=text)
+            except GeneratorExit:
+                self.closed_streams.append(model)
+                raise
+        return stream()
+
+
+class FakeAsyncModels:
+    """client.aio.models, sharing the scripts and call log of the sync side."""
+
+    def __init__(self, models):
+        self.models = models
+
+    async def list(self):
+        return self.models.list()
+
+    async def generate_content_stream(self, model, contents):
+        script = self.models._script(model, contents)
+
+        async def stream():
+            try:
+                await asyncio.sleep(self.models.prefill_delay(model, contents))
+                for text in script:
+                    await asyncio.sleep(self.models.chunk_delay)
+                    if isinstance(text, Exception):
+                        raise text
+                    yield SimpleNamespace(text=text)
+            except (GeneratorExit, asyncio.CancelledError):
+                self.models.closed_streams.append(model)
+                raise
+        return stream()
+
+
+class FakeClient:
+    def __init__(self, scripts, chunk_delay=0.0, prefill_per_kb=0.0, first_chunk_delays=None):
+        self.models = FakeModels(scripts, chunk_delay, prefill_per_kb, first_chunk_delays)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self.models))
@@ -1,3 +1,1759 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import MessageEncoder
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends import locmem
+from django.db import OperationalError, connection, connections
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import genai_client, metrics, model_catalog, model_router, singleflight, tailwind, thumbnails
+from .answer_cache import AnswerCache, answer_cache, normalize_question, replay_chunks
+from .chat_analytics import add_to_rollups, compact_question_rollups, dashboard, length_bucket
+from .chat_retention import archive_chatlogs, archive_path, incremental_vacuum, retention_cutoff
+from .chat_search import MARK_END, MARK_START, search_chatlogs
+from .images import IMAGE_FIELDS, refresh_variants, schedule
+from .chatlog_writer import ChatLogWriter, chatlog_writer
+from .content import get_content_version, get_snapshot
+from .conversation import append_exchange, load_conversation, prompt_history
+from .media import serve_media
+from .model_catalog import get_model_catalog
+from .models import Certification, ChatDailyRollup, ChatLengthRollup, ChatLog, ChatQuestionRollup, ContactMessage, Experience, MediaBlob, Profile, Project, Skill
+from .outbox import dispatch_outbox, outbox_dispatcher, wake_on_first_request
+from .prompt import build_chat_prompt, get_grounding
+from .sqlite import apply_sqlite_pragmas
+from .retrieval import BM25Index, chunk_snapshot, estimate_tokens, select_chunks
+from .testing import FakeClient
+from .views import ai_chatBot, ai_chatBot_async
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE, OUTBOX_IN_PROCESS=False)
+class PortfolioTestCase(TestCase):
+    """
+    Base for every test class: a local-memory cache, never the FileBasedCache
+    the settings use, and no outbox thread querying the database behind the test.
+    """
+
+
+# Chat view tests flush the ChatLog writer themselves, on the test thread
+CHAT_SETTINGS = {
+    'SECURE_SSL_REDIRECT': False, 'RATELIMIT_ENABLE': False, 'CHATLOG_FLUSH_INTERVAL': 0,
+}
+
+
+def reset_chat_state(test):
+    cache.clear()
+    answer_cache.clear()
+    chatlog_writer.discard()
+    test.addCleanup(chatlog_writer.discard)
+
+
+def make_profile(**kwargs):
+    fields = {
+        'fname': 'Ada', 'mname': '', 'lname': 'Lovelace',
+        'email': 'ada@example.com', 'phone': '9999999999',
+        'github': 'https://github.com/ada', 'linkedin': 'https://linkedin.com/in/ada',
+        'objective': 'Building things.', 'profession': 'Engineer',
+    }
+    fields.update(kwargs)
+    return Profile.objects.create(**fields)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class PortfolioSnapshotTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.profile = make_profile()
+        Project.objects.create(title='Lawyer Booking', description='Bookings', technologies='Django')
+        Skill.objects.create(name='Python', category='Language')
+
+    def test_warm_page_makes_no_queries(self):
+        self.client.get(reverse('portfolio'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('portfolio'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Lawyer Booking')
+        self.assertEqual(len(queries), 0)
+
+    def test_save_bumps_version_after_commit(self):
+        before = get_snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(title='Chatbot', description='Gemini', technologies='Python')
+        self.assertNotEqual(get_content_version(), before.version)
+        self.assertEqual([p.title for p in get_snapshot().projects], ['Chatbot', 'Lawyer Booking'])
+
+    def test_delete_bumps_version(self):
+        before = get_content_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.all().delete()
+        self.assertNotEqual(get_content_version(), before)
+        self.assertEqual(dict(get_snapshot().grouped_skills), {})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class SkillGroupingTests(PortfolioTestCase):
+    # One query per model on a cold snapshot build, however many categories
+    PAGE_QUERIES = 7
+
+    def setUp(self):
+        cache.clear()
+        make_profile()
+
+    def test_page_query_count_is_independent_of_categories(self):
+        for index, (category, _label) in enumerate(Skill.CATEGORY_CHOICES):
+            Skill.objects.create(name=f'Skill {index}', category=category)
+            Skill.objects.create(name=f'Other {index}', category=category)
+
+        with self.assertNumQueries(self.PAGE_QUERIES):
+            response = self.client.get(reverse('portfolio'))
+        grouped = response.context['grouped_skills']
+        self.assertEqual(list(grouped), [choice[0] for choice in Skill.CATEGORY_CHOICES])
+        self.assertTrue(all(isinstance(skills, list) and len(skills) == 2 for skills in grouped.values()))
+
+    def test_empty_categories_are_dropped(self):
+        Skill.objects.create(name='SQLite', category='Database')
+        Skill.objects.create(name='Python', category='Language')
+
+        grouped = get_snapshot().grouped_skills
+        self.assertEqual(list(grouped), ['Language', 'Database'])
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, PORTFOLIO_PAGE_CACHE=True)
+class PageCacheTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        make_profile()
+        Project.objects.create(title='Lawyer Booking', description='Bookings', technologies='Django')
+
+    def test_second_anonymous_get_is_served_from_cache(self):
+        first = self.client.get(reverse('portfolio'))
+        self.assertEqual(first['X-Page-Cache'], 'miss')
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('portfolio'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertContains(second, 'const CSRF_TOKEN = "";')
+        self.assertIn('csrftoken', second.cookies)
+
+    def test_gzip_variant_is_stored_precompressed(self):
+        self.client.get(reverse('portfolio'))
+        response = self.client.get(reverse('portfolio'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), self.client.get(reverse('portfolio')).content)
+
+    def test_flash_messages_bypass_cache(self):
+        self.client.get(reverse('portfolio'))
+        self.client.cookies['messages'] = 'pending'
+        response = self.client.get(reverse('portfolio'))
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_flash_messages_spilled_to_the_session_bypass_cache(self):
+        first = self.client.get(reverse('portfolio'))
+        session = self.client.session
+        session['_messages'] = json.dumps([Message(messages.SUCCESS, 'Message sent!')], cls=MessageEncoder)
+        session.save()
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session.session_key
+
+        response = self.client.get(reverse('portfolio'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_post_is_never_cached(self):
+        response = self.client.post(reverse('portfolio'), {'name': ''})
+        self.assertFalse(response.has_header('X-Page-Cache'))
+
+    def test_content_change_purges_page(self):
+        self.client.get(reverse('portfolio'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(title='Chatbot', description='Gemini', technologies='Python')
+        response = self.client.get(reverse('portfolio'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Chatbot')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ConditionalGetTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        make_profile()
+
+    def test_matching_etag_returns_304_without_rendering(self):
+        first = self.client.get(reverse('portfolio'))
+        self.assertTrue(first.has_header('ETag'))
+        self.assertTrue(first.has_header('Last-Modified'))
+        self.assertIn('no-cache', first['Cache-Control'])
+
+        with self.assertTemplateNotUsed('main/portfolio.html'):
+            response = self.client.get(reverse('portfolio'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_returns_304(self):
+        first = self.client.get(reverse('portfolio'))
+        response = self.client.get(reverse('portfolio'), HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_content_change_changes_etag(self):
+        first = self.client.get(reverse('portfolio'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(title='Chatbot', description='Gemini', technologies='Python')
+        response = self.client.get(reverse('portfolio'), HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+
+class MediaValidatorTests(PortfolioTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        with open(os.path.join(self.media_root, 'resume.pdf'), 'wb') as fh:
+            fh.write(b'%PDF-1.4 resume')
+        self.factory = RequestFactory()
+
+    def test_media_revalidates_with_etag(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            first = serve_media(self.factory.get('/media/resume.pdf'), path='resume.pdf')
+            self.assertEqual(first.status_code, 200)
+            self.assertTrue(first.has_header('Last-Modified'))
+
+            request = self.factory.get('/media/resume.pdf', HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(serve_media(request, path='resume.pdf').status_code, 304)
+
+    def test_missing_and_traversal_paths_are_rejected(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            with self.assertRaises(Http404):
+                serve_media(self.factory.get('/media/missing.pdf'), path='missing.pdf')
+            with self.assertRaises(SuspiciousFileOperation):
+                serve_media(self.factory.get('/media/../etc/passwd'), path='../etc/passwd')
+
+    def test_content_addressed_files_are_immutable(self):
+        name = hashlib.sha256(b'cv').hexdigest()[:32] + '.pdf'
+        with open(os.path.join(self.media_root, name), 'wb') as fh:
+            fh.write(b'cv')
+        with self.settings(MEDIA_ROOT=self.media_root):
+            response = serve_media(self.factory.get(f'/media/{name}'), path=name)
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            self.assertFalse(response.has_header('Content-Disposition'))
+            response = serve_media(self.factory.get(f'/media/{name}', HTTP_IF_NONE_MATCH=response['ETag']), path=name)
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+            response = serve_media(self.factory.get('/media/resume.pdf'), path='resume.pdf')
+            self.assertFalse(response.has_header('Cache-Control'))
+            self.assertEqual(response['Content-Disposition'], 'inline; filename="resume.pdf"')
+
+    def get(self, path, **headers):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            response = serve_media(self.factory.get(f'/media/{path}', headers=headers), path=path)
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+            response.close()
+        return response, body
+
+    def test_byte_ranges(self):
+        response, body = self.get('resume.pdf', Range='bytes=2-5')
+        self.assertEqual((response.status_code, body), (206, b'DF-1'))
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/15')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.get('resume.pdf', Range='bytes=-6')[1], b'resume')
+        self.assertEqual(self.get('resume.pdf', Range='bytes=9-100')[1], b'resume')
+
+        response, _body = self.get('resume.pdf', Range='bytes=15-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */15'))
+        # Several ranges, or a validator that no longer matches: the whole file
+        self.assertEqual(self.get('resume.pdf', Range='bytes=0-1,4-5')[0].status_code, 200)
+        response, body = self.get('resume.pdf', Range='bytes=2-5', If_Range='"stale"')
+        self.assertEqual((response.status_code, body), (200, b'%PDF-1.4 resume'))
+        etag = self.get('resume.pdf')[0]['ETag']
+        self.assertEqual(self.get('resume.pdf', Range='bytes=2-5', If_Range=etag)[0].status_code, 206)
+
+    def test_whole_files_can_be_sent_with_sendfile(self):
+        with self.settings(MEDIA_ROOT=self.media_root):
+            response = serve_media(self.factory.get('/media/resume.pdf'), path='resume.pdf')
+            # What wsgi.file_wrapper gets: the file itself for whole files, a bounded reader for ranges
+            self.assertTrue(hasattr(response.file_to_stream, 'fileno'))
+            response.close()
+            response = serve_media(self.factory.get('/media/resume.pdf', headers={'Range': 'bytes=0-3'}), path='resume.pdf')
+            self.assertFalse(hasattr(response.file_to_stream, 'fileno'))
+            response.close()
+
+    def test_asgi_requests_stream_asynchronously(self):
+        async def fetch():
+            request = AsyncRequestFactory().get('/media/resume.pdf', headers={'Range': 'bytes=9-'})
+            response = await sync_to_async(serve_media)(request, path='resume.pdf')
+            self.assertTrue(response.is_async)
+            return response.status_code, b''.join([chunk async for chunk in response])
+
+        with self.settings(MEDIA_ROOT=self.media_root):
+            self.assertEqual(async_to_sync(fetch)(), (206, b'resume'))
+
+    def test_precompressed_copies(self):
+        from main.storage import precompress
+
+        path = os.path.join(self.media_root, 'notes.txt')
+        with open(path, 'wb') as fh:
+            fh.write(b'notes ' * 500)
+        self.assertEqual(precompress(path), [path + '.gz'])
+        response, body = self.get('notes.txt', Accept_Encoding='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(body), b'notes ' * 500)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['Content-Type'], 'text/plain')
+
+        self.assertFalse(self.get('notes.txt', Accept_Encoding='gzip;q=0')[0].has_header('Content-Encoding'))
+        response, body = self.get('notes.txt', Accept_Encoding='gzip', Range='bytes=0-4')
+        self.assertEqual((response.status_code, body), (206, b'notes'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_hidden_files_and_links_out_are_not_served(self):
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside)
+        with open(os.path.join(outside, 'secret.txt'), 'w') as fh:
+            fh.write('secret')
+        os.symlink(os.path.join(outside, 'secret.txt'), os.path.join(self.media_root, 'link.txt'))
+        with open(os.path.join(self.media_root, '.upload-abc'), 'w') as fh:
+            fh.write('partial')
+        for path in ('link.txt', '.upload-abc', 'nested/../.upload-abc'):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self.get(path)
+
+    def test_media_is_routed_without_debug(self):
+        with self.settings(MEDIA_ROOT=self.media_root, DEBUG=False, SECURE_SSL_REDIRECT=False):
+            response = self.client.get('/media/resume.pdf', headers={'Range': 'bytes=0-3'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF')
+            response.close()
+            self.assertEqual(self.client.post('/media/resume.pdf').status_code, 405)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, EMAIL_HOST_USER='owner@example.com')
+class ContactOutboxTests(PortfolioTestCase):
+    form_data = {'name': 'Grace', 'email': 'grace@example.com', 'subject': 'Hiring', 'message': 'Hello'}
+
+    def setUp(self):
+        cache.clear()
+        make_profile()
+
+    def test_form_returns_before_any_email_is_sent(self):
+        response = self.client.post(reverse('portfolio'), self.form_data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(ContactMessage.objects.get().status, ContactMessage.STATUS_PENDING)
+
+    def test_dispatch_sends_both_emails_over_one_connection(self):
+        ContactMessage.objects.create(**self.form_data)
+        ContactMessage.objects.create(**dict(self.form_data, email='linus@example.com'))
+
+        with mock.patch.object(locmem.EmailBackend, 'open', autospec=True, side_effect=locmem.EmailBackend.open) as opened:
+            self.assertEqual(dispatch_outbox(), 2)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(len(mail.outbox), 4)
+        self.assertEqual({m.to[0] for m in mail.outbox}, {'owner@example.com', 'grace@example.com', 'linus@example.com'})
+        self.assertFalse(ContactMessage.objects.exclude(status=ContactMessage.STATUS_SENT).exists())
+        self.assertEqual(dispatch_outbox(), 0)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BASE_SECONDS=60)
+    def test_failures_back_off_then_give_up(self):
+        message = ContactMessage.objects.create(**self.form_data)
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', side_effect=OSError('smtp down')):
+            self.assertEqual(dispatch_outbox(), 0)
+            message.refresh_from_db()
+            self.assertEqual(message.attempts, 1)
+            self.assertEqual(message.status, ContactMessage.STATUS_PENDING)
+            self.assertGreater(message.next_attempt_at, timezone.now() + timedelta(seconds=50))
+            self.assertEqual(dispatch_outbox(), 0)  # not due yet
+
+            ContactMessage.objects.update(next_attempt_at=timezone.now())
+            dispatch_outbox()
+        message.refresh_from_db()
+        self.assertEqual(message.status, ContactMessage.STATUS_FAILED)
+        self.assertIn('smtp down', message.last_error)
+        self.assertEqual(len(mail.outbox), 0)
+
+    def test_retry_only_sends_the_email_that_failed(self):
+        message = ContactMessage.objects.create(**self.form_data)
+
+        def send_messages(backend, emails):
+            if emails[0].to == ['grace@example.com']:
+                raise OSError('mailbox busy')
+            return send_messages.wrapped(backend, emails)
+        send_messages.wrapped = locmem.EmailBackend.send_messages
+
+        with mock.patch.object(locmem.EmailBackend, 'send_messages', autospec=True, side_effect=send_messages):
+            self.assertEqual(dispatch_outbox(), 0)
+        message.refresh_from_db()
+        self.assertIsNotNone(message.owner_sent_at)
+        self.assertIsNone(message.reply_sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+
+        ContactMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_outbox(), 1)
+        self.assertEqual([m.to for m in mail.outbox], [['owner@example.com'], ['grace@example.com']])
+
+    def test_reply_waits_for_a_profile(self):
+        Profile.objects.all().delete()
+        message = ContactMessage.objects.create(**self.form_data)
+        with self.settings(OUTBOX_MAX_ATTEMPTS=1):
+            self.assertEqual(dispatch_outbox(), 0)
+        message.refresh_from_db()
+        self.assertEqual(message.status, ContactMessage.STATUS_PENDING)
+        self.assertIsNotNone(message.owner_sent_at)
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertEqual([m.to for m in mail.outbox], [['owner@example.com']])
+
+        make_profile()
+        ContactMessage.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch_outbox(), 1)
+        self.assertEqual([m.to for m in mail.outbox], [['owner@example.com'], ['grace@example.com']])
+
+    def test_first_request_after_a_restart_wakes_the_dispatcher(self):
+        wake_on_first_request()
+        with mock.patch.object(outbox_dispatcher, 'wake') as wake:
+            self.client.get(reverse('portfolio'))
+            self.client.get(reverse('portfolio'))
+        self.assertEqual(wake.call_count, 1)
+
+    def test_committed_message_wakes_the_dispatcher(self):
+        with mock.patch.object(outbox_dispatcher, 'wake') as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse('portfolio'), self.form_data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(wake.call_count, 1)
+
+    def test_dispatcher_thread_drains_the_outbox_and_exits(self):
+        looked = threading.Event()
+        with self.settings(OUTBOX_IN_PROCESS=True), \
+                mock.patch('main.outbox.dispatch_outbox', side_effect=lambda: looked.wait(10)) as dispatch, \
+                mock.patch('main.outbox.seconds_until_due', return_value=None):
+            self.assertTrue(outbox_dispatcher.wake())
+            thread = outbox_dispatcher.thread
+            looked.set()
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(thread.name, 'outbox-dispatcher')
+        self.assertIsNone(outbox_dispatcher.thread)
+        dispatch.assert_called()
+
+        with self.settings(OUTBOX_IN_PROCESS=False):
+            self.assertFalse(outbox_dispatcher.wake())
+        self.assertIsNone(outbox_dispatcher.thread)
+
+
+@override_settings(**CHAT_SETTINGS)
+class AsyncChatbotTests(PortfolioTestCase):
+    def setUp(self):
+        reset_chat_state(self)
+        make_profile()
+        self.factory = AsyncRequestFactory()
+
+    async def ask(self, client, question='What are his skills?'):
+        request = self.factory.post('/chatbot-response/', {'message': question})
+        request.session = SessionStore()
+        with mock.patch('main.views.get_genai_client', return_value=client), \
+                mock.patch('main.views.get_async_genai_client', return_value=client.aio):
+            response = await ai_chatBot_async(request)
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        return request, body
+
+    async def test_streams_sse_frames_and_logs_the_answer(self):
+        client = FakeClient({'models/gemini-flash': ['Python', ' and Django']})
+        request, body = await self.ask(client)
+
+        self.assertEqual(body.decode(), 'data: {"text": "Python"}\n\ndata: {"text": " and Django"}\n\n')
+        await sync_to_async(chatlog_writer.flush)()
+        log = await ChatLog.objects.aget()
+        self.assertEqual((log.ai_response, log.model_used), ('Python and Django', 'models/gemini-flash'))
+        conversation = await sync_to_async(load_conversation)(request.session.session_key)
+        self.assertEqual([m['role'] for m in conversation.turns], ['user', 'assistant'])
+
+    async def test_falls_back_to_next_model_on_error(self):
+        client = FakeClient({'models/gemini-2.0-flash': RuntimeError('quota'), 'models/gemini-1.5-flash': ['ok']})
+        _request, body = await self.ask(client)
+        self.assertIn(b'"ok"', body)
+        await sync_to_async(chatlog_writer.flush)()
+        self.assertEqual((await ChatLog.objects.aget()).model_used, 'models/gemini-1.5-flash')
+
+    async def test_missing_api_key_ends_the_stream_instead_of_a_500(self):
+        request = self.factory.post('/chatbot-response/', {'message': 'What are his skills?'})
+        request.session = SessionStore()
+        with mock.patch('main.views.get_genai_client', side_effect=RuntimeError('GEMINI_API_KEY is not set')), \
+                mock.patch('builtins.print'):
+            response = await ai_chatBot_async(request)
+            body = b''.join([chunk async for chunk in response.streaming_content])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, b'')
+        self.assertFalse(await ChatLog.objects.aexists())
+
+    async def test_concurrent_streams_share_one_event_loop(self):
+        # 20 chats of 5 chunks at 40 ms each would take 4 s back to back
+        client = FakeClient({'models/gemini-flash': ['a'] * 5}, chunk_delay=0.04)
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.ask(client) for _ in range(20)))
+        elapsed = time.perf_counter() - started
+
+        self.assertTrue(all(body.count(b'data: ') == 5 for _request, body in results))
+        self.assertLess(elapsed, 2.0)
+
+
+@override_settings(MODEL_CATALOG_TTL=60)
+class ModelCatalogTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.genai = FakeClient({'models/gemini-2.0-flash': ['a'], 'models/gemini-2.5-flash': ['b'], 'models/gemini-pro': ['c']})
+
+    def test_discovers_once_then_serves_from_cache(self):
+        self.assertEqual(get_model_catalog(self.genai), ['models/gemini-2.5-flash', 'models/gemini-2.0-flash'])
+        get_model_catalog(self.genai)
+        get_model_catalog(self.genai)
+        self.assertEqual(self.genai.models.list_calls, 1)
+        self.assertEqual(metrics.read_counter('model_catalog.misses'), 1)
+        self.assertAlmostEqual(metrics.hit_ratio('model_catalog'), 2 / 3)
+        self.assertEqual(metrics.read_timing('model_catalog.discovery')['count'], 1)
+
+    def test_stale_entry_is_served_while_refreshing(self):
+        cache.set(model_catalog.CATALOG_KEY, {'models': ['models/old-flash'], 'fetched_at': time.time() - 120}, timeout=None)
+        threads = []
+        start_refresh = model_catalog.refresh_in_background
+        with mock.patch.object(model_catalog, 'refresh_in_background', side_effect=lambda c: threads.append(start_refresh(c))):
+            self.assertEqual(get_model_catalog(self.genai), ['models/old-flash'])
+        threads[0].join()
+        self.assertEqual(get_model_catalog(self.genai)[0], 'models/gemini-2.5-flash')
+
+    def test_failed_discovery_keeps_last_known_good(self):
+        cache.set(model_catalog.CATALOG_KEY, {'models': ['models/known-flash'], 'fetched_at': 0}, timeout=None)
+        with mock.patch.object(self.genai.models, 'list', side_effect=RuntimeError('offline')):
+            self.assertIsNone(model_catalog.refresh_catalog(self.genai))
+        self.assertEqual(get_model_catalog(self.genai), ['models/known-flash'])
+        self.assertEqual(metrics.read_counter('model_catalog.discovery_errors'), 1)
+
+    def test_cold_failure_falls_back_to_defaults(self):
+        with mock.patch.object(self.genai.models, 'list', side_effect=RuntimeError('offline')):
+            self.assertEqual(get_model_catalog(self.genai), model_catalog.DEFAULT_MODELS)
+
+
+class GenaiClientPoolTests(PortfolioTestCase):
+    def setUp(self):
+        genai_client.reset_genai_clients()
+        self.addCleanup(genai_client.reset_genai_clients)
+
+    @mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'key-1'})
+    def test_client_is_reused_and_rebuilt_on_key_rotation(self):
+        first = genai_client.get_genai_client()
+        self.assertIs(genai_client.get_genai_client(), first)
+        with mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'key-2'}):
+            self.assertIsNot(genai_client.get_genai_client(), first)
+
+    @mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'key-1'})
+    def test_reset_after_fork_drops_the_client(self):
+        first = genai_client.get_genai_client()
+        genai_client.reset_genai_clients()
+        self.assertIsNot(genai_client.get_genai_client(), first)
+
+    @mock.patch.dict(os.environ, {'GEMINI_API_KEY': 'key-1'})
+    def test_async_clients_are_per_event_loop(self):
+        async def fetch_twice():
+            return genai_client.get_async_genai_client(), genai_client.get_async_genai_client()
+
+        first, again = asyncio.run(fetch_twice())
+        other, _ = asyncio.run(fetch_twice())
+        self.assertIs(first, again)
+        self.assertIsNot(first, other)
+
+    @mock.patch.dict(os.environ, {}, clear=True)
+    def test_missing_key_raises(self):
+        with self.assertRaises(ValueError):
+            genai_client.get_genai_client()
+
+
+class PromptCompilerTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        make_profile()
+        Skill.objects.create(name='Python', category='Language')
+        Project.objects.create(title='Lawyer Booking', description='Bookings', technologies='Django')
+
+    def test_warm_prompt_needs_no_queries(self):
+        get_grounding()
+        with self.assertNumQueries(0):
+            contents = build_chat_prompt(
+                get_grounding(),
+                [{'role': 'user', 'content': 'Hi'}, {'role': 'assistant', 'content': 'Hello'}],
+                'What are his skills?',
+            )
+        self.assertIn('Skills: Python.', contents)
+        self.assertIn('Project: Lawyer Booking (Django): Bookings', contents)
+        self.assertIn('User: Hi\nAssistant: Hello\n', contents)
+        self.assertTrue(contents.endswith('User Question: What are his skills?'))
+        self.assertLess(contents.index('Assistant: Hello'), contents.index('CONTEXT:'))
+
+    def test_grounding_is_recompiled_after_content_change(self):
+        before = get_grounding()
+        with self.captureOnCommitCallbacks(execute=True):
+            Skill.objects.create(name='Rust', category='Language')
+        after = get_grounding()
+        self.assertNotEqual(before.version, after.version)
+        self.assertIn('Python, Rust', after.base_context)
+
+    def test_no_profile_means_no_grounding(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Profile.objects.all().delete()
+        self.assertIsNone(get_grounding())
+
+
+@override_settings(CHAT_CONTEXT_TOKEN_BUDGET=200, CHAT_RETRIEVAL_TOP_K=2)
+class RetrievalTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        make_profile(objective='Backend engineer who enjoys APIs.')
+        Project.objects.create(title='Lawyer Booking', description='Appointment booking for law firms.', technologies='Django')
+        Project.objects.create(title='Gemini Chatbot', description='Streaming assistant over SSE.', technologies='Python')
+        Certification.objects.create(courseName='Java Fundamentals', year=date(2024, 5, 1), certificate='certificates/java.png')
+
+    def test_relevant_chunks_are_ranked_first(self):
+        contents = build_chat_prompt(get_grounding(), [], 'Which certifications does he hold?')
+        self.assertIn('Certification: Java Fundamentals (2024)', contents)
+        self.assertNotIn('Lawyer Booking', contents)
+
+    def test_unmatched_question_falls_back_to_natural_order(self):
+        contents = build_chat_prompt(get_grounding(), [], 'Hello there')
+        self.assertIn('Bio: Backend engineer', contents)
+
+    def test_previous_question_steers_follow_ups(self):
+        history = [{'role': 'user', 'content': 'Tell me about the chatbot project'}, {'role': 'assistant', 'content': 'Sure.'}]
+        contents = build_chat_prompt(get_grounding(), history, 'What stack did it use?')
+        self.assertIn('Gemini Chatbot', contents)
+
+    def test_token_budget_is_respected(self):
+        Project.objects.create(title='Huge', description='word ' * 2000, technologies='Go')
+        index = BM25Index(chunk_snapshot(get_snapshot()))
+        selected = select_chunks(index, 'huge word', token_budget=200, top_k=50)
+        self.assertLessEqual(sum(estimate_tokens(chunk.text) for chunk in selected), 200)
+
+    @override_settings(CHAT_RETRIEVAL=False)
+    def test_retrieval_can_be_switched_off(self):
+        contents = build_chat_prompt(get_grounding(), [], 'Which certifications does he hold?')
+        self.assertIn('Lawyer Booking', contents)
+        self.assertIn('Gemini Chatbot', contents)
+
+
+@override_settings(**CHAT_SETTINGS)
+class AnswerCacheTests(PortfolioTestCase):
+    def setUp(self):
+        reset_chat_state(self)
+        self.profile = make_profile()
+        self.factory = RequestFactory()
+
+    def ask(self, client, question='What are his skills?', session=None):
+        request = self.factory.post('/chatbot-response/', {'message': question})
+        request.session = session or SessionStore()
+        with mock.patch('main.views.get_genai_client', return_value=client):
+            response = ai_chatBot(request)
+            body = b''.join(response.streaming_content)
+        return request, body
+
+    def test_normalization(self):
+        self.assertEqual(normalize_question('  Are you available for HIRE?? '), 'are you available for hire')
+        text = ' **Python**, Django\n- and   more words than one replay chunk holds.'
+        self.assertEqual(''.join(replay_chunks(text)), text)
+
+    def test_repeated_question_is_replayed_without_the_model(self):
+        client = FakeClient({'models/gemini-flash': ['Python', ' and Django']})
+        _request, first = self.ask(client)
+        _request, second = self.ask(client, question='what are his SKILLS')
+
+        self.assertEqual(len(client.models.stream_calls), 1)
+        self.assertEqual(second, b'data: {"text": "Python and Django"}\n\n')
+        self.assertEqual(metrics.read_counter('answer_cache.hits'), 1)
+        self.assertEqual(metrics.read_counter('answer_cache.misses'), 1)
+        chatlog_writer.flush()
+        self.assertEqual(ChatLog.objects.latest('pk').model_used, 'models/gemini-flash (cached)')
+
+    def test_history_is_part_of_the_key(self):
+        client = FakeClient({'models/gemini-flash': ['answer']})
+        session = SessionStore()
+        session.create()
+        append_exchange(session.session_key, 'hi', 'hello')
+        self.ask(client)
+        self.ask(client, session=session)
+        self.assertEqual(len(client.models.stream_calls), 2)
+
+    def test_content_change_invalidates_answers(self):
+        client = FakeClient({'models/gemini-flash': ['answer']})
+        self.ask(client)
+        self.profile.profession = 'Architect'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.save()
+        self.ask(client)
+        self.assertEqual(len(client.models.stream_calls), 2)
+
+    @override_settings(ANSWER_CACHE_MAX_ENTRIES=2)
+    def test_least_recently_used_answer_is_evicted(self):
+        lru = AnswerCache()
+        for question in ('one', 'two'):
+            lru.set(1, [], question, question, 'm')
+        lru.get(1, [], 'one')
+        lru.set(1, [], 'three', 'three', 'm')
+        self.assertEqual(len(lru.entries), 2)
+        cache.clear()  # only the in-process tier remains
+        self.assertIsNotNone(lru.get(1, [], 'one'))
+        self.assertIsNone(lru.get(1, [], 'two'))
+
+    def test_old_version_answers_are_kept_until_evicted(self):
+        # Around a content bump, requests in one process can see either version
+        lru = AnswerCache()
+        lru.set(1, [], 'one', 'old answer', 'm')
+        lru.set(2, [], 'one', 'new answer', 'm')
+        cache.clear()
+        self.assertEqual(lru.get(1, [], 'one').text, 'old answer')
+        self.assertEqual(lru.get(2, [], 'one').text, 'new answer')
+
+    @override_settings(ANSWER_CACHE_MAX_BYTES=10)
+    def test_size_cap_counts_encoded_bytes(self):
+        lru = AnswerCache()
+        lru.set(1, [], 'one', 'café', 'm')
+        lru.set(1, [], 'two', 'é' * 6, 'm')
+        self.assertEqual(lru.size, 5)
+        self.assertEqual(len(lru.entries), 1)
+
+    @override_settings(ANSWER_CACHE_TTL=60)
+    def test_answers_expire(self):
+        lru = AnswerCache()
+        lru.set(1, [], 'one', 'answer', 'm')
+        with mock.patch('main.answer_cache.time.time', return_value=time.time() + 61):
+            self.assertIsNone(lru.get(1, [], 'one'))
+
+
+@override_settings(**CHAT_SETTINGS)
+class SingleFlightTests(PortfolioTestCase):
+    def setUp(self):
+        reset_chat_state(self)
+        make_profile()
+        self.factory = AsyncRequestFactory()
+
+    async def ask(self, client, question='Are you available for hire?'):
+        request = self.factory.post('/chatbot-response/', {'message': question})
+        request.session = SessionStore()
+        with mock.patch('main.views.get_genai_client', return_value=client), \
+                mock.patch('main.views.get_async_genai_client', return_value=client.aio):
+            response = await ai_chatBot_async(request)
+            body = b''.join([chunk async for chunk in response.streaming_content])
+        return request, body
+
+    async def test_burst_of_identical_questions_makes_one_upstream_call(self):
+        client = FakeClient({'models/gemini-flash': ['Yes', ', he is', ' available']}, chunk_delay=0.05)
+        results = await asyncio.gather(*(self.ask(client) for _ in range(8)))
+
+        self.assertEqual(len(client.models.stream_calls), 1)
+        bodies = {body for _request, body in results}
+        self.assertEqual(len(bodies), 1)
+        self.assertEqual(bodies.pop().count(b'data: '), 3)
+
+        await sync_to_async(chatlog_writer.flush)()
+        log = await ChatLog.objects.aget()
+        leader = log.session_key
+        followers = {request.session.session_key for request, _body in results} - {leader}
+        self.assertEqual(set(log.follower_sessions), followers)
+        self.assertEqual(len(followers), 7)
+        conversation = await sync_to_async(load_conversation)(followers.pop())
+        self.assertEqual(conversation.turns[-1]['content'], 'Yes, he is available')
+
+    async def test_leader_task_errors_are_reported_but_cancellations_are_not(self):
+        async def fail():
+            raise RuntimeError('stream broke')
+
+        async def wait():
+            await asyncio.sleep(10)
+
+        with mock.patch('builtins.print') as report:
+            failed = singleflight.lead_in_background(fail())
+            cancelled = singleflight.lead_in_background(wait())
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            await asyncio.gather(failed, cancelled, return_exceptions=True)
+            await asyncio.sleep(0)
+
+        report.assert_called_once()
+        self.assertIn('stream broke', report.call_args.args[0])
+
+    async def test_different_questions_are_not_coalesced(self):
+        client = FakeClient({'models/gemini-flash': ['a', 'b']}, chunk_delay=0.02)
+        await asyncio.gather(self.ask(client, 'What are his skills?'), self.ask(client, 'Where did he study?'))
+        self.assertEqual(len(client.models.stream_calls), 2)
+
+    def test_thread_followers_see_chunks_published_before_and_after_they_join(self):
+        flight, leading = singleflight.join('key', 'leader')
+        self.assertTrue(leading)
+        flight.publish('early ')
+        follower, leading = singleflight.join('key', 'follower')
+        self.assertIs(follower, flight)
+        self.assertFalse(leading)
+
+        def lead():
+            time.sleep(0.05)
+            flight.publish('late')
+            singleflight.land('key', flight)
+            flight.finish()
+
+        thread = threading.Thread(target=lead)
+        thread.start()
+        self.assertEqual(''.join(flight.follow()), 'early late')
+        thread.join()
+        self.assertEqual(flight.follower_sessions, ['follower'])
+        self.assertTrue(singleflight.join('key', 'next')[1])
+        singleflight.land('key', singleflight._flights['key'])
+
+    async def start_chats(self, client, count, leader_head_start=0.02):
+        # One patch around every chat: patches entered and left by overlapping tasks leak
+        requests = []
+        for _ in range(count):
+            request = self.factory.post('/chatbot-response/', {'message': 'Are you available for hire?'})
+            request.session = SessionStore()
+            requests.append(request)
+
+        async def chat(request):
+            response = await ai_chatBot_async(request)
+            return b''.join([chunk async for chunk in response.streaming_content])
+
+        tasks = []
+        for request in requests:
+            tasks.append(asyncio.ensure_future(chat(request)))
+            await asyncio.sleep(leader_head_start)
+        return requests, tasks
+
+    async def test_followers_do_not_keep_an_answer_cut_off_upstream(self):
+        client = FakeClient({'models/gemini-flash': ['Sharad knows ', RuntimeError('reset')]}, chunk_delay=0.05)
+        with mock.patch('main.views.get_genai_client', return_value=client), \
+                mock.patch('main.views.get_async_genai_client', return_value=client.aio):
+            requests, tasks = await self.start_chats(client, 2)
+            bodies = await asyncio.gather(*tasks)
+
+        self.assertEqual(bodies, [b'data: {"text": "Sharad knows "}\n\n'] * 2)
+        for request in requests:
+            conversation = await sync_to_async(load_conversation)(request.session.session_key)
+            self.assertEqual(list(conversation.turns), [])
+        self.assertIsNone(await sync_to_async(answer_cache.get)(get_grounding().version, [], 'Are you available for hire?'))
+
+    async def test_follower_of_a_flight_that_failed_before_any_text_asks_itself(self):
+        client = FakeClient({'models/gemini-flash': [RuntimeError('quota')]}, chunk_delay=0.05)
+        with mock.patch('main.views.get_genai_client', return_value=client), \
+                mock.patch('main.views.get_async_genai_client', return_value=client.aio):
+            _requests, tasks = await self.start_chats(client, 2)
+            await asyncio.gather(*tasks)
+        self.assertEqual(len(client.models.stream_calls), 2)
+
+    async def test_leader_disconnecting_does_not_cut_followers_short(self):
+        client = FakeClient({'models/gemini-flash': ['Yes', ', he is', ' available']}, chunk_delay=0.05)
+        with mock.patch('main.views.get_genai_client', return_value=client), \
+                mock.patch('main.views.get_async_genai_client', return_value=client.aio):
+            requests, (leader, follower) = await self.start_chats(client, 2)
+            await asyncio.sleep(0.03)
+            leader.cancel()
+            body = await follower
+
+        self.assertEqual(body.count(b'data: '), 3)
+        self.assertEqual(len(client.models.stream_calls), 1)
+        conversation = await sync_to_async(load_conversation)(requests[1].session.session_key)
+        self.assertEqual(conversation.turns[-1]['content'], 'Yes, he is available')
+
+    def test_sync_leader_finishes_the_answer_for_followers_after_disconnecting(self):
+        from main.answer_cache import answer_key
+
+        client = FakeClient({'models/gemini-flash': ['Yes', ', he is', ' available']}, chunk_delay=0.05)
+        question = 'Are you available for hire?'
+        request = RequestFactory().post('/chatbot-response/', {'message': question})
+        request.session = SessionStore()
+        followed = []
+        with mock.patch('main.views.get_genai_client', return_value=client):
+            leader = ai_chatBot(request)
+            next(iter(leader.streaming_content))
+            flight, leading = singleflight.join(answer_key(get_grounding().version, [], question), 'follower')
+            self.assertFalse(leading)
+            follower = threading.Thread(target=lambda: followed.extend(flight.follow()))
+            follower.start()
+            leader.close()
+            follower.join()
+
+        self.assertEqual(''.join(followed), 'Yes, he is available')
+        self.assertTrue(flight.ok)
+        self.assertEqual(len(client.models.stream_calls), 1)
+        self.assertEqual(answer_cache.get(get_grounding().version, [], question).text, 'Yes, he is available')
+
+
+@override_settings(
+    MODEL_ROUTER_FAILURE_THRESHOLD=3, MODEL_ROUTER_COOLDOWN=30, MODEL_ROUTER_HEDGE_AFTER_MS=50,
+)
+class ModelRouterTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_race(self, client, model_ids):
+        race = model_router.Race(model_ids)
+        text = ''.join(model_router.stream_models(client, race, 'prompt'))
+        return race, text
+
+    def test_candidates_are_ordered_by_observed_latency(self):
+        model_router.record_success('models/a', ttft=0.9, chars=100, seconds=1)
+        model_router.record_success('models/b', ttft=0.2, chars=100, seconds=1)
+        self.assertEqual(model_router.order_models(['models/a', 'models/b', 'models/new']), ['models/new', 'models/b', 'models/a'])
+        self.assertEqual(model_router.model_stats(['models/b'])['models/b']['error_rate'], 0.0)
+
+    def test_failing_model_is_skipped_until_a_half_open_probe_succeeds(self):
+        client = FakeClient({'models/bad': RuntimeError('500'), 'models/good': ['ok']})
+        for _ in range(3):
+            race, text = self.run_race(client, ['models/bad'])
+            self.assertIsNone(race.answered_by)
+        self.assertEqual(model_router.breaker_state('models/bad'), 'open')
+
+        client.models.stream_calls.clear()
+        self.run_race(client, ['models/bad', 'models/good'])
+        self.assertEqual([model for model, _ in client.models.stream_calls], ['models/good'])
+
+        with mock.patch('main.model_router.time.time', return_value=time.time() + 31):
+            self.assertEqual(model_router.breaker_state('models/bad'), 'half-open')
+            # Exactly one request gets to probe
+            self.assertEqual(model_router.order_models(['models/bad', 'models/good'])[0], 'models/bad')
+            self.assertEqual(model_router.order_models(['models/bad', 'models/good'])[0], 'models/good')
+            client.models.scripts['models/bad'] = ['recovered']
+            model_router.record_success('models/bad', ttft=0.1, chars=9, seconds=0.1)
+        self.assertEqual(model_router.breaker_state('models/bad'), 'closed')
+
+    def test_slow_first_token_is_hedged(self):
+        client = FakeClient({'models/slow': ['late'], 'models/fast': ['quick']}, first_chunk_delays={'models/slow': 0.5})
+        started = time.perf_counter()
+        race, text = self.run_race(client, ['models/slow', 'models/fast'])
+
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual((race.answered_by, text), ('models/fast', 'quick'))
+        self.assertEqual(metrics.read_counter('model_router.hedges'), 1)
+
+    def test_losing_hedge_closes_its_stream(self):
+        client = FakeClient({'models/slow': ['late', 'more'], 'models/fast': ['quick']}, first_chunk_delays={'models/slow': 0.2})
+        # Held here, so garbage collection can't close the losing stream for us
+        opened = []
+        open_stream = client.models.generate_content_stream
+
+        def keep(**kwargs):
+            opened.append(open_stream(**kwargs))
+            return opened[-1]
+
+        with mock.patch.object(client.models, 'generate_content_stream', side_effect=keep):
+            race, text = self.run_race(client, ['models/slow', 'models/fast'])
+            deadline = time.monotonic() + 2
+            while not client.models.closed_streams and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+        self.assertEqual(text, 'quick')
+        self.assertEqual(client.models.closed_streams, ['models/slow'])
+
+    def test_async_race_hedges_and_falls_back(self):
+        client = FakeClient(
+            {'models/slow': ['late'], 'models/broken': RuntimeError('quota'), 'models/fast': ['quick']},
+            first_chunk_delays={'models/slow': 0.5},
+        )
+
+        async def run():
+            race = await sync_to_async(model_router.Race)(['models/slow', 'models/broken', 'models/fast'])
+            text = ''.join([chunk async for chunk in model_router.astream_models(client.aio, race, 'prompt')])
+            return race, text
+
+        started = time.perf_counter()
+        race, text = async_to_sync(run)()
+        self.assertLess(time.perf_counter() - started, 0.4)
+        self.assertEqual((race.answered_by, text), ('models/fast', 'quick'))
+        self.assertEqual(model_router.model_stats(['models/broken'])['models/broken']['error_rate'], 1.0)
+
+
+@override_settings(
+    **CHAT_SETTINGS,
+    CHAT_HISTORY_MESSAGES=4, CHAT_HISTORY_TOKEN_BUDGET=60, CHAT_SYNOPSIS_TOKEN_BUDGET=8,
+)
+class ConversationStoreTests(PortfolioTestCase):
+    def setUp(self):
+        reset_chat_state(self)
+        make_profile()
+
+    def test_buffer_keeps_the_last_messages_and_folds_older_questions(self):
+        for n in range(1, 6):
+            conversation = append_exchange('abc', f'question {n}', f'answer {n}')
+        self.assertEqual([turn['content'] for turn in conversation.turns], ['question 4', 'answer 4', 'question 5', 'answer 5'])
+        # Only the newest evicted questions fit the synopsis budget
+        self.assertEqual(conversation.synopsis, 'question 2; question 3')
+        self.assertEqual(load_conversation('abc'), conversation)
+
+    @override_settings(CHAT_HISTORY_SYNOPSIS=False)
+    def test_synopsis_can_be_switched_off(self):
+        for n in range(3):
+            conversation = append_exchange('abc', f'question {n}', 'answer')
+        self.assertEqual(conversation.synopsis, '')
+
+    def test_prompt_history_respects_the_token_budget(self):
+        append_exchange('abc', 'short question', 'x' * 150)
+        conversation = append_exchange('abc', 'next question', 'y' * 150)
+        history = prompt_history(conversation)
+        self.assertEqual([turn['content'] for turn in history], ['next question', 'y' * 150])
+        self.assertLessEqual(sum(estimate_tokens(turn['content']) for turn in history), 60)
+
+    def test_follow_up_sees_history_without_touching_the_session(self):
+        client = FakeClient({'models/gemini-flash': ['Python']})
+        session = SessionStore()
+        session.create()
+        with mock.patch('main.views.get_genai_client', return_value=client):
+            for question in ('What are his skills?', 'Which framework?'):
+                request = RequestFactory().post('/chatbot-response/', {'message': question})
+                request.session = SessionStore(session.session_key)
+                b''.join(ai_chatBot(request).streaming_content)
+                self.assertFalse(request.session.modified)
+        self.assertIn('User: What are his skills?\nAssistant: Python\n', client.models.stream_calls[-1][1])
+
+
+@override_settings(CHATLOG_FLUSH_INTERVAL=0, CHATLOG_BATCH_SIZE=3)
+class ChatLogWriterTests(PortfolioTestCase):
+    def setUp(self):
+        cache.clear()
+        self.writer = ChatLogWriter()
+        spill_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spill_dir)
+        self.spill_path = os.path.join(spill_dir, 'spill.jsonl')
+
+    def record(self, n):
+        self.writer.record(user_query=f'q{n}', ai_response=f'a{n}', model_used='models/m', session_key='s')
+
+    def test_records_are_written_in_one_batch_when_full(self):
+        asked_at = timezone.now() - timedelta(seconds=30)
+        self.writer.record(user_query='q0', ai_response='a0', timestamp=asked_at)
+        self.record(1)
+        self.assertEqual(ChatLog.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.record(2)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "main_chatlog"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ChatLog.objects.count(), 3)
+        self.assertEqual(ChatLog.objects.get(user_query='q0').timestamp, asked_at)
+
+    def test_locked_database_spills_to_disk_and_replays(self):
+        with override_settings(CHATLOG_SPILL_PATH=self.spill_path):
+            self.record(1)
+            with mock.patch.object(ChatLog.objects, 'bulk_create', side_effect=OperationalError('database is locked')):
+                self.assertEqual(self.writer.flush(), 0)
+            with open(self.spill_path) as spill:
+                self.assertEqual(len(spill.readlines()), 1)
+
+            self.record(2)
+            self.assertEqual(self.writer.flush(), 2)
+        self.assertEqual(sorted(ChatLog.objects.values_list('user_query', flat=True)), ['q1', 'q2'])
+        self.assertEqual(os.listdir(os.path.dirname(self.spill_path)), [])
+
+
+class SqliteTuningTests(PortfolioTestCase):
+    def test_pragmas_are_applied_to_new_connections(self):
+        fresh = connections.create_connection('default')
+        self.addCleanup(fresh.close)
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': '1234', 'synchronous': 'normal', 'temp_store': 'memory'}):
+            fresh.ensure_connection()
+        with fresh.cursor() as cursor:
+            values = [cursor.execute(f"PRAGMA {name}").fetchone()[0] for name in ('busy_timeout', 'synchronous', 'temp_store')]
+        self.assertEqual(values, [1234, 1, 2])
+
+    def test_unsafe_values_are_rejected(self):
+        with override_settings(SQLITE_PRAGMAS={'cache_size': '1; DROP TABLE main_chatlog'}):
+            with self.assertRaises(ValueError):
+                apply_sqlite_pragmas(sender=None, connection=connection)
+
+
+class QueryPlanTests(PortfolioTestCase):
+    """
+    EXPLAIN QUERY PLAN for the hot queries, so a model change that drops an
+    index shows up here rather than as a slow admin on a large table.
+    """
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"INDEX {index}", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_chat_log_queries_use_indexes(self):
+        self.assertUsesIndex(ChatLog.objects.order_by('-timestamp', '-pk')[:100], 'chatlog_timestamp_idx')
+        self.assertUsesIndex(ChatLog.objects.filter(session_key='abc'), 'chatlog_session_idx')
+        self.assertUsesIndex(ChatLog.objects.filter(model_used='models/m').order_by('-timestamp', '-pk')[:100], 'chatlog_model_idx')
+
+    def test_listing_queries_use_indexes(self):
+        self.assertUsesIndex(Experience.objects.all(), 'experience_created_idx')
+        self.assertUsesIndex(Project.objects.order_by('-created_at'), 'project_created_idx')
+        self.assertUsesIndex(ContactMessage.objects.order_by('-created_at', '-pk')[:100], 'contact_created_idx')
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatLogSearchTests(PortfolioTestCase):
+    def setUp(self):
+        ChatLog.objects.create(user_query='Does he know Django?', ai_response='Yes, **Django** and DRF.')
+        ChatLog.objects.create(user_query='Django Django Django', ai_response='Django everywhere.')
+        ChatLog.objects.create(user_query='Where did he study?', ai_response='At <b>MIT</b>.')
+
+    def test_index_follows_inserts_updates_and_deletes(self):
+        self.assertEqual(len(search_chatlogs('django')), 2)
+        self.assertEqual(len(search_chatlogs('studied')), 1)  # porter stemming
+
+        log = ChatLog.objects.get(user_query='Where did he study?')
+        log.ai_response = 'Self taught Django.'
+        log.save()
+        self.assertEqual(len(search_chatlogs('django')), 3)
+        self.assertEqual(search_chatlogs('mit'), [])
+
+        ChatLog.objects.filter(user_query__startswith='Django').delete()
+        self.assertEqual(len(search_chatlogs('django')), 2)
+
+    def test_best_match_first_with_highlighted_snippet(self):
+        (best_pk, snippet), _other = search_chatlogs('djan')
+        self.assertEqual(ChatLog.objects.get(pk=best_pk).user_query, 'Django Django Django')
+        self.assertIn(f'{MARK_START}Django{MARK_END}', snippet)
+        # FTS5 syntax typed into the box is matched literally
+        self.assertEqual(search_chatlogs('django" OR "mit'), [])
+
+    def test_admin_search_uses_fts_and_escapes_snippets(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        url = reverse('admin:main_chatlog_changelist')
+
+        response = self.client.get(url, {'q': 'mit'})
+        self.assertContains(response, '&lt;b&gt;<mark>MIT</mark>&lt;/b&gt;', html=False)
+        self.assertEqual([log.user_query for log in response.context['cl'].result_list], ['Where did he study?'])
+
+        with mock.patch('main.admin.fts_available', return_value=False):
+            response = self.client.get(url, {'q': 'study'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class ChatRetentionTests(PortfolioTestCase):
+    def setUp(self):
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir)
+        self.now = timezone.now()
+        self.cutoff = retention_cutoff(30, now=self.now)
+        self.old_day = timezone.localdate(self.cutoff) - timedelta(days=3)
+        old = self.cutoff - timedelta(days=3) + timedelta(hours=9)
+        self.writer = ChatLogWriter()
+        for n, (question, model) in enumerate([
+            ('Is he available for hire?', 'models/a'),
+            ('is he AVAILABLE for hire', 'models/a'),
+            ('Where did he study?', 'models/b'),
+        ]):
+            self.writer.record(user_query=question, ai_response='x' * (10 * (n + 1)), model_used=model, timestamp=old)
+        self.writer.record(user_query='Recent question', ai_response='kept', timestamp=self.now)
+        self.writer.flush()
+
+    def archive(self):
+        with override_settings(CHATLOG_ARCHIVE_DIR=self.archive_dir):
+            return list(archive_chatlogs(self.cutoff, batch_size=2))
+
+    def read_archive(self):
+        with override_settings(CHATLOG_ARCHIVE_DIR=self.archive_dir):
+            path = archive_path(self.old_day)
+        with gzip.open(path, 'rt', encoding='utf-8') as archive:
+            return [json.loads(line) for line in archive]
+
+    def test_old_logs_are_archived_and_deleted_but_still_counted(self):
+        (result,) = self.archive()
+        self.assertEqual((result.day, result.archived, result.deleted), (self.old_day, 3, 3))
+        self.assertEqual(list(ChatLog.objects.values_list('user_query', flat=True)), ['Recent question'])
+
+        archived = self.read_archive()
+        self.assertEqual([row['model_used'] for row in archived], ['models/a', 'models/a', 'models/b'])
+        self.assertEqual(archived[2]['user_query'], 'Where did he study?')
+
+        daily = {rollup.model_used: rollup for rollup in ChatDailyRollup.objects.filter(day=self.old_day)}
+        self.assertEqual(daily['models/a'].chats, 2)
+        self.assertEqual(daily['models/a'].average_response_length, 15)
+        self.assertEqual(daily['models/b'].chats, 1)
+        questions = dict(ChatQuestionRollup.objects.filter(day=self.old_day).values_list('question', 'chats'))
+        self.assertEqual(questions, {'is he available for hire': 2, 'where did he study': 1})
+
+    def test_rerun_appends_late_rows_without_double_counting(self):
+        self.archive()
+        self.assertEqual(self.archive(), [])
+
+        # A row for the archived day shows up late, e.g. from the writer's spill file
+        late = self.cutoff - timedelta(days=3) + timedelta(hours=20)
+        self.writer.record(user_query='Where did he study?', ai_response='y', model_used='models/b', timestamp=late)
+        self.writer.flush()
+        (result,) = self.archive()
+        self.assertEqual((result.archived, result.deleted), (1, 1))
+        self.assertEqual(len(self.read_archive()), 4)
+        self.assertEqual(ChatDailyRollup.objects.get(day=self.old_day, model_used='models/b').chats, 2)
+        self.assertEqual(ChatQuestionRollup.objects.get(question='where did he study').chats, 2)
+
+    def test_interrupted_delete_is_finished_without_rearchiving(self):
+        with mock.patch('main.chat_retention.delete_archived', return_value=0):
+            self.archive()
+        self.assertEqual(ChatLog.objects.count(), 4)
+
+        (result,) = self.archive()
+        self.assertEqual((result.archived, result.deleted), (0, 3))
+        self.assertEqual(len(self.read_archive()), 3)
+        self.assertEqual(sum(ChatDailyRollup.objects.filter(day=self.old_day).values_list('chats', flat=True)), 3)
+
+    def test_freed_pages_are_returned(self):
+        ChatLog.objects.bulk_create(ChatLog(user_query='q', ai_response='x' * 4000) for _ in range(200))
+        ChatLog.objects.filter(user_query='q').delete()
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA freelist_count")
+            self.assertGreater(cursor.fetchone()[0], 0)
+            self.assertGreater(incremental_vacuum(step_pages=50), 0)
+            cursor.execute("PRAGMA freelist_count")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class ChatAnalyticsTests(PortfolioTestCase):
+    QUESTIONS = ['Is he available for hire?', 'is he AVAILABLE for hire!', 'What are his skills?', 'Where did he study?']
+    MODELS = ['models/a', 'models/b', 'models/a (cached)', None]
+
+    def setUp(self):
+        self.writer = ChatLogWriter()
+        self.today = timezone.localdate()
+
+    def write_logs(self, count, offset=0):
+        for n in range(offset, offset + count):
+            self.writer.record(
+                user_query=self.QUESTIONS[n % 4],
+                ai_response='x' * (37 * n % 4500),
+                model_used=self.MODELS[n % 3 if n % 7 else 3],
+                timestamp=timezone.now() - timedelta(days=n % 5, hours=n % 3),
+            )
+        self.writer.flush()
+
+    def recount(self):
+        """Brute force, from ChatLog itself."""
+        daily, questions, lengths = {}, {}, {}
+        for log in ChatLog.objects.all():
+            day = timezone.localdate(log.timestamp)
+            model = log.model_used or ''
+            chats, chars = daily.get((day, model), (0, 0))
+            daily[day, model] = (chats + 1, chars + len(log.ai_response))
+            question = normalize_question(log.user_query)
+            questions[day, question] = questions.get((day, question), 0) + 1
+            bucket = (day, model, length_bucket(len(log.ai_response)))
+            lengths[bucket] = lengths.get(bucket, 0) + 1
+        return daily, questions, lengths
+
+    def rollups(self):
+        daily = {(r.day, r.model_used): (r.chats, r.response_chars) for r in ChatDailyRollup.objects.all()}
+        questions = {(r.day, r.question): r.chats for r in ChatQuestionRollup.objects.all()}
+        lengths = {(r.day, r.model_used, r.min_chars): r.chats for r in ChatLengthRollup.objects.all()}
+        return daily, questions, lengths
+
+    def test_rollups_match_a_full_recount(self):
+        self.write_logs(40)
+        self.write_logs(73, offset=40)
+        self.assertEqual(self.rollups(), self.recount())
+        self.assertEqual(sum(ChatDailyRollup.objects.values_list('chats', flat=True)), 113)
+
+    def test_failed_batch_is_not_counted(self):
+        spill_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, spill_dir)
+        self.writer.record(user_query='q', ai_response='a', model_used='models/a')
+        with override_settings(CHATLOG_SPILL_PATH=os.path.join(spill_dir, 'spill.jsonl')):
+            with mock.patch('main.chatlog_writer.add_to_rollups', side_effect=OperationalError('database is locked')):
+                self.writer.flush()
+            self.assertEqual((ChatLog.objects.count(), ChatDailyRollup.objects.count()), (0, 0))
+            self.writer.flush()
+        self.assertEqual(self.rollups(), self.recount())
+
+    def test_dashboard_reads_only_the_rollups(self):
+        self.write_logs(30)
+        with CaptureQueriesContext(connection) as queries:
+            stats = dashboard(7)
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any('"main_chatlog"' in query['sql'] for query in queries))
+        self.assertEqual(stats['total_chats'], 30)
+        self.assertEqual(stats['questions'][0]['question'], 'is he available for hire')
+        self.assertEqual(stats['questions'][0]['chats'], 16)
+        self.assertEqual(sum(bucket['chats'] for bucket in stats['histogram']), 30)
+        self.assertEqual([day['day'] for day in stats['timeline']][-1], self.today)
+
+    def test_question_rollups_outside_every_window_fold_into_months(self):
+        today = date(2026, 10, 18)
+        for day, fingerprint, chats in (
+            (date(2025, 3, 1), 'a', 4), (date(2025, 3, 5), 'a', 2), (date(2025, 3, 20), 'a', 3),
+            (date(2025, 9, 30), 'b', 1),
+            # The oldest day shown is 2025-10-19, so October stays daily
+            (date(2025, 10, 5), 'c', 1), (date(2026, 10, 10), 'd', 1),
+        ):
+            ChatQuestionRollup.objects.create(day=day, fingerprint=fingerprint, question=f'question {fingerprint}', chats=chats)
+
+        self.assertEqual(compact_question_rollups(today), 3)
+        self.assertEqual(compact_question_rollups(today), 0)
+        self.assertEqual(
+            sorted(ChatQuestionRollup.objects.values_list('day', 'fingerprint', 'chats')),
+            [
+                (date(2025, 3, 1), 'a', 9), (date(2025, 9, 1), 'b', 1),
+                (date(2025, 10, 5), 'c', 1), (date(2026, 10, 10), 'd', 1),
+            ],
+        )
+        self.assertEqual([q['question'] for q in dashboard(365, today)['questions']], ['question d'])
+
+    def test_admin_view_cost_does_not_grow_with_the_log(self):
+        admin_user = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(admin_user)
+        url = reverse('admin:main_chatlog_analytics')
+
+        self.write_logs(4)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(url, {'days': 7})
+        self.assertContains(response, 'is he available for hire')
+
+        self.write_logs(200, offset=4)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url, {'days': 7})
+        self.assertContains(response, '204 chats')
+        self.assertEqual(len(large), len(small))
+
+
+class TempMediaRootMixin:
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.override = self.settings(MEDIA_ROOT=self.media_root)
+        self.override.enable()
+        self.addCleanup(self.override.disable)
+
+
+def png_upload(name, size=(1000, 600), alpha=255):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGBA', size, (200, 80, 40, alpha)).save(buffer, format='PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(IMAGE_VARIANTS_IN_BACKGROUND=False, IMAGE_VARIANT_FORMATS=['webp'])
+class ImageVariantTests(TempMediaRootMixin, PortfolioTestCase):
+
+    def variant_files(self):
+        found = []
+        for root, _dirs, files in os.walk(os.path.join(self.media_root, 'variants')):
+            found += files
+        return sorted(found)
+
+    def test_variants_are_built_after_commit_and_named_by_content(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = make_profile(profile_image=png_upload('hero.png', alpha=0))
+        profile.refresh_from_db()
+        manifest = profile.profile_image_variants
+        self.assertEqual(manifest['source'], profile.profile_image.name)
+        self.assertEqual((manifest['width'], manifest['height']), (1000, 600))
+        # Transparent, so the fallback is PNG rather than JPEG
+        self.assertEqual(list(manifest['formats']), ['webp', 'png'])
+        self.assertEqual([width for width, _name in manifest['formats']['webp']], [320, 480, 640, 960, 1000])
+        files = self.variant_files()
+        self.assertEqual(len(files), 10)
+
+        name = manifest['formats']['webp'][0][1]
+        with open(os.path.join(self.media_root, name), 'rb') as variant:
+            self.assertTrue(name.endswith(hashlib.sha256(variant.read()).hexdigest()[:32] + '.webp'))
+
+        # Same bytes, same names: re-encoding writes nothing new
+        spec = IMAGE_FIELDS[0]
+        self.assertIsNone(refresh_variants(spec, profile.pk, force=True))
+        self.assertEqual(self.variant_files(), files)
+
+    def test_opaque_thumbnail_gets_jpeg_fallback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            cert = Certification.objects.create(
+                courseName='Java', year=date(2024, 1, 1), certificate=SimpleUploadedFile('java.pdf', b'%PDF-1.4'),
+                thumbnail=png_upload('java.png', size=(500, 300)),
+            )
+        cert.refresh_from_db()
+        self.assertEqual(list(cert.thumbnail_variants['formats']), ['webp', 'jpeg'])
+        self.assertEqual([width for width, _name in cert.thumbnail_variants['formats']['jpeg']], [320, 480, 500])
+
+    def test_work_runs_off_the_saving_thread(self):
+        ran_on = []
+        with self.settings(IMAGE_VARIANTS_IN_BACKGROUND=True), \
+                mock.patch('main.images.refresh_variants', side_effect=lambda spec, pk: ran_on.append(threading.current_thread().name)):
+            schedule(IMAGE_FIELDS[1], 1).result(timeout=10)
+        self.assertTrue(ran_on[0].startswith('image-variants'))
+
+    def test_picture_tag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = make_profile(fname='Ada <3', profile_image=png_upload('hero.png', size=(700, 400)))
+        profile.refresh_from_db()
+        template = Template(
+            '{% load images %}{% picture profile.profile_image profile.profile_image_variants '
+            'sizes="100vw" alt=profile.fname class="hero" %}'
+        )
+        html = template.render(Context({'profile': profile}))
+        self.assertIn('<picture><source type="image/webp" srcset="/media/variants/', html)
+        self.assertIn(' 320w, /media/variants/', html)
+        self.assertIn('.jpeg 700w" sizes="100vw"', html)
+        self.assertIn('alt="Ada &lt;3" class="hero" height="400" width="700"', html)
+
+        # Until the variants of a new upload exist, the original is shown as is
+        profile.profile_image = png_upload('new.png')
+        html = template.render(Context({'profile': profile}))
+        self.assertEqual(html, f'<img src="{profile.profile_image.url}" alt="Ada &lt;3" class="hero">')
+
+
+def pdf_upload(name, size=(842, 595), color=(30, 90, 160)):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    # Fixed dates, so the same page gives the same bytes
+    Image.new('RGB', size, color).save(buffer, format='PDF', creationDate=time.gmtime(0), modDate=time.gmtime(0))
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='application/pdf')
+
+
+@override_settings(IMAGE_VARIANTS_IN_BACKGROUND=False, IMAGE_VARIANT_FORMATS=['webp'])
+class CertificateThumbnailTests(TempMediaRootMixin, PortfolioTestCase):
+    def create(self, certificate, **fields):
+        with self.captureOnCommitCallbacks(execute=True):
+            cert = Certification.objects.create(courseName='Java', year=date(2024, 1, 1), certificate=certificate, **fields)
+        cert.refresh_from_db()
+        return cert
+
+    def test_pdf_first_page_becomes_the_thumbnail(self):
+        from PIL import Image
+
+        cert = self.create(pdf_upload('java.pdf'))
+        self.assertEqual(len(cert.certificate_sha256), 64)
+        self.assertTrue(thumbnails.is_auto_thumbnail(cert.thumbnail.name))
+        with Image.open(cert.thumbnail.path) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.width, thumbnails.THUMBNAIL_WIDTH)
+            self.assertAlmostEqual(image.height, 1200 * 595 / 842, delta=2)
+            for got, expected in zip(image.getpixel((600, 400)), (30, 90, 160)):
+                self.assertAlmostEqual(got, expected, delta=3)
+        # The generated thumbnail gets its responsive variants like an uploaded one
+        self.assertEqual(cert.thumbnail_variants['source'], cert.thumbnail.name)
+
+    def test_identical_uploads_share_one_file_and_thumbnail(self):
+        first = self.create(pdf_upload('java.pdf'))
+        with mock.patch('main.thumbnails.make_thumbnail') as make_thumbnail:
+            second = self.create(pdf_upload('java.pdf'))
+        make_thumbnail.assert_not_called()
+        self.assertEqual(second.certificate.name, first.certificate.name)
+        self.assertEqual(second.thumbnail.name, first.thumbnail.name)
+        self.assertEqual(second.thumbnail_variants, first.thumbnail_variants)
+        certificates = os.path.join(self.media_root, 'certificates')
+        stored = os.path.basename(first.certificate.name)
+        # The page compresses well, so it also has a gzip copy (see storage.py)
+        self.assertEqual(sorted(os.listdir(certificates)), [stored, stored + '.gz', 'thumbnails'])
+        self.assertEqual(len(os.listdir(os.path.join(certificates, 'thumbnails', 'auto'))), 1)
+
+        different = self.create(pdf_upload('java.pdf', color=(0, 0, 0)))
+        self.assertNotEqual(different.certificate.name, first.certificate.name)
+        self.assertNotEqual(different.thumbnail.name, first.thumbnail.name)
+
+    def test_new_certificate_replaces_generated_thumbnail_only(self):
+        cert = self.create(pdf_upload('java.pdf'))
+        generated = cert.thumbnail.name
+        cert.certificate = pdf_upload('java.pdf', color=(0, 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            cert.save()
+        cert.refresh_from_db()
+        self.assertTrue(thumbnails.is_auto_thumbnail(cert.thumbnail.name))
+        self.assertNotEqual(cert.thumbnail.name, generated)
+
+        own = self.create(pdf_upload('own.pdf'), thumbnail=png_upload('own.png', size=(500, 300)))
+        uploaded = own.thumbnail.name
+        self.assertFalse(thumbnails.is_auto_thumbnail(uploaded))
+        own.certificate = pdf_upload('own.pdf', color=(0, 0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            own.save()
+        own.refresh_from_db()
+        self.assertEqual(own.thumbnail.name, uploaded)
+
+    def test_image_certificates_are_downsized(self):
+        from PIL import Image
+
+        cert = self.create(png_upload('java.png', size=(3000, 2000)))
+        with Image.open(cert.thumbnail.path) as image:
+            self.assertEqual(image.size, (1200, 800))
+            # Transparency is flattened onto white
+            self.assertEqual(image.mode, 'RGB')
+
+    def test_unreadable_or_unsupported_certificates_keep_the_placeholder(self):
+        self.assertFalse(self.create(SimpleUploadedFile('broken.pdf', b'%PDF-1.4')).thumbnail)
+        with mock.patch('main.thumbnails.pdfium', None):
+            self.assertFalse(self.create(pdf_upload('java.pdf')).thumbnail)
+
+    def test_backfill_command(self):
+        from django.core.management import call_command
+
+        first = self.create(pdf_upload('java.pdf'), thumbnail=png_upload('own.png'))
+        second = self.create(pdf_upload('java.pdf'), thumbnail=png_upload('own.png'))
+        # Rows stored before hashing: a suffixed copy, no hashes, no thumbnail
+        shutil.copy(first.certificate.path, os.path.join(self.media_root, 'certificates', 'java_x1Yz.pdf'))
+        Certification.objects.filter(pk=first.pk).update(thumbnail='', thumbnail_variants={})
+        Certification.objects.filter(pk=second.pk).update(
+            certificate='certificates/java_x1Yz.pdf', thumbnail='', thumbnail_variants={},
+        )
+        Certification.objects.update(certificate_sha256='')
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('build_certificate_thumbnails', stdout=out)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertIn(f"Certification {second.pk}: thumbnail {second.thumbnail.name}", out.getvalue())
+        self.assertEqual(second.certificate_sha256, first.certificate_sha256)
+        # Different names, same bytes: one thumbnail
+        self.assertEqual(second.thumbnail.name, first.thumbnail.name)
+        self.assertEqual(second.thumbnail_variants['source'], second.thumbnail.name)
+
+
+@override_settings(IMAGE_VARIANTS_IN_BACKGROUND=False, IMAGE_VARIANT_FORMATS=['webp'])
+class MediaStoreTests(TempMediaRootMixin, PortfolioTestCase):
+    def refcounts(self):
+        return dict(MediaBlob.objects.values_list('name', 'refcount'))
+
+    def write(self, name, data, age=0):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as fh:
+            fh.write(data)
+        if age:
+            stamp = time.time() - age
+            os.utime(path, (stamp, stamp))
+        return name
+
+    def test_files_are_stored_once_under_their_hash(self):
+        from django.core.files.storage import default_storage
+
+        name = default_storage.save('resume/cv.PDF', ContentFile(b'%PDF-1.4 cv'))
+        self.assertEqual(name, 'resume/' + hashlib.sha256(b'%PDF-1.4 cv').hexdigest()[:32] + '.pdf')
+        self.assertEqual(default_storage.save('resume/other.pdf', ContentFile(b'%PDF-1.4 cv')), name)
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'resume')), [os.path.basename(name)])
+        self.assertEqual(os.stat(default_storage.path(name)).st_mode & 0o777, 0o644)
+
+    def test_saves_move_references_without_reloading_the_row(self):
+        resume = SimpleUploadedFile('cv.pdf', b'%PDF-1.4 cv')
+        first = make_profile(resume=resume)
+        make_profile(resume=SimpleUploadedFile('cv.pdf', b'%PDF-1.4 cv'))
+        self.assertEqual(self.refcounts(), {'profile/photo.jpg': 2, first.resume.name: 2})
+
+        profile = Profile.objects.get(pk=first.pk)
+        profile.resume = SimpleUploadedFile('cv.pdf', b'%PDF-1.4 new')
+        with CaptureQueriesContext(connection) as queries:
+            profile.save()
+        self.assertFalse([query for query in queries if query['sql'].startswith('SELECT')])
+        self.assertEqual(self.refcounts()[first.resume.name], 1)
+        self.assertEqual(self.refcounts()[profile.resume.name], 1)
+
+        profile.delete()
+        self.assertEqual(self.refcounts()[profile.resume.name], 0)
+
+    def test_resume_link_downloads_under_a_readable_name(self):
+        profile = make_profile(resume=SimpleUploadedFile('cv.pdf', b'%PDF-1.4 cv'))
+        with self.settings(SECURE_SSL_REDIRECT=False):
+            response = self.client.get(reverse('portfolio'))
+        self.assertContains(response, f'href="{profile.resume.url}"')
+        self.assertContains(response, 'download="Ada Lovelace Resume.pdf"')
+
+    def test_sweep_deletes_only_old_unreferenced_files(self):
+        from django.core.management import call_command
+
+        with self.captureOnCommitCallbacks(execute=True):
+            profile = make_profile(profile_image=png_upload('hero.png', size=(400, 300)))
+        profile.refresh_from_db()
+        variant = profile.profile_image_variants['formats']['webp'][0][1]
+        day = 24 * 60 * 60
+        for name in (profile.profile_image.name, variant):
+            os.utime(os.path.join(self.media_root, name), (time.time() - 2 * day,) * 2)
+        old = self.write('profile/old.png', b'old', age=2 * day)
+        temp = self.write('profile/.upload-abc', b'partial', age=2 * day)
+        recent = self.write('profile/recent.png', b'recent')
+        # Drift, as left by an update that skipped change_refs()
+        MediaBlob.objects.filter(name=profile.profile_image.name).update(refcount=5)
+
+        out = io.StringIO()
+        call_command('sweep_media', '--dry-run', stdout=out)
+        self.assertIn("Would delete 2 unreferenced file(s), 10 bytes", out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, old)))
+
+        out = io.StringIO()
+        call_command('sweep_media', '--batch-size', '1', stdout=out)
+        self.assertIn("Corrected 1 reference count(s)", out.getvalue())
+        self.assertIn("Deleted 2 unreferenced file(s), 10 bytes", out.getvalue())
+        remaining = {
+            os.path.relpath(os.path.join(root, name), self.media_root).replace(os.sep, '/')
+            for root, _dirs, files in os.walk(self.media_root) for name in files
+        }
+        self.assertNotIn(old, remaining)
+        self.assertNotIn(temp, remaining)
+        self.assertIn(recent, remaining)
+        self.assertIn(profile.profile_image.name, remaining)
+        self.assertIn(variant, remaining)
+        self.assertEqual(self.refcounts()[profile.profile_image.name], 1)
+
+    def test_sweep_keeps_files_referenced_during_the_sweep(self):
+        from main.media_refs import change_refs, sweep_unreferenced
+
+        name = self.write('resume/cv.pdf', b'cv', age=2 * 24 * 60 * 60)
+        change_refs(added=[name])
+        self.assertEqual(list(sweep_unreferenced(keep=set())), [])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, name)))
+
+    def test_sweep_keeps_a_file_an_upload_reuses_after_the_check(self):
+        from django.core.files.storage import default_storage
+        from main.media_refs import sweep_unreferenced
+
+        day = 24 * 60 * 60
+        names = [
+            default_storage.save('resume/cv.pdf', ContentFile(data)) for data in (b'%PDF-1.4 a', b'%PDF-1.4 b')
+        ]
+        for name in names:
+            os.utime(default_storage.path(name), (time.time() - 2 * day,) * 2)
+        sweep = sweep_unreferenced(keep=set())
+        first, _size = next(sweep)
+        # An identical upload lands between the refcount check and the delete
+        [reused] = [name for name in names if name != first]
+        with default_storage.open(reused) as upload:
+            self.assertEqual(default_storage.save('resume/again.pdf', upload), reused)
+        self.assertEqual(list(sweep), [])
+        self.assertTrue(default_storage.exists(reused))
+        self.assertFalse(default_storage.exists(first))
+
+    def test_sweep_treats_precompressed_copies_like_their_file(self):
+        from main.media_refs import sweep_unreferenced
+
+        day = 24 * 60 * 60
+        kept = self.write('resume/a.pdf', b'a', age=2 * day)
+        self.write('resume/a.pdf.gz', b'a', age=2 * day)
+        self.write('resume/b.pdf.gz', b'b', age=2 * day)
+        self.assertEqual([name for name, _size in sweep_unreferenced(keep={kept})], ['resume/b.pdf.gz'])
+
+    def test_adopt_merges_legacy_copies(self):
+        from django.core.management import call_command
+
+        day = 24 * 60 * 60
+        self.write('certificates/java.png', b'png', age=2 * day)
+        self.write('certificates/java_07qKA7b.png', b'png', age=2 * day)
+        first = Certification.objects.create(courseName='Java', year=date(2024, 1, 1), certificate='certificates/java.png')
+        second = Certification.objects.create(courseName='Java', year=date(2024, 1, 1), certificate='certificates/java_07qKA7b.png')
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sweep_media', '--adopt', stdout=out)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.certificate.name, second.certificate.name)
+        self.assertEqual(first.certificate.name, 'certificates/' + hashlib.sha256(b'png').hexdigest()[:32] + '.png')
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'certificates')), [os.path.basename(first.certificate.name)])
+        self.assertEqual(self.refcounts(), {first.certificate.name: 2})
+
+
+@override_settings(SECURE_SSL_REDIRECT=False)
+class TailwindTests(PortfolioTestCase):
+    def setUp(self):
+        self.build_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.build_dir)
+
+    def fake_cli(self, command, **kwargs):
+        """Stands in for the Tailwind CLI: writes the content it was given to --output."""
+        self.commands.append(command)
+        content = command[command.index('--content') + 1] if '--content' in command else 'all'
+        with open(command[command.index('--output') + 1], 'w', encoding='utf-8') as output:
+            output.write(open(content, encoding='utf-8').read() if content != 'all' else '.flex{display:flex}')
+
+    def test_build_runs_the_pinned_cli_into_the_build_dir(self):
+        self.commands = []
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir, TAILWIND_CLI='/opt/tailwindcss-linux-x64'), \
+                mock.patch('main.tailwind.subprocess.run', side_effect=self.fake_cli):
+            full, critical = tailwind.build()
+            mtime = os.stat(full).st_mtime_ns
+            tailwind.build()
+
+        self.assertEqual(full, os.path.join(self.build_dir, 'main', 'css', 'tailwind.css'))
+        self.assertEqual(os.stat(full).st_mtime_ns, mtime)
+        self.assertEqual(self.commands[0][:3], ['/opt/tailwindcss-linux-x64', '--config', tailwind.CONFIG])
+        self.assertIn('--minify', self.commands[0])
+        self.assertNotIn('--content', self.commands[0])
+        with open(critical, encoding='utf-8') as built:
+            above = built.read()
+        # The header is above the fold; the certificate slider is not
+        self.assertIn('backdrop-blur-xl', above)
+        self.assertNotIn('min-w-[300px]', above)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.build_dir, 'main', 'css'))), ['tailwind.critical.css', 'tailwind.css'])
+        self.assertFalse(os.path.exists(os.path.join(settings.BASE_DIR, 'main', 'static', 'main', 'css', 'tailwind.css')))
+
+    def test_missing_or_failing_cli_is_a_command_error(self):
+        from django.core.management import CommandError, call_command
+
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir):
+            with mock.patch('main.tailwind.subprocess.run', side_effect=FileNotFoundError('npx')):
+                with self.assertRaisesMessage(CommandError, 'npm ci'):
+                    call_command('build_tailwind', stdout=io.StringIO())
+            failure = subprocess.CalledProcessError(1, 'tailwindcss', stderr='Cannot find module')
+            with mock.patch('main.tailwind.subprocess.run', side_effect=failure):
+                with self.assertRaisesMessage(CommandError, 'Cannot find module'):
+                    call_command('build_tailwind', stdout=io.StringIO())
+        self.assertEqual(os.listdir(self.build_dir), ['main'])
+        self.assertEqual(os.listdir(os.path.join(self.build_dir, 'main', 'css')), [])
+
+    def test_cli_version_is_pinned(self):
+        with open(os.path.join(settings.BASE_DIR, 'package.json'), encoding='utf-8') as package:
+            version = json.load(package)['devDependencies']['tailwindcss']
+        self.assertRegex(version, r'^\d+\.\d+\.\d+$')
+
+    def fake_build(self):
+        paths = []
+        for static_path, css in ((tailwind.STATIC_PATH, '.flex{display:flex}' * 100), (tailwind.CRITICAL_STATIC_PATH, '.fixed{position:fixed}')):
+            path = tailwind.output_path(static_path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as output:
+                output.write(css)
+            paths.append(path)
+        return paths
+
+    def test_page_inlines_critical_css_and_preloads_the_rest(self):
+        make_profile()
+        with self.settings(TAILWIND_BUILD_DIR=self.build_dir, STATICFILES_DIRS=[self.build_dir]):
+            self.fake_build()
+            response = self.client.get(reverse('portfolio'))
+        self.assertNotContains(response, 'cdn.tailwindcss.com')
+        self.assertNotContains(response, 'tailwind.config')
+        self.assertContains(response, '<style>.fixed{position:fixed}</style>', count=1)
+        self.assertContains(response, 'href="/static/main/css/tailwind.css"', count=2)
+
+    def test_collectstatic_builds_then_hashes_and_compresses(self):
+        from django.contrib.staticfiles.storage import staticfiles_storage
+        from django.core.management import call_command
+
+        static_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, static_root)
+        with self.settings(STATIC_ROOT=static_root, TAILWIND_BUILD_DIR=self.build_dir, STATICFILES_DIRS=[self.build_dir]), \
+                mock.patch.object(tailwind, 'build', side_effect=self.fake_build) as build:
+            call_command('collectstatic', interactive=False, verbosity=0, stdout=io.StringIO())
+            url = staticfiles_storage.url('main/css/tailwind.css')
+        build.assert_called_once_with()
+        self.assertRegex(url, r'^/static/main/css/tailwind\.[0-9a-f]{12}\.css$')
+        self.assertTrue(os.path.exists(os.path.join(static_root, url[len('/static/'):] + '.gz')))
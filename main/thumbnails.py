@@ -0,0 +1,170 @@
+# main/thumbnails.py
+"""
+Certificate thumbnails.
+
+A certificate without a thumbnail used to show a placeholder on the page.
+After a Certification is saved, the image worker (see images.py) now makes
+one:
+
+- a PDF has its first page rendered with pypdfium2;
+- an image is downsized.
+
+The result is THUMBNAIL_WIDTH pixels wide at most and is stored as WebP
+under AUTO_THUMBNAIL_DIR. The worker then builds the responsive variants
+from it. A thumbnail the admin uploaded is always kept. A generated one is
+dropped, and made again, when the certificate changes.
+
+The SHA-256 of each new certificate upload is kept in certificate_sha256.
+Identical certificates share one generated thumbnail, even when they were
+stored under different names before content addressing (see storage.py).
+The page is rendered once.
+
+Without pypdfium2, PDF certificates keep the placeholder.
+`manage.py build_certificate_thumbnails` fills in hashes and thumbnails for
+existing rows.
+"""
+import io
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
+from PIL import Image, ImageOps, features
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+from . import metrics
+from .content import bump_content_version
+from .images import IMAGE_FIELDS, refresh_variants, submit
+from .media_refs import change_refs, stored_name
+from .models import Certification
+from .storage import content_digest
+
+AUTO_THUMBNAIL_DIR = 'certificates/thumbnails/auto'
+
+# Enough for the largest thumbnail variant (800w) with room to spare
+THUMBNAIL_WIDTH = 1200
+
+# Cap on the rendered page's longer side, whatever its size in points
+MAX_RENDER_SIDE = 2400
+
+# Raised for a missing file or one that is not a readable PDF or image
+RENDER_ERRORS = (OSError, Image.DecompressionBombError) + ((pdfium.PdfiumError,) if pdfium else ())
+
+metrics.register_counters('thumbnails.generated')
+
+
+def is_auto_thumbnail(name):
+    return bool(name) and name.startswith(AUTO_THUMBNAIL_DIR + '/')
+
+
+def render_first_page(data):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        page = pdf[0]
+        width, height = page.get_size()
+        scale = min(THUMBNAIL_WIDTH / width, MAX_RENDER_SIDE / max(width, height))
+        return page.render(scale=scale).to_pil()
+    finally:
+        pdf.close()
+
+
+def make_thumbnail(data, filename):
+    """Thumbnail bytes for a certificate file, or None when it cannot be rendered here."""
+    if filename.lower().endswith('.pdf'):
+        if pdfium is None:
+            return None
+        image = render_first_page(data)
+    else:
+        image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Certificates are shown on a card; flatten transparency onto white
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    image = image.convert('RGB')
+    image.thumbnail((THUMBNAIL_WIDTH, THUMBNAIL_WIDTH * 4), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    if features.check('webp'):
+        image.save(buffer, format='WEBP', quality=85, method=4)
+    else:
+        image.save(buffer, format='JPEG', quality=85, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def needs_thumbnail(certification):
+    return bool(certification.certificate) and not certification.thumbnail
+
+
+def generate_thumbnail(pk):
+    """
+    Gives one Certification its generated thumbnail and its variants.
+    Returns the thumbnail name, or None when there was nothing to do.
+    """
+    certification = Certification.objects.filter(pk=pk).first()
+    if certification is None or not needs_thumbnail(certification):
+        return None
+    certificate = certification.certificate
+    storage = certification.thumbnail.storage
+    try:
+        sha256 = certification.certificate_sha256 or content_digest(certificate)
+        name = (
+            Certification.objects.filter(certificate_sha256=sha256, thumbnail__startswith=AUTO_THUMBNAIL_DIR + '/')
+            .exclude(pk=pk).values_list('thumbnail', flat=True).first()
+        )
+        if not name or not storage.exists(name):
+            with certificate.open('rb') as source:
+                data = make_thumbnail(source.read(), certificate.name)
+            if data is None:
+                return None
+            extension = 'webp' if features.check('webp') else 'jpg'
+            name = storage.save(f"{AUTO_THUMBNAIL_DIR}/thumbnail.{extension}", ContentFile(data))
+            metrics.incr('thumbnails.generated')
+    except RENDER_ERRORS as e:
+        # The card keeps its placeholder
+        print(f"Thumbnail failed for Certification {pk}: {e}")
+        metrics.incr('images.errors')
+        return None
+    # Only if the certificate was not replaced, nor a thumbnail uploaded, meanwhile
+    with transaction.atomic():
+        updated = (
+            Certification.objects.filter(pk=pk, certificate=certificate.name)
+            .filter(Q(thumbnail='') | Q(thumbnail__isnull=True))
+            .update(thumbnail=name, certificate_sha256=sha256)
+        )
+        if not updated:
+            return None
+        change_refs(added=[name])
+    refresh_variants(IMAGE_FIELDS[1], pk)
+    transaction.on_commit(bump_content_version)
+    return name
+
+
+def track_certificate(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    certificate = instance.certificate
+    if not certificate._committed:
+        instance.certificate_sha256 = content_digest(certificate)
+        changed = True
+    else:
+        changed = stored_name(instance, 'certificate') not in (None, certificate.name or '')
+        if changed:
+            # Hashed again when the thumbnail is made
+            instance.certificate_sha256 = ''
+    if changed and is_auto_thumbnail(instance.thumbnail.name):
+        # Made from the previous certificate; post_save schedules a new one
+        instance.thumbnail = None
+
+
+def schedule_thumbnail(sender, instance, raw=False, **kwargs):
+    if not raw and needs_thumbnail(instance):
+        transaction.on_commit(lambda pk=instance.pk: submit(generate_thumbnail, pk))
+
+
+pre_save.connect(track_certificate, sender=Certification, dispatch_uid='certificate-thumbnail-source')
+post_save.connect(schedule_thumbnail, sender=Certification, dispatch_uid='certificate-thumbnail')
@@ -1,14 +1,16 @@
 # main/urls.py
 
-from django.urls import path
+import re
+
+from django.urls import path, re_path
 from . import views
+from .media import serve_media
 from django.conf import settings
-from django.conf.urls.static import static
 
 urlpatterns = [
     # This will be the root URL of your site
     path('', views.portfolio_view, name='portfolio'),
-    path('chatbot-response/', views.ai_chatBot, name='chatbot_response'),
+    path('chatbot-response/', views.ai_chatBot_async if settings.CHATBOT_ASYNC else views.ai_chatBot, name='chatbot_response'),
+    # Uploads, in production too (see main/media.py)
+    re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,76 +1,43 @@
-import os, json, time
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
 from django.contrib import messages
-from django.core.mail import EmailMessage
-from django.conf import settings
-from django.template.loader import render_to_string
 from django.http import JsonResponse, StreamingHttpResponse
-from google import genai
-from .models import Project, Skill, Profile, Experience, ChatLog, OtherLinks, Education, Certification
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from .forms import ContactForm
+from .content import get_snapshot
+from .genai_client import get_genai_client, get_async_genai_client
+from .model_catalog import get_model_catalog
+from .model_router import Race, stream_models, astream_models
+from .prompt import get_grounding, build_chat_prompt
+from .answer_cache import answer_cache, answer_key, replay_chunks
+from . import singleflight
+from .chatlog_writer import chatlog_writer
+from .conversation import load_conversation, append_exchange, prompt_history
+from .pagecache import is_page_cacheable, cached_page_response, portfolio_etag, portfolio_last_modified
+from django_ratelimit.core import is_ratelimited
 from django_ratelimit.decorators import ratelimit
+from django_ratelimit.exceptions import Ratelimited
 
 # ---------------------------------------------------
 # VIEW FUNCTIONS
 # ---------------------------------------------------
 
+@cache_control(no_cache=True)
+@condition(etag_func=portfolio_etag, last_modified_func=portfolio_last_modified)
 def portfolio_view(request):
-    projects = Project.objects.all().order_by("-created_at")
-    all_skills = Skill.objects.all()
-    profile = Profile.objects.first()
-    experiences = Experience.objects.all()
-    otherLinks = OtherLinks.objects.all()
-    education = Education.objects.all().order_by("-admissionYear")
-    certificates = Certification.objects.all().order_by("-year")
+    snapshot = get_snapshot()
+    profile = snapshot.profile
 
     if not profile:
         return render(request, 'main/portfolio.html', {'error': 'Please add a profile in admin'})
-    
-    categories = [choice[0] for choice in Skill.CATEGORY_CHOICES]
-    grouped_skills = {
-        cat: all_skills.filter(category=cat) 
-        for cat in categories if all_skills.filter(category=cat).exists()
-    }
 
     if request.method == 'POST':
         form = ContactForm(request.POST)
         if form.is_valid():
-            instance = form.save()
-            
-            email_context = {
-                'flow': "New Portfolio Inquiry",
-                'name': instance.name,
-                'email': instance.email,
-                'subject': instance.subject,
-                'message': instance.message,
-            }
-
-            html_message = render_to_string('main/email_template.html', email_context)
-            email = EmailMessage(
-                subject=f"Inquiry: {instance.subject}",
-                body=html_message,
-                from_email=settings.EMAIL_HOST_USER,
-                to=[settings.EMAIL_HOST_USER],
-            )
-            email.content_subtype = "html"
-            email.send()
-
-            email_to_user = {
-                'flow': "Message Received!",
-                'name': profile.fname,
-                'email': profile.email,
-                'subject': "Confirmation for Message received",
-                'message': "I have received your message and will get back to you soon",
-            }
-            html_email_to_user = render_to_string('main/email_template.html', email_to_user)
-            reply = EmailMessage(
-                subject="Thanks for reaching out!",
-                body=html_email_to_user,
-                from_email=settings.EMAIL_HOST_USER,
-                to=[instance.email],
-            )
-            reply.content_subtype = "html"
-            reply.send()
+            # Emails are sent by the outbox dispatcher once the row is committed (see outbox.py)
+            form.save()
 
             if request.headers.get('x-requested-with') == 'XMLHttpRequest':
                 return JsonResponse({'status': 'success', 'message': 'Your message has been sent successfully! ✅'})
@@ -78,164 +45,241 @@ def portfolio_view(request):
             messages.success(request, "Your message has been sent successfully! ✅")
             return redirect('portfolio')
     else:
+        if is_page_cacheable(request):
+            # Shared between visitors, so rendered without a CSRF token
+            return cached_page_response(
+                request,
+                snapshot.version,
+                lambda: render_portfolio(request, snapshot, ContactForm(), csrf_token=''),
+            )
         form = ContactForm()
 
-    full_name = f"{profile.fname} {profile.mname or ''} {profile.lname}".strip().replace('  ', ' ')
-    
+    return render_portfolio(request, snapshot, form)
+
+# ---------------------------------------------------
+# HELPER FUNCTIONS
+# ---------------------------------------------------
+
+def render_portfolio(request, snapshot, form, **extra_context):
     context = {
-        'profile': profile,
-        'projects': projects,
-        'grouped_skills': grouped_skills,
-        'experiences': experiences,
+        'profile': snapshot.profile,
+        'projects': snapshot.projects,
+        'grouped_skills': snapshot.grouped_skills,
+        'experiences': snapshot.experiences,
         'form': form,
-        'name': full_name,
-        'education':education,
-        'certificates':certificates,
-        'otherLinks': otherLinks
+        'name': snapshot.full_name,
+        'education': snapshot.education,
+        'certificates': snapshot.certificates,
+        'otherLinks': snapshot.other_links,
+        **extra_context,
     }
     return render(request, 'main/portfolio.html', context)
 
-# ---------------------------------------------------
-# HELPER FUNCTIONS
-# ---------------------------------------------------
+def sse_event(text):
+    return f"data: {json.dumps({'text': text})}\n\n"
 
-def get_genai_client():
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        raise ValueError("GEMINI_API_KEY not found in environment variables")
-    return genai.Client(api_key=api_key)
-
-def get_fallback_models(client):
-    try:
-        available_models = client.models.list()
-        flash_models = [
-            m.name for m in available_models 
-            if 'flash' in m.name.lower() and 'generateContent' in m.supported_actions
-        ]
-        if flash_models:
-            return sorted(flash_models, reverse=True)
-        return ["models/gemini-2.0-flash", "models/gemini-1.5-flash"]
-    except Exception as e:
-        print(f"Discovery Error: {e}")
-        return ["models/gemini-2.0-flash", "models/gemini-1.5-flash"]
+def sse_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 # ---------------------------------------------------
 # CHATBOT VIEW
 # ---------------------------------------------------
 
-@ratelimit(key='ip', rate='10/m', block=True)
+@ratelimit(group='chatbot', key='ip', rate='10/m', block=True)
 def ai_chatBot(request):
     if request.method != "POST":
         return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
     
     user_query = request.POST.get("message")
-    profile = Profile.objects.first()
-    if not profile:
+    grounding = get_grounding()
+    if not grounding:
         return JsonResponse({'status': 'error', 'message': 'Profile missing'})
 
-    # 1. Session and History Management
+    # 1. Session and History Management (the session only provides the key)
     if not request.session.session_key:
         request.session.create()
+    session_key = request.session.session_key
 
-    chat_history = request.session.get('chat_history', [])
-    if len(chat_history) > 10:
-        chat_history = chat_history[-10:]
-
-    history_context = ""
-    for msg in chat_history:
-        role = "User" if msg['role'] == 'user' else "Assistant"
-        history_context += f"{role}: {msg['content']}\n"
-
-    # 2. RAG Retrieval
-    skills = Skill.objects.all()
-    experience = Experience.objects.all()
-    projects = Project.objects.all()
-    links = OtherLinks.objects.all()
-    education = Education.objects.all()
-    certs = Certification.objects.all()
-
-    # 3. Prompt Construction
-    full_name = f"{profile.fname} {profile.mname or ''} {profile.lname}".strip().replace('  ', ' ')
-    prompt_context = f"Name: {full_name}. Profession: {profile.profession}. Bio: {profile.objective}. "
-    prompt_context += "Skills: " + ", ".join([s.name for s in skills]) + ". "
-    prompt_context += "Experience: " + " | ".join([f"{e.role} at {e.company}: {e.description}" for e in experience])
-    prompt_context += " Projects: " + " | ".join([f"{p.title} ({p.technologies}): {p.description}" for p in projects])
-    prompt_context += f" Contact: Email: {profile.email}. Phone: {profile.phone}. " 
-    prompt_context += "Education: " + " | ".join([f"{e.courseName} from {e.college} (CGPA/%: {e.CGPA})" for e in education]) + ". "
-    prompt_context += "Certifications: " + ", ".join([c.courseName for c in certs]) + ". "
-    prompt_context += "Profiles/Links: " + ", ".join([f"{l.name}: {l.link}" for l in links])
-
-    system_instruction = f"""
-    You are the professional AI Career Assistant for {profile.fname}. 
-    Your mission: Briefly and professionally help recruiters understand {profile.fname}'s value.
-
-    STRICT OPERATIONAL RULES:
-    Tone: Professional, helpful, and concise.
-    1. GROUNDING: Answer ONLY using the provided context. If information is missing, say: "I can only provide professional information about {profile.fname}. Please contact him directly for details on this."
-    2. BREVITY: Keep answers concise (approx 30 words).
-    3. FORMATTING: Use **Bold** for tech/degrees. Use single dash (-) for bullets.
-    4. CONTACT: Provide email and phone clearly if asked.
-    5. if they GREET: Greet users back politely.
-    # Change these rules in your system_instruction:
-    6. NO GREETINGS: Do not say "Hello," "Hi," or "Greetings." in every message.( avaoid if you have greeted earlier until they greets or says thank you)
-    7. DIRECT ANSWERS: Start the response immediately with the information requested.
-    CONVERSATION HISTORY:
-    8. If reqruiter ask for " Are you available for hire?" response postively and convence them that {profile.fname} is the Quick leaner ready to adap whatever skills required please lets connect also provde contact details if requored.
-    {history_context}
-
-    CONTEXT:
-    {prompt_context}
-    """
+    chat_history = prompt_history(load_conversation(session_key))
 
-    final_model_used = "Discovery Failed"
+    # 2. Answer Cache: replay a known answer without calling the model
+    cached = answer_cache.get(grounding.version, chat_history, user_query)
+    if cached:
+        chatlog_writer.record(
+            user_query=user_query,
+            ai_response=cached.text,
+            model_used=f"{cached.model} (cached)",
+            session_key=session_key
+        )
+        append_exchange(session_key, user_query, cached.text)
+        return sse_response(sse_event(text) for text in replay_chunks(cached.text))
+
+    # 3. Prompt Construction (grounding is precompiled per content version)
+    contents = build_chat_prompt(grounding, chat_history, user_query)
+    flight_key = answer_key(grounding.version, chat_history, user_query)
 
     # 4. Response Streaming Generator
+    def lead(flight):
+        full_response_text = ""
+        race = None
+        try:
+            client = get_genai_client()
+            race = Race(get_model_catalog(client))
+            chunks = stream_models(client, race, contents)
+            try:
+                for chunk_text in chunks:
+                    full_response_text += chunk_text
+                    flight.publish(chunk_text)
+                    yield sse_event(chunk_text)
+            except GeneratorExit:
+                # This visitor left. Finish the answer on this thread for the
+                # followers still reading it; with none, stop the models
+                singleflight.land(flight_key, flight)
+                if flight.follower_sessions:
+                    for chunk_text in chunks:
+                        full_response_text += chunk_text
+                        flight.publish(chunk_text)
+                else:
+                    chunks.close()
+                raise
+        finally:
+            # Later identical questions hit the answer cache instead
+            singleflight.land(flight_key, flight)
+            answered = race is not None and race.answered_by is not None
+            try:
+                if answered:
+                    answer_cache.set(grounding.version, chat_history, user_query, full_response_text, race.answered_by)
+                    chatlog_writer.record(
+                        user_query=user_query,
+                        ai_response=full_response_text,
+                        model_used=race.answered_by,
+                        session_key=session_key,
+                        follower_sessions=flight.follower_sessions,
+                    )
+            finally:
+                flight.finish(ok=answered)
+
+        if answered:
+            append_exchange(session_key, user_query, full_response_text)
+
     def stream_response():
-        nonlocal final_model_used
-        client = get_genai_client()
-        model_queue = get_fallback_models(client)
+        for _attempt in range(2):
+            flight, leading = singleflight.join(flight_key, session_key)
+            if leading:
+                yield from lead(flight)
+                return
+            # An identical question is already streaming: share its chunks
+            full_response_text = ""
+            for chunk_text in flight.follow():
+                full_response_text += chunk_text
+                yield sse_event(chunk_text)
+            if flight.ok:
+                append_exchange(session_key, user_query, full_response_text)
+                return
+            if full_response_text:
+                # Cut off: what was shown is not saved as an answer
+                return
+            # The leader failed before its first chunk: ask the models ourselves
 
+    # 5. Return the Stream
+    return sse_response(stream_response())
+
+async def ai_chatBot_async(request):
+    """
+    Async twin of ai_chatBot for ASGI deployments (CHATBOT_ASYNC=True). The
+    model stream is consumed as an async iterator, so an open chat holds an
+    event loop task instead of a whole worker.
+    """
+    if request.method != "POST":
+        return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
+
+    limited = await sync_to_async(is_ratelimited)(
+        request, group='chatbot', key='ip', rate='10/m', increment=True,
+    )
+    if limited:
+        raise Ratelimited()
+
+    user_query = request.POST.get("message")
+    grounding = await sync_to_async(get_grounding)()
+    if not grounding:
+        return JsonResponse({'status': 'error', 'message': 'Profile missing'})
+
+    if not request.session.session_key:
+        await request.session.acreate()
+    session_key = request.session.session_key
+
+    chat_history = prompt_history(await sync_to_async(load_conversation)(session_key))
+
+    cached = await sync_to_async(answer_cache.get)(grounding.version, chat_history, user_query)
+    if cached:
+        await sync_to_async(chatlog_writer.record)(
+            user_query=user_query,
+            ai_response=cached.text,
+            model_used=f"{cached.model} (cached)",
+            session_key=session_key
+        )
+        await sync_to_async(append_exchange)(session_key, user_query, cached.text)
+
+        async def replay():
+            for text in replay_chunks(cached.text):
+                yield sse_event(text)
+        return sse_response(replay())
+
+    contents = build_chat_prompt(grounding, chat_history, user_query)
+    flight_key = answer_key(grounding.version, chat_history, user_query)
+
+    async def lead(flight):
+        # A task of its own (see singleflight.lead_in_background), so it
+        # finishes the answer for followers when this visitor disconnects
         full_response_text = ""
-        success = False
-
-        for model_id in model_queue:
-            try: 
-                print(f"DEBUG: Attempting to stream from {model_id}")
-                response = client.models.generate_content_stream(
-                    model=model_id,
-                    contents=f"{system_instruction}\n\n User Question: {user_query}",
+        final_model_used = None
+        try:
+            sync_client = get_genai_client()
+            client = get_async_genai_client()
+            model_queue = await sync_to_async(get_model_catalog)(sync_client)
+            race = await sync_to_async(Race)(model_queue)
+
+            async for chunk_text in astream_models(client, race, contents):
+                full_response_text += chunk_text
+                flight.publish(chunk_text)
+
+            final_model_used = race.answered_by
+
+            if final_model_used:
+                await sync_to_async(answer_cache.set)(
+                    grounding.version, chat_history, user_query, full_response_text, final_model_used,
                 )
-                has_chunks = False
-                for chunk in response:
-                    if chunk.text:
-                        has_chunks = True
-                        chunk_text = chunk.text
-                        full_response_text += chunk_text
-                        yield f"data: {json.dumps({'text': chunk_text})}\n\n"
-
-                
-                if has_chunks:
-                    final_model_used = model_id
-                    success = True
-                    break
-            except Exception as e:
-                print(f"DEBUG ERROR with {model_id}: {e}") # This will show in your terminal
-                continue
-
-        if success:
-            ChatLog.objects.create(
-                user_query=user_query,
-                ai_response=full_response_text,
-                model_used=final_model_used,
-                session_key=request.session.session_key
-            )
+        finally:
+            singleflight.land(flight_key, flight)
+            try:
+                if final_model_used:
+                    await sync_to_async(chatlog_writer.record)(
+                        user_query=user_query,
+                        ai_response=full_response_text,
+                        model_used=final_model_used,
+                        session_key=session_key,
+                        follower_sessions=flight.follower_sessions,
+                    )
+            finally:
+                flight.finish(ok=final_model_used is not None)
 
-            chat_history.append({'role': 'user', 'content': user_query})
-            chat_history.append({'role': 'assistant', 'content': full_response_text})
-            request.session['chat_history'] = chat_history
-            request.session.modified = True
+    async def stream_response():
+        for _attempt in range(2):
+            flight, leading = singleflight.join(flight_key, session_key)
+            if leading:
+                singleflight.lead_in_background(lead(flight))
+            full_response_text = ""
+            async for chunk_text in flight.afollow():
+                full_response_text += chunk_text
+                yield sse_event(chunk_text)
+            if flight.ok:
+                await sync_to_async(append_exchange)(session_key, user_query, full_response_text)
+                return
+            if leading or full_response_text:
+                # Failed or cut off: what was shown is not saved as an answer
+                return
+            # The leader failed before its first chunk: lead a flight ourselves
 
-    # 5. Return the Stream (Corrected Indentation)
-    response = StreamingHttpResponse(stream_response(), content_type='text/event-stream') 
-    response['Cache-Control'] = 'no-cache'
-    return response
\ No newline at end of file
+    return sse_response(stream_response())
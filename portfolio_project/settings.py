@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from pathlib import Path
 from dotenv import load_dotenv
@@ -49,8 +50,9 @@ INSTALLED_APPS = [
     'django.contrib.contenttypes',
     'django.contrib.sessions',
     'django.contrib.messages',
+    # Before staticfiles, so main's collectstatic (which builds tailwind.css) wins
+    'main.apps.MainConfig',
     'django.contrib.staticfiles',
-    'main.apps.MainConfig', 
 ]
 
 MIDDLEWARE = [
@@ -85,27 +87,127 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'portfolio_project.wsgi.application'
 
+# Serve the chatbot from the async view; only useful under an ASGI server (see Procfile)
+CHATBOT_ASYNC = os.getenv('CHATBOT_ASYNC', 'False').lower() == 'true'
+
 # --- DATABASE ---
 # Automatically uses Railway PostgreSQL if DATABASE_URL exists, else uses local SQLite
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections between requests instead of reopening the file each
+        # time. Not under ASGI: sync ORM calls run on executor threads, and a
+        # persistent connection is left open on each of them
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0 if CHATBOT_ASYNC else 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Take the write lock at BEGIN, so busy_timeout applies instead of
+            # failing when a read transaction has to be upgraded
+            'transaction_mode': os.getenv('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        },
     }
 }
 
+# Applied to every new SQLite connection (see main/sqlite.py); empty skips one
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'),
+    # Lets the ChatLog retention job hand deleted pages back to the file system
+    'auto_vacuum': os.getenv('SQLITE_AUTO_VACUUM', 'incremental'),
+    'mmap_size': os.getenv('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)),
+    # Negative means KiB: 20 MB of page cache per connection
+    'cache_size': os.getenv('SQLITE_CACHE_SIZE', '-20000'),
+    'temp_store': os.getenv('SQLITE_TEMP_STORE', 'memory'),
+}
+
+# --- CACHE ---
+# File based by default so every gunicorn worker on the box sees the same
+# content version; point CACHE_BACKEND/CACHE_LOCATION at memcached or redis when available.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'portfolio_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+}
+
+# Pooled Gemini client (see main/genai_client.py)
+GENAI_TIMEOUT_MS = int(os.getenv('GENAI_TIMEOUT_MS', 60_000))
+GENAI_MAX_CONNECTIONS = int(os.getenv('GENAI_MAX_CONNECTIONS', 20))
+GENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('GENAI_MAX_KEEPALIVE_CONNECTIONS', 10))
+GENAI_KEEPALIVE_EXPIRY = float(os.getenv('GENAI_KEEPALIVE_EXPIRY', 60))
+
+# Seconds a discovered Gemini model list counts as fresh (see main/model_catalog.py)
+MODEL_CATALOG_TTL = int(os.getenv('MODEL_CATALOG_TTL', 60 * 60))
+
+# Model routing: rolling window, circuit breaker and hedging (see main/model_router.py)
+MODEL_ROUTER_WINDOW = int(os.getenv('MODEL_ROUTER_WINDOW', 20))
+MODEL_ROUTER_WINDOW_SECONDS = int(os.getenv('MODEL_ROUTER_WINDOW_SECONDS', 10 * 60))
+MODEL_ROUTER_FAILURE_THRESHOLD = int(os.getenv('MODEL_ROUTER_FAILURE_THRESHOLD', 3))
+MODEL_ROUTER_COOLDOWN = int(os.getenv('MODEL_ROUTER_COOLDOWN', 30))
+MODEL_ROUTER_HEDGE_AFTER_MS = int(os.getenv('MODEL_ROUTER_HEDGE_AFTER_MS', 2500))
+
+# Chatbot retrieval: send only the portfolio chunks relevant to each question
+CHAT_RETRIEVAL = os.getenv('CHAT_RETRIEVAL', 'True').lower() == 'true'
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKEN_BUDGET', 600))
+CHAT_RETRIEVAL_TOP_K = int(os.getenv('CHAT_RETRIEVAL_TOP_K', 6))
+
+# Chat history kept in the cache per session (see main/conversation.py)
+CHAT_HISTORY_MESSAGES = int(os.getenv('CHAT_HISTORY_MESSAGES', 10))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv('CHAT_HISTORY_TOKEN_BUDGET', 400))
+CHAT_HISTORY_SYNOPSIS = os.getenv('CHAT_HISTORY_SYNOPSIS', 'True').lower() == 'true'
+CHAT_SYNOPSIS_TOKEN_BUDGET = int(os.getenv('CHAT_SYNOPSIS_TOKEN_BUDGET', 80))
+CHAT_HISTORY_TIMEOUT = int(os.getenv('CHAT_HISTORY_TIMEOUT', 2 * 60 * 60))
+
+# Buffered ChatLog writes (see main/chatlog_writer.py)
+CHATLOG_BATCH_SIZE = int(os.getenv('CHATLOG_BATCH_SIZE', 50))
+CHATLOG_FLUSH_INTERVAL = float(os.getenv('CHATLOG_FLUSH_INTERVAL', 2.0))
+CHATLOG_SPILL_PATH = os.getenv('CHATLOG_SPILL_PATH', str(BASE_DIR / 'chatlog_spill.jsonl'))
+
+# ChatLog retention: `manage.py archive_chatlogs` rolls up, archives and deletes
+# rows older than this many days (see main/chat_retention.py)
+CHATLOG_RETENTION_DAYS = int(os.getenv('CHATLOG_RETENTION_DAYS', 90))
+CHATLOG_ARCHIVE_DIR = os.getenv('CHATLOG_ARCHIVE_DIR', str(BASE_DIR / 'chatlog_archive'))
+
+# Finished chatbot answers replayed for repeated questions (see main/answer_cache.py)
+ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 6 * 60 * 60))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', 500))
+ANSWER_CACHE_MAX_BYTES = int(os.getenv('ANSWER_CACHE_MAX_BYTES', 2 * 1024 * 1024))
+
+# Opt-in full-page cache for anonymous GETs of the portfolio (see main/pagecache.py)
+PORTFOLIO_PAGE_CACHE = os.getenv('PORTFOLIO_PAGE_CACHE', 'False').lower() == 'true'
+PORTFOLIO_PAGE_CACHE_TIMEOUT = int(os.getenv('PORTFOLIO_PAGE_CACHE_TIMEOUT', 60 * 60))
+
 
 # --- STATIC & MEDIA FILES ---
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+# tailwind.css and its critical subset are built into TAILWIND_BUILD_DIR by
+# `manage.py build_tailwind` (see main/tailwind.py). TAILWIND_CLI may name the
+# standalone tailwindcss binary instead of the npm package
+TAILWIND_BUILD_DIR = os.path.join(BASE_DIR, 'build', 'static')
+TAILWIND_CLI = os.getenv('TAILWIND_CLI', 'npx --no-install tailwindcss')
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static'), TAILWIND_BUILD_DIR]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
-# Storage optimization for WhiteNoise (Serves Navy/Coral CSS faster)
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads are stored under the SHA-256 of their bytes (see main/storage.py);
+# unreferenced ones are deleted by `manage.py sweep_media`. Static files are
+# hashed and compressed for WhiteNoise by collectstatic, which first builds
+# tailwind.css
+STORAGES = {
+    'default': {'BACKEND': 'main.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'main.storage.StaticFilesStorage'},
+}
+
+# Responsive variants of uploaded images (see main/images.py); formats this
+# Pillow build cannot encode are skipped
+IMAGE_VARIANT_FORMATS = [name for name in os.getenv('IMAGE_VARIANT_FORMATS', 'avif,webp').split(',') if name]
+IMAGE_VARIANTS_IN_BACKGROUND = os.getenv('IMAGE_VARIANTS_IN_BACKGROUND', 'True').lower() == 'true'
+
 # --- EMAIL SETTINGS (SMTP) ---
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -114,6 +216,13 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_PASSWORD')
 
+# Contact form outbox, drained by a thread in the web process; with
+# OUTBOX_IN_PROCESS off, run `manage.py send_outbox` on a schedule instead
+OUTBOX_IN_PROCESS = os.getenv('OUTBOX_IN_PROCESS', 'True').lower() == 'true'
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 6))
+OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 60))
+OUTBOX_RETRY_MAX_SECONDS = int(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 6 * 60 * 60))
+
 # --- MISC ---
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 LANGUAGE_CODE = 'en-us'
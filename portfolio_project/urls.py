@@ -18,14 +18,9 @@ Including another URLconf
 # portfolio_project/urls.py
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings # Import settings
-from django.conf.urls.static import static # Import static
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('main.urls')),
 ]
-
-# Add this line to serve media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Media files are routed (with ranges, validators and precompression) from main/urls.py
\ No newline at end of file
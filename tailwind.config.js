@@ -0,0 +1,19 @@
+/** The page's Tailwind setup, formerly inlined for cdn.tailwindcss.com (see main/tailwind.py) */
+module.exports = {
+  content: ["./main/templates/**/*.html", "./main/static/main/js/**/*.js"],
+  darkMode: "class",
+  theme: {
+    extend: {
+      colors: {
+        navy: "#1B325F",
+        sky: "#9CC4E4",
+        ice: "#E9F2F9",
+        ocean: "#3A89C9",
+        coral: "#F26C4F",
+      },
+      animation: {
+        "pulse-slow": "pulse 3s cubic-bezier(0.4, 0, 0.6, 1) infinite",
+      },
+    },
+  },
+};